@@ -0,0 +1,104 @@
+import argparse
+import gc
+import itertools
+import statistics
+import time
+import tracemalloc
+
+from core.metrics import metrics, percentile
+from generators import (HistoryImageGenerator, LeaderboardImageGenerator, ProfileImageGenerator,
+                        PunishmentsImageGenerator, StatsImageGenerator, assets)
+from generators.resolution import DEFAULT_RESOLUTION, RESOLUTION_NAMES
+
+STATS_DATA = {f'stat_{i}': i * 7 for i in range(20)}
+STATS_DATA.update({'wins': 1250, 'kills': 8421, 'deaths': 3120, 'final_kills': 2210, 'beds_broken': 940})
+PROFILE_DATA = {'username': 'Steve', 'ranks': [{'name': 'GOLD'}], 'online': True, 'lastLogin': 1700000000000,
+                'userId': 5, 'language': 'ru', 'currentServer': 'lobby'}
+PUNISHMENTS_DATA = {'totalBans': 1520, 'totalMutes': 8300, 'totalKicks': 410, 'totalWarns': 77}
+LEADERBOARD_ENTRIES = [(f'Player{i}', 1000.0 - i * 13) for i in range(10)]
+HISTORY_POINTS = [(1700000000 + i * 300, 40 + i % 17, 30 + i % 11, 60 + i % 23) for i in range(288)]
+
+
+def scenarios(resolution: str):
+    stats = StatsImageGenerator(resolution)
+    profile = ProfileImageGenerator(resolution)
+    punishments = PunishmentsImageGenerator(resolution)
+    leaderboard = LeaderboardImageGenerator(resolution)
+    history = HistoryImageGenerator(resolution)
+    players = itertools.count()
+    diff = dict(STATS_DATA)
+
+    def stats_diff():
+        diff['wins'] += 1
+        diff['kills'] += 3
+        return stats.generate('Steve', 'BW', diff, 'GOLD')
+
+    return {
+        'stats': lambda: stats.generate(f"Steve{next(players)}", 'BW', STATS_DATA, 'GOLD'),
+        'stats_diff': stats_diff,
+        'profile': lambda: profile.generate('Steve', PROFILE_DATA, load_skin=False),
+        'punishments': lambda: punishments.generate(PUNISHMENTS_DATA),
+        'top': lambda: leaderboard.generate("Топ BedWars", "Убийства", 'kills', LEADERBOARD_ENTRIES),
+        'history': lambda: history.generate("Онлайн", "За сутки", HISTORY_POINTS,
+                                            HISTORY_POINTS[0][0], HISTORY_POINTS[-1][0]),
+    }
+
+
+def allocations() -> float:
+    return sum(metrics.counter('render_pool', kind=kind, result='miss') for kind in ('canvas', 'buffer'))
+
+
+def measure(render, iterations: int, release: bool):
+    durations = []
+    allocated = allocations()
+    gc_before = sum(stat['collections'] for stat in gc.get_stats())
+    tracemalloc.start()
+    tracemalloc.reset_peak()
+    for _ in range(iterations):
+        started = time.perf_counter()
+        image = render()
+        durations.append((time.perf_counter() - started) * 1000)
+        image.read()
+        if release:
+            assets.release_buffer(image)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    collections = sum(stat['collections'] for stat in gc.get_stats()) - gc_before
+    return {
+        'median_ms': statistics.median(durations),
+        'p95_ms': percentile(durations, 95),
+        'peak_kb': peak / 1024,
+        'gc': collections,
+        'allocated': allocations() - allocated,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Бенчмарк рендеринга изображений AgeraPvP Stats Bot")
+    parser.add_argument('--iterations', type=int, default=50, help="Количество рендеров на сценарий")
+    parser.add_argument('--resolution', default=DEFAULT_RESOLUTION, choices=sorted(RESOLUTION_NAMES),
+                        help="Профиль разрешения")
+    parser.add_argument('--pool-mb', type=float, default=32, help="Бюджет пула холстов в МБ (0 отключает пул)")
+    args = parser.parse_args()
+
+    assets.set_pool_budget(int(args.pool_mb * 1024 * 1024))
+    renders = scenarios(args.resolution)
+    for render in renders.values():
+        render().close()
+
+    print(f"{'сценарий':<12} {'медиана, мс':>12} {'p95, мс':>10} {'пик, КБ':>10} {'сборок GC':>10} {'выделений':>10}")
+    for name, render in renders.items():
+        result = measure(render, args.iterations, release=args.pool_mb > 0)
+        print(f"{name:<12} {result['median_ms']:>12.1f} {result['p95_ms']:>10.1f} "
+              f"{result['peak_kb']:>10.0f} {result['gc']:>10} {result['allocated']:>10.0f}")
+
+    if args.pool_mb > 0:
+        print("Пул:", ", ".join(
+            f"{kind} {metrics.counter('render_pool', kind=kind, result='hit'):.0f}/"
+            f"{metrics.counter('render_pool', kind=kind, result='miss'):.0f} (попадания/промахи)"
+            for kind in ('canvas', 'buffer')
+        ))
+
+
+if __name__ == '__main__':
+    main()
@@ -1,28 +1,73 @@
+from core.startup import StartupTracker, CommandSyncState, sync_command_tree
+
+startup = StartupTracker()
+
 import discord
 from discord import app_commands
 from discord.ext import commands
 import os
 import asyncio
 import logging
+import signal
 from dotenv import load_dotenv
 
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    datefmt='%Y-%m-%d %H:%M:%S'
-)
-
 from core.api_client import AgeraPvPAPI
-from generators import (
-    StatsImageGenerator,
-    ProfileImageGenerator,
-    PunishmentsImageGenerator
-)
+from core.admission import AdmissionController
+from core.attachments import AttachmentRegistry
+from core.cache import MemoryResponseCache
+from core.deadline import Deadline
+from core.jobs import INTERACTION_TOKEN_TTL, Job, create_job_queue, default_queue_url
+from core.leaderboard import LeaderboardIndex
+from core.logs import setup_logging
+from core.loop_monitor import LoopMonitor
+from core.memory import tracer
+from core.metrics import metrics
+from core.nicknames import NicknameIndex
+from core.pipeline import CommandPipeline, parse_render_request
+from core.preferences import PreferenceStore
+from core.profiler import MAX_DURATION, SamplingProfiler
+from core.scheduler import ApiScheduler
+from core.timeseries import HISTORY_LABELS, HISTORY_PERIODS, HistorySampler, TimeSeriesStore
+from core.watchlist import WatchlistScheduler, WatchlistStore
+from generators.resolution import DEFAULT_RESOLUTION, RESOLUTION_NAMES
+from generators.stat_schema import EXCLUDED_KEYS, MODE_NAMES
+
+startup.mark('imports')
 
 load_dotenv()
 
 BOT_TOKEN = os.getenv('BOT_TOKEN')
 API_KEY = os.getenv('API_KEY')
+LOG_LEVEL = os.getenv('LOG_LEVEL', 'INFO')
+LOG_DEBUG_RATE = float(os.getenv('LOG_DEBUG_RATE', '20'))
+DATA_DIR = os.getenv('DATA_DIR', 'data')
+FORCE_COMMAND_SYNC = os.getenv('FORCE_COMMAND_SYNC', '').lower() in ('1', 'true', 'yes')
+LOOP_SLOW_CALLBACK_MS = float(os.getenv('LOOP_SLOW_CALLBACK_MS', '100'))
+LOOP_STRICT_MS = float(os.getenv('LOOP_STRICT_MS')) if os.getenv('LOOP_STRICT_MS') else None
+BOT_MODE = os.getenv('BOT_MODE', 'local').lower()
+QUEUE_URL = os.getenv('QUEUE_URL', default_queue_url(DATA_DIR))
+RESPONSE_CACHE_TTL = float(os.getenv('RESPONSE_CACHE_TTL', '30'))
+RENDER_MAX_QUEUE_DEPTH = int(os.getenv('RENDER_MAX_QUEUE_DEPTH', '8'))
+RENDER_MAX_WAIT_MS = float(os.getenv('RENDER_MAX_WAIT_MS', '5000'))
+ATTACHMENT_REUSE_TTL = float(os.getenv('ATTACHMENT_REUSE_TTL', '3600'))
+RENDER_CONCURRENCY = int(os.getenv('RENDER_CONCURRENCY', str(os.cpu_count() or 1)))
+RESPONSE_CACHE_MAX_MB = float(os.getenv('RESPONSE_CACHE_MAX_MB', '64'))
+ASSET_CACHE_MAX_MB = float(os.getenv('ASSET_CACHE_MAX_MB', '96'))
+RENDER_POOL_MAX_MB = float(os.getenv('RENDER_POOL_MAX_MB', '32'))
+STATS_CARD_CACHE_MB = float(os.getenv('STATS_CARD_CACHE_MB', '64'))
+API_CONCURRENCY = int(os.getenv('API_CONCURRENCY', '8'))
+API_INTERACTIVE_RESERVED = int(os.getenv('API_INTERACTIVE_RESERVED', '2'))
+API_BASE_URLS = os.getenv('API_BASE_URLS', AgeraPvPAPI.BASE_URL).split(',')
+API_HEDGE_RATIO = float(os.getenv('API_HEDGE_RATIO', '0.05'))
+HISTORY_SAMPLE_INTERVAL = float(os.getenv('HISTORY_SAMPLE_INTERVAL', '300'))
+MEMORY_TRACE = os.getenv('MEMORY_TRACE', '').lower() in ('1', 'true', 'yes')
+COMMAND_DEADLINE = float(os.getenv('COMMAND_DEADLINE', '8'))
+WATCHLIST_INTERVAL = float(os.getenv('WATCHLIST_INTERVAL', '3600'))
+WATCHLIST_BATCH_SIZE = int(os.getenv('WATCHLIST_BATCH_SIZE', '20'))
+WATCHLIST_CONCURRENCY = int(os.getenv('WATCHLIST_CONCURRENCY', '4'))
+PROFILE_DIR = os.getenv('PROFILE_DIR', os.path.join(DATA_DIR, 'profiles'))
+PROFILE_INTERVAL_MS = float(os.getenv('PROFILE_INTERVAL_MS', '10'))
+PROFILE_SIGNAL_SECONDS = float(os.getenv('PROFILE_SIGNAL_SECONDS', '30'))
 
 if not BOT_TOKEN:
     raise ValueError("BOT_TOKEN не найден в переменных окружения! Создайте файл .env с токеном.")
@@ -30,311 +75,588 @@ if not BOT_TOKEN:
 if not API_KEY:
     raise ValueError("API_KEY не найден в переменных окружения! Создайте файл .env с API ключом.")
 
+setup_logging(LOG_LEVEL, secrets=(BOT_TOKEN, API_KEY), debug_rate=LOG_DEBUG_RATE)
+logger = logging.getLogger('bot')
+
 intents = discord.Intents.default()
 intents.message_content = True
 
-bot = commands.Bot(command_prefix='!', intents=intents)
+api_client = AgeraPvPAPI(api_key=API_KEY, base_urls=API_BASE_URLS, hedge_ratio=API_HEDGE_RATIO)
+loop_monitor = LoopMonitor(slow_callback_ms=LOOP_SLOW_CALLBACK_MS, strict_ms=LOOP_STRICT_MS)
+command_sync_state = CommandSyncState(os.path.join(DATA_DIR, 'command_tree.sha256'))
+preferences = PreferenceStore(os.path.join(DATA_DIR, 'preferences.json'))
+
+IMAGE_COMMANDS = ('stats', 'profile', 'punishments', 'history', 'top')
+
+
+def configure_render_budgets():
+    from generators import assets
+    from generators.image_generator import set_card_budget
+
+    assets.set_budget(int(ASSET_CACHE_MAX_MB * 1024 * 1024))
+    assets.set_pool_budget(int(RENDER_POOL_MAX_MB * 1024 * 1024))
+    set_card_budget(int(STATS_CARD_CACHE_MB * 1024 * 1024))
+
+
+def warm_up_generators():
+    configure_render_budgets()
+    pipeline.warm_up()
+
+
+if MEMORY_TRACE:
+    tracer.start()
+
+job_queue = create_job_queue(QUEUE_URL) if BOT_MODE == 'gateway' else None
+history_store = TimeSeriesStore(DATA_DIR)
+nicknames = NicknameIndex(os.path.join(DATA_DIR, 'nicknames.json'))
+leaderboard = LeaderboardIndex(os.path.join(DATA_DIR, 'leaderboard.json'), excluded_keys=EXCLUDED_KEYS)
+pipeline = CommandPipeline(
+    api_client,
+    cache=job_queue.response_cache() if job_queue is not None
+    else MemoryResponseCache(max_bytes=int(RESPONSE_CACHE_MAX_MB * 1024 * 1024)),
+    cache_ttl=RESPONSE_CACHE_TTL,
+    admission=AdmissionController(
+        max_depth=RENDER_MAX_QUEUE_DEPTH,
+        max_wait_ms=RENDER_MAX_WAIT_MS,
+        concurrency=RENDER_CONCURRENCY
+    ),
+    history=history_store,
+    leaderboard=leaderboard,
+    nicknames=nicknames,
+    scheduler=ApiScheduler(concurrency=API_CONCURRENCY, reserved=API_INTERACTIVE_RESERVED)
+)
+history_sampler = HistorySampler(pipeline, history_store)
+watchlists = WatchlistStore(os.path.join(DATA_DIR, 'watchlists.json'))
+profiler = SamplingProfiler(PROFILE_DIR, interval=PROFILE_INTERVAL_MS / 1000)
+watchlist_scheduler = WatchlistScheduler(pipeline, watchlists, batch_size=WATCHLIST_BATCH_SIZE,
+                                         concurrency=WATCHLIST_CONCURRENCY, excluded_keys=EXCLUDED_KEYS)
+
+
+attachments = AttachmentRegistry(
+    job_queue.response_cache() if job_queue is not None else MemoryResponseCache(
+        max_entries=4096, max_bytes=4 * 1024 * 1024, name='attachments'),
+    ttl=ATTACHMENT_REUSE_TTL
+)
+
+
+class AgeraBot(commands.Bot):
+
+    async def setup_hook(self):
+        startup.mark('login')
+        loop_monitor.start(self.loop)
+        self.loop.create_task(self._warm_up())
+        self.loop.create_task(self._sync_indexes())
+        if HISTORY_SAMPLE_INTERVAL > 0:
+            self.loop.create_task(self._sample_history())
+        if WATCHLIST_INTERVAL > 0:
+            self.loop.create_task(self._refresh_watchlists())
+        if hasattr(signal, 'SIGUSR1'):
+            try:
+                self.loop.add_signal_handler(signal.SIGUSR1, self._profile_on_signal)
+            except (NotImplementedError, RuntimeError) as e:
+                logger.warning("Не удалось подписаться на SIGUSR1 для профилирования: %s", e)
+
+    def _profile_on_signal(self):
+        if profiler.start(PROFILE_SIGNAL_SECONDS) is None:
+            logger.warning("Профилирование уже идёт, сигнал проигнорирован")
+
+    async def _sync_indexes(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            await asyncio.sleep(60)
+            try:
+                await loop.run_in_executor(None, nicknames.sync)
+            except Exception as e:
+                logger.warning("Ошибка при сохранении индекса ников: %s", e)
+
+    async def _sample_history(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            try:
+                await loop.run_in_executor(None, history_sampler.sample)
+            except Exception as e:
+                logger.warning("Ошибка при записи истории: %s", e)
+            await asyncio.sleep(HISTORY_SAMPLE_INTERVAL)
 
-api_client = AgeraPvPAPI(api_key=API_KEY)
-stats_formatter = StatsImageGenerator()
-profile_generator = ProfileImageGenerator()
-punishments_generator = PunishmentsImageGenerator()
+    async def _refresh_watchlists(self):
+        loop = asyncio.get_running_loop()
+        await self.wait_until_ready()
+        while True:
+            try:
+                notifications = await loop.run_in_executor(None, watchlist_scheduler.refresh)
+                for channel_id, lines in notifications.items():
+                    await self._notify(channel_id, lines)
+            except Exception as e:
+                logger.warning("Ошибка при обновлении списков отслеживания: %s", e)
+            await asyncio.sleep(WATCHLIST_INTERVAL)
+
+    async def _notify(self, channel_id: int, lines):
+        try:
+            channel = self.get_channel(channel_id) or await self.fetch_channel(channel_id)
+            message = "📣 **Изменения у отслеживаемых игроков**"
+            for line in lines:
+                if len(message) + len(line) + 1 > 2000:
+                    await channel.send(message)
+                    message = ""
+                message = f"{message}\n{line}" if message else line
+            await channel.send(message)
+        except discord.HTTPException as e:
+            logger.warning("Не удалось отправить уведомления в канал %s: %s", channel_id, e)
+
+    async def _warm_up(self):
+        loop = asyncio.get_running_loop()
+
+        async def timed(name, func):
+            with startup.phase(name):
+                return await loop.run_in_executor(None, func)
+
+        async def sync():
+            with startup.phase('command_sync'):
+                try:
+                    await sync_command_tree(self.tree, command_sync_state, force=FORCE_COMMAND_SYNC)
+                except Exception as e:
+                    logger.error("Ошибка при синхронизации команд: %s", e)
+
+        warm_generators = warm_up_generators if job_queue is None else (lambda: None)
+        results = await asyncio.gather(
+            sync(),
+            timed('generators', warm_generators),
+            timed('api_connection', api_client.test_connection),
+            return_exceptions=True,
+        )
+
+        for result in results:
+            if isinstance(result, Exception):
+                logger.warning("Ошибка при прогреве: %s", result)
+
+        if results[2] is True:
+            logger.info('Соединение с API установлено')
+        else:
+            logger.warning('Не удалось подключиться к API. Проверьте логи выше для деталей.')
+
+        self._report_readiness(startup.set_warm())
+
+    async def close(self):
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(None, leaderboard.save)
+        await loop.run_in_executor(None, nicknames.sync)
+        await super().close()
+
+    def _report_readiness(self, became_ready: bool):
+        if became_ready:
+            logger.info("Бот готов (%s). Время запуска: %s", startup.state, startup.breakdown())
+
+
+bot = AgeraBot(command_prefix='!', intents=intents)
 
 
 @bot.event
 async def on_ready():
-    print(f'Бот {bot.user} подключен к Discord!')
-    
+    if startup.gateway_ready:
+        logger.info('Повторное подключение к Discord как %s', bot.user)
+        return
+
+    startup.mark('gateway_ready')
+    logger.info('Бот %s подключен к Discord!', bot.user)
+    bot._report_readiness(startup.set_gateway_ready())
+
+
+class ResultView(discord.ui.View):
+
+    def __init__(self, buttons):
+        super().__init__(timeout=INTERACTION_TOKEN_TTL)
+        for label, emoji, custom_id, disabled in buttons:
+            self.add_item(discord.ui.Button(
+                label=label,
+                emoji=emoji,
+                style=discord.ButtonStyle.secondary,
+                custom_id=custom_id,
+                disabled=disabled
+            ))
+
+
+async def send_result(interaction: discord.Interaction, result, direct: bool = False):
+    kwargs = {}
+    if result.embed is not None:
+        kwargs['embed'] = discord.Embed.from_dict(result.embed)
+    buttons = result.buttons()
+    if buttons:
+        kwargs['view'] = ResultView(buttons)
+
+    async def reply(file=None, **extra):
+        extra = {**kwargs, **extra}
+        if direct:
+            if result.edit:
+                extra.setdefault('embed', None)
+                await interaction.response.edit_message(
+                    content=result.content, attachments=[file] if file is not None else [], **extra
+                )
+            else:
+                if file is not None:
+                    extra['file'] = file
+                await interaction.response.send_message(result.content, **extra)
+            return await interaction.original_response() if file is not None else None
+        if result.edit:
+            extra.setdefault('embed', None)
+            return await interaction.edit_original_response(
+                content=result.content, attachments=[file] if file is not None else [], **extra
+            )
+        if file is not None:
+            return await interaction.followup.send(result.content, file=file, wait=True, **extra)
+        return await interaction.followup.send(result.content, **extra)
+
+    if result.image is None:
+        await reply()
+        return
+
     try:
-        synced = await bot.tree.sync()
-        print(f'Синхронизировано {len(synced)} команд')
-    except Exception as e:
-        print(f'Ошибка при синхронизации команд: {e}')
-    
-    logger = logging.getLogger('bot')
-    if api_client.test_connection():
-        logger.info('Соединение с API установлено')
-    else:
-        logger.warning('Не удалось подключиться к API. Проверьте логи выше для деталей.')
+        digest = attachments.digest(result.image)
+        url = attachments.lookup(digest)
+        if url is not None:
+            embed = kwargs.pop('embed', None) or discord.Embed()
+            embed.set_image(url=url)
+            try:
+                await reply(embed=embed)
+                metrics.inc('attachment_reused')
+                return
+            except discord.HTTPException as e:
+                logger.warning("Не удалось переиспользовать вложение %s: %s", digest[:12], e)
+                attachments.forget(digest)
 
+        message = await reply(discord.File(result.image, filename=result.filename))
+        attachments.remember(digest, message)
+        metrics.inc('attachment_uploaded')
+    finally:
+        result.release()
+
+
+async def run_command(interaction: discord.Interaction, command: str, args: dict):
+    deadline = Deadline.after(COMMAND_DEADLINE) if COMMAND_DEADLINE > 0 else None
+    loop = asyncio.get_event_loop()
+    if command in IMAGE_COMMANDS:
+        args['resolution'] = preferences.resolve(
+            'resolution', interaction.user.id, interaction.guild_id, DEFAULT_RESOLUTION
+        )
+
+    ready = None
+    if command in pipeline.READY_COMMANDS:
+        try:
+            ready = await loop.run_in_executor(None, pipeline.ready, command, args, interaction.guild_id)
+        except Exception as e:
+            logger.warning("Не удалось проверить готовый ответ для команды %s: %s", command, e)
+    if ready is not None:
+        try:
+            await send_result(interaction, ready, direct=True)
+            metrics.inc('command_response', command=command, path='direct')
+            return
+        except (discord.errors.NotFound, discord.errors.InteractionResponded) as e:
+            logger.warning("Не удалось ответить на команду %s: %s", command, e)
+            return
+        except discord.HTTPException as e:
+            logger.warning("Не удалось отправить готовый ответ на команду %s: %s", command, e)
+            if interaction.response.is_done():
+                return
 
-@bot.tree.command(name="stats", description="Получить статистику игрока")
-@app_commands.describe(
-    nickname="Никнейм игрока",
-    mode="Режим игры (BW для BedWars или Duels)"
-)
-async def stats_command(interaction: discord.Interaction, nickname: str, mode: str):
     try:
         await interaction.response.defer()
     except (discord.errors.NotFound, discord.errors.InteractionResponded) as e:
-        print(f"Ошибка при defer в команде stats: {e}")
+        logger.warning("Ошибка при defer в команде %s: %s", command, e)
         return
-    
+
     try:
-        loop = asyncio.get_event_loop()
-        stats_data = await loop.run_in_executor(None, api_client.get_player_stats, nickname, mode)
-        
-        if stats_data is None:
-            await interaction.followup.send(
-                f"❌ Не удалось получить статистику для игрока **{nickname}** в режиме **{mode.upper()}**.\n"
-                "Проверьте правильность ника и режима."
-            )
+        if job_queue is not None:
+            job = Job(None, command, args, interaction.application_id, interaction.token)
+            await loop.run_in_executor(None, job_queue.put, job)
+            metrics.inc('command_response', command=command, path='queued')
             return
-        
-        if isinstance(stats_data, dict):
-            if not stats_data.get('success', True):
-                error_msg = stats_data.get('message', 'Неизвестная ошибка')
-                await interaction.followup.send(
-                    f"❌ Ошибка: {error_msg}"
-                )
-                return
-        
-        rank = None
-        profile_data = await loop.run_in_executor(None, api_client.get_player_profile, nickname)
-        if profile_data and isinstance(profile_data, dict):
-            ranks = profile_data.get('ranks', [])
-            if ranks and isinstance(ranks, list) and len(ranks) > 0:
-                first_rank = ranks[0]
-                if isinstance(first_rank, dict):
-                    rank = first_rank.get('name') or first_rank.get('displayName')
-                elif isinstance(first_rank, str):
-                    rank = first_rank
-                
-                if rank:
-                    import re
-                    rank = re.sub(r'§[0-9a-fA-Fk-oK-OrR]', '', rank)
-        
-        image_bytes = await loop.run_in_executor(
-            None, 
-            stats_formatter.generate, 
-            nickname, 
-            mode, 
-            stats_data, 
-            rank
-        )
-        
-        if image_bytes is None:
-            await interaction.followup.send(
-                f"❌ Не удалось сгенерировать изображение со статистикой."
-            )
-            return
-        
-        file = discord.File(image_bytes, filename=f"stats_{nickname}_{mode}.png")
-        await interaction.followup.send(
-            f"📊 Статистика игрока **{nickname}** в режиме **{mode.upper()}**",
-            file=file
-        )
-        
+
+        result = await loop.run_in_executor(None, pipeline.run, command, args, deadline,
+                                            interaction.guild_id)
+        await send_result(interaction, result)
+        metrics.inc('command_response', command=command, path='deferred')
+
     except Exception as e:
-        print(f"Ошибка в команде stats: {e}")
+        logger.error("Ошибка в команде %s: %s", command, e)
         await interaction.followup.send(
             f"❌ Произошла ошибка при обработке запроса: {str(e)}"
         )
 
 
+@bot.listen('on_interaction')
+async def on_render_request(interaction: discord.Interaction):
+    if interaction.type != discord.InteractionType.component:
+        return
+    custom_id = (interaction.data or {}).get('custom_id', '')
+    request = parse_render_request(custom_id)
+    if request is None:
+        return
+
+    command, args = request
+    args['allow_shed'] = False
+    await run_command(interaction, command, args)
+
+
+MODE_CHOICES = [app_commands.Choice(name=name, value=value) for value, name in MODE_NAMES.items()]
+
+
+async def nickname_autocomplete(interaction: discord.Interaction, current: str):
+    return [app_commands.Choice(name=name, value=name) for name in nicknames.suggest(current, 25)]
+
+
+async def stat_autocomplete(interaction: discord.Interaction, current: str):
+    mode = getattr(interaction.namespace, 'mode', None)
+    if not mode:
+        return []
+    current = current.lower()
+    return [app_commands.Choice(name=stat, value=stat)
+            for stat in leaderboard.stats(mode) if stat.startswith(current)][:25]
+
+
+@bot.tree.command(name="stats", description="Получить статистику игрока")
+@app_commands.describe(
+    nickname="Никнейм игрока",
+    mode="Режим игры"
+)
+@app_commands.choices(mode=MODE_CHOICES)
+@app_commands.autocomplete(nickname=nickname_autocomplete)
+@loop_monitor.watch_handler
+async def stats_command(interaction: discord.Interaction, nickname: str, mode: app_commands.Choice[str]):
+    await run_command(interaction, 'stats', {'nickname': nickname, 'mode': mode.value})
+
+
 @bot.tree.command(name="profile", description="Получить профиль игрока")
 @app_commands.describe(
     nickname="Никнейм игрока"
 )
+@app_commands.autocomplete(nickname=nickname_autocomplete)
+@loop_monitor.watch_handler
 async def profile_command(interaction: discord.Interaction, nickname: str):
-    await interaction.response.defer()
-    
-    try:
-        profile_data = api_client.get_player_profile(nickname)
-        
-        if profile_data is None:
-            await interaction.followup.send(
-                f"❌ Не удалось получить профиль для игрока **{nickname}**.\n"
-                "Проверьте правильность ника."
-            )
-            return
-        
-        if isinstance(profile_data, dict):
-            if not profile_data.get('success', True):
-                error_msg = profile_data.get('message', 'Неизвестная ошибка')
-                await interaction.followup.send(
-                    f"❌ Ошибка: {error_msg}"
-                )
-                return
-        
-        image_bytes = profile_generator.generate(nickname, profile_data)
-        
-        if image_bytes is None:
-            await interaction.followup.send(
-                f"❌ Не удалось сгенерировать изображение профиля."
-            )
-            return
-        
-        file = discord.File(image_bytes, filename=f"profile_{nickname}.png")
-        await interaction.followup.send(
-            f"👤 Профиль игрока **{nickname}**",
-            file=file
-        )
-        
-    except Exception as e:
-        print(f"Ошибка в команде profile: {e}")
-        await interaction.followup.send(
-            f"❌ Произошла ошибка при обработке запроса: {str(e)}"
-        )
+    await run_command(interaction, 'profile', {'nickname': nickname})
 
 
 @bot.tree.command(name="punishments", description="Получить статистику наказаний")
+@loop_monitor.watch_handler
 async def punishments_command(interaction: discord.Interaction):
-    await interaction.response.defer()
-    
-    try:
-        stats_data = api_client.get_staff_stats()
-        
-        if stats_data is None:
-            await interaction.followup.send(
-                "❌ Не удалось получить статистику наказаний."
-            )
-            return
-        
-        if isinstance(stats_data, dict):
-            if not stats_data.get('success', True):
-                error_msg = stats_data.get('message', 'Неизвестная ошибка')
-                await interaction.followup.send(
-                    f"❌ Ошибка: {error_msg}"
-                )
-                return
-        
-        image_bytes = punishments_generator.generate(stats_data)
-        
-        if image_bytes is None:
-            await interaction.followup.send(
-                "❌ Не удалось сгенерировать изображение статистики наказаний."
-            )
-            return
-        
-        file = discord.File(image_bytes, filename="punishments.png")
-        await interaction.followup.send(
-            "📊 Статистика наказаний",
-            file=file
-        )
-        
-    except Exception as e:
-        print(f"Ошибка в команде punishments: {e}")
-        await interaction.followup.send(
-            f"❌ Произошла ошибка при обработке запроса: {str(e)}"
-        )
+    await run_command(interaction, 'punishments', {})
 
 
 @bot.tree.command(name="staff", description="Получить список онлайн стаффа")
+@loop_monitor.watch_handler
 async def staff_command(interaction: discord.Interaction):
-    try:
-        await interaction.response.defer()
-    except (discord.errors.NotFound, discord.errors.InteractionResponded) as e:
-        print(f"Ошибка при defer в команде staff: {e}")
-        return
-    
-    try:
-        loop = asyncio.get_event_loop()
-        staff_data = await loop.run_in_executor(None, api_client.get_staff_online)
-        
-        if staff_data is None:
-            await interaction.followup.send(
-                "❌ Не удалось получить список онлайн стаффа."
-            )
-            return
-        
-        if isinstance(staff_data, dict):
-            if not staff_data.get('success', True):
-                error_msg = staff_data.get('message', 'Неизвестная ошибка')
-                await interaction.followup.send(
-                    f"❌ Ошибка: {error_msg}"
-                )
-                return
-        
-        players = staff_data.get('players', [])
-        
-        if len(players) == 0:
-            await interaction.followup.send(
-                "👮 **Онлайн стафф**\n\nНет онлайн стаффа"
-            )
-            return
-        
-        import re
-        lines = [f"👮 **Онлайн стафф ({len(players)})**", ""]
-        
-        for i, player in enumerate(players, 1):
-            display_name = player.get('displayName', 'Неизвестно')
-            user_id = player.get('userId', 'N/A')
-            
-            display_name = re.sub(r'§[0-9a-fA-Fk-oK-OrR]', '', display_name)
-            
-            lines.append(f"{i}. **{display_name}** (ID: {user_id})")
-        
-        message = "\n".join(lines)
-        await interaction.followup.send(message)
-        
-    except Exception as e:
-        print(f"Ошибка в команде staff: {e}")
-        await interaction.followup.send(
-            f"❌ Произошла ошибка при обработке запроса: {str(e)}"
-        )
+    await run_command(interaction, 'staff', {})
 
 
 @bot.tree.command(name="online", description="Получить общее количество онлайн игроков")
+@loop_monitor.watch_handler
 async def online_command(interaction: discord.Interaction):
-    try:
-        await interaction.response.defer()
-    except (discord.errors.NotFound, discord.errors.InteractionResponded) as e:
-        print(f"Ошибка при defer в команде online: {e}")
+    await run_command(interaction, 'online', {})
+
+
+@bot.tree.command(name="history", description="График онлайна и статистики наказаний за период")
+@app_commands.describe(
+    metric="Что показать",
+    period="За какой период"
+)
+@app_commands.choices(
+    metric=[app_commands.Choice(name=name, value=value) for value, name in HISTORY_LABELS.items()],
+    period=[app_commands.Choice(name=name.capitalize(), value=value) for value, (_, name) in HISTORY_PERIODS.items()]
+)
+@loop_monitor.watch_handler
+async def history_command(interaction: discord.Interaction, metric: app_commands.Choice[str],
+                          period: app_commands.Choice[str] = None):
+    await run_command(interaction, 'history', {
+        'metric': metric.value,
+        'period': period.value if period is not None else 'day'
+    })
+
+
+@bot.tree.command(name="top", description="Таблица лидеров по показателю среди игроков, которых запрашивали в боте")
+@app_commands.describe(
+    mode="Режим игры",
+    stat="Показатель, например wins, kills, kd, wl или winrate",
+    limit="Сколько игроков показать (до 25)"
+)
+@app_commands.choices(mode=MODE_CHOICES)
+@app_commands.autocomplete(stat=stat_autocomplete)
+@loop_monitor.watch_handler
+async def top_command(interaction: discord.Interaction, mode: app_commands.Choice[str], stat: str,
+                      limit: app_commands.Range[int, 1, 25] = 10):
+    await run_command(interaction, 'top', {'mode': mode.value, 'stat': stat, 'limit': limit})
+
+
+def can_manage_guild(interaction: discord.Interaction) -> bool:
+    permissions = getattr(interaction.user, 'guild_permissions', None)
+    return interaction.guild_id is not None and permissions is not None and permissions.manage_guild
+
+
+async def watched_autocomplete(interaction: discord.Interaction, current: str):
+    current = current.lower()
+    names = dict.fromkeys(nickname for nickname, _ in watchlists.players(interaction.guild_id)
+                          if nickname.lower().startswith(current))
+    return [app_commands.Choice(name=name, value=name) for name in names][:25]
+
+
+@bot.tree.command(name="watch", description="Добавить игрока в список отслеживания сервера")
+@app_commands.describe(
+    nickname="Никнейм игрока",
+    mode="Режим игры"
+)
+@app_commands.choices(mode=MODE_CHOICES)
+@app_commands.autocomplete(nickname=nickname_autocomplete)
+@loop_monitor.watch_handler
+async def watch_command(interaction: discord.Interaction, nickname: str, mode: app_commands.Choice[str]):
+    if not can_manage_guild(interaction):
+        await interaction.response.send_message(
+            "❌ Список отслеживания могут менять только пользователи с правом «Управление сервером».",
+            ephemeral=True
+        )
         return
-    
+
+    loop = asyncio.get_event_loop()
     try:
-        loop = asyncio.get_event_loop()
-        online_data = await loop.run_in_executor(None, api_client.get_total_online)
-        
-        if online_data is None:
-            await interaction.followup.send(
-                "❌ Не удалось получить количество онлайн игроков."
+        added = await loop.run_in_executor(None, watchlists.add, interaction.guild_id, interaction.channel_id,
+                                           nickname, mode.value)
+    except ValueError as e:
+        await interaction.response.send_message(f"❌ {e}", ephemeral=True)
+        return
+
+    status = "добавлен в список отслеживания" if added else "уже отслеживается"
+    await interaction.response.send_message(
+        f"👀 **{nickname}** ({mode.name}) {status}. Изменения будут приходить в этот канал.", ephemeral=True
+    )
+
+
+@bot.tree.command(name="unwatch", description="Убрать игрока из списка отслеживания сервера")
+@app_commands.describe(
+    nickname="Никнейм игрока",
+    mode="Режим игры"
+)
+@app_commands.choices(mode=MODE_CHOICES)
+@app_commands.autocomplete(nickname=watched_autocomplete)
+@loop_monitor.watch_handler
+async def unwatch_command(interaction: discord.Interaction, nickname: str, mode: app_commands.Choice[str]):
+    if not can_manage_guild(interaction):
+        await interaction.response.send_message(
+            "❌ Список отслеживания могут менять только пользователи с правом «Управление сервером».",
+            ephemeral=True
+        )
+        return
+
+    loop = asyncio.get_event_loop()
+    removed = await loop.run_in_executor(None, watchlists.remove, interaction.guild_id, nickname, mode.value)
+    if removed:
+        await interaction.response.send_message(f"✅ **{nickname}** ({mode.name}) больше не отслеживается.",
+                                                ephemeral=True)
+    else:
+        await interaction.response.send_message(f"❌ **{nickname}** ({mode.name}) нет в списке.", ephemeral=True)
+
+
+@bot.tree.command(name="watchlist", description="Показать список отслеживания сервера")
+@loop_monitor.watch_handler
+async def watchlist_command(interaction: discord.Interaction):
+    players = watchlists.players(interaction.guild_id) if interaction.guild_id is not None else []
+    if not players:
+        await interaction.response.send_message("👀 Список отслеживания пуст. Добавьте игроков через `/watch`.",
+                                                ephemeral=True)
+        return
+
+    lines = [f"👀 **Список отслеживания ({len(players)})**", ""]
+    for i, (nickname, mode) in enumerate(players, 1):
+        lines.append(f"{i}. **{nickname}** — {MODE_NAMES.get(mode, mode)}")
+    lines.append("")
+    lines.append(f"Уведомления приходят в <#{watchlists.channel(interaction.guild_id)}>")
+    await interaction.response.send_message("\n".join(lines), ephemeral=True)
+
+
+@bot.tree.command(name="resolution", description="Выбрать размер изображений")
+@app_commands.describe(
+    profile="Профиль разрешения",
+    scope="Для кого применить настройку"
+)
+@app_commands.choices(
+    profile=[app_commands.Choice(name=name, value=value) for value, name in RESOLUTION_NAMES.items()],
+    scope=[
+        app_commands.Choice(name="Только для меня", value="user"),
+        app_commands.Choice(name="Для всего сервера", value="guild"),
+    ]
+)
+@loop_monitor.watch_handler
+async def resolution_command(interaction: discord.Interaction, profile: app_commands.Choice[str],
+                             scope: app_commands.Choice[str] = None):
+    scope_value = scope.value if scope is not None else "user"
+    loop = asyncio.get_event_loop()
+
+    if scope_value == "guild":
+        if not can_manage_guild(interaction):
+            await interaction.response.send_message(
+                "❌ Изменять настройку для сервера могут только пользователи с правом «Управление сервером».",
+                ephemeral=True
             )
             return
-        
-        if isinstance(online_data, dict):
-            if not online_data.get('success', True):
-                error_msg = online_data.get('message', 'Неизвестная ошибка')
-                await interaction.followup.send(
-                    f"❌ Ошибка: {error_msg}"
-                )
-                return
-        
-        online_count = 0
-        if isinstance(online_data, dict):
-            online_count = online_data.get('online') or online_data.get('count') or 0
-        elif isinstance(online_data, (int, float)):
-            online_count = online_data
-        
-        await interaction.followup.send(
-            f"👥 Онлайн игроков: **{online_count}**"
+        await loop.run_in_executor(None, preferences.set, 'guilds', interaction.guild_id, 'resolution', profile.value)
+        await interaction.response.send_message(
+            f"✅ Разрешение изображений для сервера: **{profile.name}**", ephemeral=True
         )
-        
+        return
+
+    await loop.run_in_executor(None, preferences.set, 'users', interaction.user.id, 'resolution', profile.value)
+    await interaction.response.send_message(
+        f"✅ Ваше разрешение изображений: **{profile.name}**", ephemeral=True
+    )
+
+
+@bot.tree.command(name="profiler", description="Снять профиль CPU бота (только для владельца)")
+@app_commands.describe(seconds="Длительность профилирования в секундах")
+@app_commands.default_permissions(administrator=True)
+@loop_monitor.watch_handler
+async def profiler_command(interaction: discord.Interaction,
+                           seconds: app_commands.Range[int, 1, int(MAX_DURATION)] = 30):
+    if not await bot.is_owner(interaction.user):
+        await interaction.response.send_message("❌ Команда доступна только владельцу бота.", ephemeral=True)
+        return
+
+    future = profiler.start(seconds)
+    if future is None:
+        await interaction.response.send_message("⏳ Профилирование уже идёт, дождитесь результата.", ephemeral=True)
+        return
+    await interaction.response.send_message(f"🔬 Профилирование запущено на {seconds} с...", ephemeral=True)
+
+    try:
+        report = await asyncio.wrap_future(future)
     except Exception as e:
-        print(f"Ошибка в команде online: {e}")
-        await interaction.followup.send(
-            f"❌ Произошла ошибка при обработке запроса: {str(e)}"
-        )
+        await interaction.followup.send(f"❌ Ошибка профилирования: {e}", ephemeral=True)
+        return
+
+    lines = [f"🔬 Профиль готов: {report.samples} срезов за {report.duration:.1f} с"]
+    top = report.top()
+    if top:
+        lines.append("")
+        lines.append("Самые горячие функции бота:")
+        lines.extend(f"• `{name}` — {share:.1f}%" for name, share in top)
+    lines.append("")
+    lines.extend(f"`{path}`" for path in report.paths)
+    await interaction.followup.send("\n".join(lines), ephemeral=True)
 
 
 @bot.tree.command(name="test", description="Проверить соединение с API")
+@loop_monitor.watch_handler
 async def test_command(interaction: discord.Interaction):
     await interaction.response.defer()
     
-    is_connected = api_client.test_connection()
+    loop = asyncio.get_event_loop()
+    is_connected = await loop.run_in_executor(None, api_client.test_connection)
     
     if is_connected:
-        await interaction.followup.send("✅ Соединение с API установлено!")
+        await interaction.followup.send(f"✅ Соединение с API установлено! Состояние бота: **{startup.state}**")
     else:
-        await interaction.followup.send("❌ Не удалось подключиться к API")
+        await interaction.followup.send(f"❌ Не удалось подключиться к API. Состояние бота: **{startup.state}**")
 
 
 @bot.event
 async def on_command_error(ctx, error):
     if isinstance(error, commands.CommandNotFound):
         return
-    print(f"Ошибка команды: {error}")
+    logger.warning("Ошибка команды: %s", error)
 
 
 def main():
@@ -349,7 +671,7 @@ def main():
         return
     
     try:
-        bot.run(BOT_TOKEN)
+        bot.run(BOT_TOKEN, log_handler=None)
     except discord.LoginFailure:
         print("Ошибка: Неверный токен бота!")
     except Exception as e:
@@ -0,0 +1,85 @@
+from collections import deque
+from contextlib import contextmanager
+from typing import Callable, Optional
+import logging
+import threading
+import time
+
+from .metrics import metrics, percentile
+
+logger = logging.getLogger('admission')
+
+
+class AdmissionController:
+
+    def __init__(self, max_depth: int = 8, max_wait_ms: float = 5000.0, concurrency: int = 4,
+                 resume_ratio: float = 0.7, window: int = 50, depth_source: Optional[Callable[[], int]] = None):
+        self.max_depth = max_depth
+        self.max_wait_ms = max_wait_ms
+        self.concurrency = max(1, concurrency)
+        self.resume_ratio = resume_ratio
+        self.depth_source = depth_source
+        self._lock = threading.Lock()
+        self._pending = 0
+        self._latencies = deque(maxlen=window)
+        self._decisions = deque(maxlen=200)
+        self.shedding = False
+
+    @property
+    def depth(self) -> int:
+        depth = self._pending
+        if self.depth_source is not None:
+            try:
+                depth += self.depth_source()
+            except Exception:
+                pass
+        return depth
+
+    def expected_wait_ms(self, depth: Optional[int] = None) -> float:
+        depth = self.depth if depth is None else depth
+        p95 = percentile(self._latencies, 95) or 0.0
+        return p95 * (depth + 1) / self.concurrency
+
+    def admit(self, command: str) -> bool:
+        with self._lock:
+            depth = self.depth
+            wait_ms = self.expected_wait_ms(depth)
+            ratio = self.resume_ratio if self.shedding else 1.0
+            overloaded = depth >= self.max_depth * ratio or wait_ms > self.max_wait_ms * ratio
+
+            if overloaded != self.shedding:
+                self.shedding = overloaded
+                if overloaded:
+                    logger.warning("Очередь рендеринга перегружена (глубина %d, ожидание ~%.0fмс), "
+                                   "отвечаем без изображений", depth, wait_ms)
+                else:
+                    logger.info("Нагрузка на рендеринг снизилась, изображения снова включены")
+
+            self._decisions.append(0 if overloaded else 1)
+            shed_rate = 1 - sum(self._decisions) / len(self._decisions)
+
+        metrics.inc('render_shed' if overloaded else 'render_admitted', command=command)
+        metrics.set('render_shed_rate', shed_rate)
+        metrics.set('render_queue_depth', depth)
+        return not overloaded
+
+    @contextmanager
+    def pending(self):
+        with self._lock:
+            self._pending += 1
+        try:
+            yield
+        finally:
+            with self._lock:
+                self._pending -= 1
+
+    @contextmanager
+    def rendering(self, command: str):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed_ms = (time.perf_counter() - started) * 1000
+            with self._lock:
+                self._latencies.append(elapsed_ms)
+            metrics.observe('render_ms', elapsed_ms, command=command)
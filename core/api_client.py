@@ -1,6 +1,12 @@
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, TimeoutError as FutureTimeout, wait
 import requests
-from typing import Dict, Optional
+from typing import Dict, Iterable, Optional, Set
 import logging
+import time
+
+from . import codec
+from .endpoints import Endpoint, EndpointPool, HedgeBudget
+from .metrics import metrics
 
 logger = logging.getLogger('AgeraPvPAPI')
 
@@ -9,10 +15,18 @@ class AgeraPvPAPI:
     
     BASE_URL = "http://api.agerapvp.club"
     
-    def __init__(self, api_key: str = None):
+    def __init__(self, api_key: str = None, base_urls: Optional[Iterable[str]] = None, hedge_ratio: float = 0.05,
+                 hedge_min_delay: float = 0.05, hedge_workers: int = 32):
+        self.endpoints = EndpointPool(base_urls or (self.BASE_URL,))
+        self.hedge_budget = HedgeBudget(hedge_ratio)
+        self.hedge_min_delay = hedge_min_delay
+        self._hedge_pool = ThreadPoolExecutor(max_workers=hedge_workers, thread_name_prefix='api-hedge') \
+            if hedge_ratio > 0 and len(self.endpoints.endpoints) > 1 else None
         self.session = requests.Session()
         headers = {
-            'User-Agent': 'AgeraPvP-Discord-Bot/1.0'
+            'User-Agent': 'AgeraPvP-Discord-Bot/1.0',
+            'Accept-Encoding': codec.ACCEPT_ENCODING,
+            'Accept': 'application/json'
         }
         
         if api_key:
@@ -20,153 +34,268 @@ class AgeraPvPAPI:
         
         self.session.headers.update(headers)
     
-    def get_player_stats(self, name: str, mode: str) -> Optional[Dict]:
-        url = f"{self.BASE_URL}/v1/player/stats/{name}/{mode}"
+    def _attempt(self, endpoint: Endpoint, path: str, timeout: float) -> requests.Response:
+        started = time.perf_counter()
+        try:
+            response = self.session.get(f"{endpoint.url}{path}", timeout=timeout)
+        except requests.exceptions.RequestException:
+            self.endpoints.record(endpoint, False)
+            raise
+        self.endpoints.record(endpoint, response.status_code < 500, (time.perf_counter() - started) * 1000)
+        return response
+    
+    @staticmethod
+    def _close_late(future):
+        if not future.cancelled() and future.exception() is None:
+            future.result().close()
+    
+    def _hedged(self, primary: Endpoint, alternate: Endpoint, path: str, timeout: float,
+                tried: Set[Endpoint]) -> requests.Response:
+        first = self._hedge_pool.submit(self._attempt, primary, path, timeout)
+        p95 = primary.percentile(95)
+        if p95 is None:
+            return first.result()
+        delay = max(self.hedge_min_delay, p95 / 1000)
+        if delay >= timeout:
+            return first.result()
+        try:
+            return first.result(timeout=delay)
+        except FutureTimeout:
+            pass
+        if not self.hedge_budget.spend():
+            metrics.inc('api_hedge_skipped', host=primary.host)
+            return first.result()
+        
+        tried.add(alternate)
+        metrics.inc('api_hedged', host=alternate.host)
+        logger.debug("Запрос %s к %s дольше %.0fмс, дублируем на %s", path, primary.host, delay * 1000, alternate.host)
+        second = self._hedge_pool.submit(self._attempt, alternate, path, timeout - delay)
+        pending = {first, second}
+        failed = []
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is not None or future.result().status_code >= 500:
+                    failed.append(future)
+                    continue
+                for loser in pending:
+                    loser.add_done_callback(self._close_late)
+                for loser in failed:
+                    self._close_late(loser)
+                if future is second:
+                    metrics.inc('api_hedge_won', host=alternate.host)
+                return future.result()
+
+        answered = [future for future in failed if future.exception() is None]
+        if not answered:
+            return failed[0].result()
+        for loser in answered[1:]:
+            self._close_late(loser)
+        return answered[0].result()
+    
+    def _get(self, path: str, timeout: float, hedge: bool = True) -> requests.Response:
+        deadline = time.monotonic() + timeout
+        ranked = self.endpoints.ranked()
+        self.hedge_budget.earn()
+        error: Optional[Exception] = None
+        tried: Set[Endpoint] = set()
+        for index, endpoint in enumerate(ranked):
+            if endpoint in tried:
+                continue
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            if tried:
+                metrics.inc('api_failover', host=endpoint.host)
+                logger.warning("Повторяем запрос %s через %s: %s", path, endpoint.host, error)
+            tried.add(endpoint)
+            alternate = next((other for other in ranked[index + 1:] if other not in tried), None)
+            try:
+                if hedge and alternate is not None and self._hedge_pool is not None:
+                    response = self._hedged(endpoint, alternate, path, remaining, tried)
+                else:
+                    response = self._attempt(endpoint, path, remaining)
+            except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as e:
+                error = e
+                continue
+            if response.status_code >= 500 and len(tried) < len(ranked):
+                error = requests.exceptions.HTTPError(f"статус {response.status_code}", response=response)
+                response.close()
+                continue
+            return response
+        raise error or requests.exceptions.Timeout(f"Истекло время ожидания ответа API для {path}")
+    
+    def _decode(self, response: requests.Response, endpoint: str):
+        body = response.content
+        started = time.perf_counter()
+        try:
+            data = codec.loads(body)
+        except ValueError as e:
+            raise requests.exceptions.InvalidJSONError(f"Некорректный JSON от API: {e}", response=response)
+        metrics.observe('api_decode_ms', (time.perf_counter() - started) * 1000, endpoint=endpoint)
+        
+        wire_bytes = None
+        if response.raw is not None and hasattr(response.raw, 'tell'):
+            try:
+                wire_bytes = response.raw.tell()
+            except Exception:
+                wire_bytes = None
+        if not wire_bytes:
+            wire_bytes = int(response.headers.get('Content-Length') or len(body))
+        
+        encoding = response.headers.get('Content-Encoding', 'identity')
+        metrics.inc('api_bytes_wire', wire_bytes, endpoint=endpoint)
+        metrics.inc('api_bytes_decoded', len(body), endpoint=endpoint)
+        metrics.inc('api_responses', endpoint=endpoint, encoding=encoding)
+        return data
+    
+    def get_player_stats(self, name: str, mode: str, timeout: float = 10) -> Optional[Dict]:
+        url = f"/v1/player/stats/{name}/{mode}"
         
         try:
-            logger.debug(f"Запрос статистики игрока: {url}")
-            response = self.session.get(url, timeout=10)
-            logger.debug(f"Ответ API: статус {response.status_code}, URL: {url}")
+            logger.debug("Запрос статистики игрока: %s", url)
+            response = self._get(url, timeout)
+            logger.debug("Ответ API: статус %s, URL: %s", response.status_code, url)
             response.raise_for_status()
-            return response.json()
+            return self._decode(response, 'player_stats')
         except requests.exceptions.Timeout as e:
-            logger.error(f"Таймаут при запросе статистики игрока {name} ({mode}): {e}, URL: {url}")
+            logger.error("Таймаут при запросе статистики игрока %s (%s): %s, URL: %s", name, mode, e, url)
             return None
         except requests.exceptions.ConnectionError as e:
-            logger.error(f"Ошибка подключения при запросе статистики игрока {name} ({mode}): {e}, URL: {url}")
+            logger.error("Ошибка подключения при запросе статистики игрока %s (%s): %s, URL: %s", name, mode, e, url)
             return None
         except requests.exceptions.HTTPError as e:
             status_code = e.response.status_code if e.response is not None else 'unknown'
             response_text = e.response.text[:200] if e.response is not None else 'N/A'
-            logger.error(f"HTTP ошибка при запросе статистики игрока {name} ({mode}): статус {status_code}, ответ: {response_text}, URL: {url}")
+            logger.error("HTTP ошибка при запросе статистики игрока %s (%s): статус %s, ответ: %s, URL: %s", name, mode, status_code, response_text, url)
             return None
         except requests.exceptions.RequestException as e:
-            logger.error(f"Ошибка при запросе статистики игрока {name} ({mode}): {type(e).__name__}: {e}, URL: {url}")
+            logger.error("Ошибка при запросе статистики игрока %s (%s): %s: %s, URL: %s", name, mode, type(e).__name__, e, url)
             return None
     
-    def get_player_profile(self, name: str) -> Optional[Dict]:
-        url = f"{self.BASE_URL}/v1/player/profile/{name}"
+    def get_player_profile(self, name: str, timeout: float = 10) -> Optional[Dict]:
+        url = f"/v1/player/profile/{name}"
         
         try:
-            logger.debug(f"Запрос профиля игрока: {url}")
-            response = self.session.get(url, timeout=10)
-            logger.debug(f"Ответ API: статус {response.status_code}, URL: {url}")
+            logger.debug("Запрос профиля игрока: %s", url)
+            response = self._get(url, timeout)
+            logger.debug("Ответ API: статус %s, URL: %s", response.status_code, url)
             response.raise_for_status()
-            return response.json()
+            return self._decode(response, 'player_profile')
         except requests.exceptions.Timeout as e:
-            logger.error(f"Таймаут при запросе профиля игрока {name}: {e}, URL: {url}")
+            logger.error("Таймаут при запросе профиля игрока %s: %s, URL: %s", name, e, url)
             return None
         except requests.exceptions.ConnectionError as e:
-            logger.error(f"Ошибка подключения при запросе профиля игрока {name}: {e}, URL: {url}")
+            logger.error("Ошибка подключения при запросе профиля игрока %s: %s, URL: %s", name, e, url)
             return None
         except requests.exceptions.HTTPError as e:
             status_code = e.response.status_code if e.response is not None else 'unknown'
             response_text = e.response.text[:200] if e.response is not None else 'N/A'
-            logger.error(f"HTTP ошибка при запросе профиля игрока {name}: статус {status_code}, ответ: {response_text}, URL: {url}")
+            logger.error("HTTP ошибка при запросе профиля игрока %s: статус %s, ответ: %s, URL: %s", name, status_code, response_text, url)
             return None
         except requests.exceptions.RequestException as e:
-            logger.error(f"Ошибка при запросе профиля игрока {name}: {type(e).__name__}: {e}, URL: {url}")
+            logger.error("Ошибка при запросе профиля игрока %s: %s: %s, URL: %s", name, type(e).__name__, e, url)
             return None
     
-    def get_staff_stats(self) -> Optional[Dict]:
-        url = f"{self.BASE_URL}/v1/staff/stats"
+    def get_staff_stats(self, timeout: float = 10) -> Optional[Dict]:
+        url = "/v1/staff/stats"
         
         try:
-            logger.debug(f"Запрос статистики стаффа: {url}")
-            response = self.session.get(url, timeout=10)
-            logger.debug(f"Ответ API: статус {response.status_code}, URL: {url}")
+            logger.debug("Запрос статистики стаффа: %s", url)
+            response = self._get(url, timeout)
+            logger.debug("Ответ API: статус %s, URL: %s", response.status_code, url)
             response.raise_for_status()
-            return response.json()
+            return self._decode(response, 'staff_stats')
         except requests.exceptions.Timeout as e:
-            logger.error(f"Таймаут при запросе статистики стаффа: {e}, URL: {url}")
+            logger.error("Таймаут при запросе статистики стаффа: %s, URL: %s", e, url)
             return None
         except requests.exceptions.ConnectionError as e:
-            logger.error(f"Ошибка подключения при запросе статистики стаффа: {e}, URL: {url}")
+            logger.error("Ошибка подключения при запросе статистики стаффа: %s, URL: %s", e, url)
             return None
         except requests.exceptions.HTTPError as e:
             status_code = e.response.status_code if e.response is not None else 'unknown'
             response_text = e.response.text[:200] if e.response is not None else 'N/A'
-            logger.error(f"HTTP ошибка при запросе статистики стаффа: статус {status_code}, ответ: {response_text}, URL: {url}")
+            logger.error("HTTP ошибка при запросе статистики стаффа: статус %s, ответ: %s, URL: %s", status_code, response_text, url)
             return None
         except requests.exceptions.RequestException as e:
-            logger.error(f"Ошибка при запросе статистики стаффа: {type(e).__name__}: {e}, URL: {url}")
+            logger.error("Ошибка при запросе статистики стаффа: %s: %s, URL: %s", type(e).__name__, e, url)
             return None
     
-    def get_staff_online(self) -> Optional[Dict]:
-        url = f"{self.BASE_URL}/v1/staff/online"
+    def get_staff_online(self, timeout: float = 10) -> Optional[Dict]:
+        url = "/v1/staff/online"
         
         try:
-            logger.debug(f"Запрос онлайн стаффа: {url}")
-            response = self.session.get(url, timeout=10)
-            logger.debug(f"Ответ API: статус {response.status_code}, URL: {url}")
+            logger.debug("Запрос онлайн стаффа: %s", url)
+            response = self._get(url, timeout)
+            logger.debug("Ответ API: статус %s, URL: %s", response.status_code, url)
             response.raise_for_status()
-            return response.json()
+            return self._decode(response, 'staff_online')
         except requests.exceptions.Timeout as e:
-            logger.error(f"Таймаут при запросе онлайн стаффа: {e}, URL: {url}")
+            logger.error("Таймаут при запросе онлайн стаффа: %s, URL: %s", e, url)
             return None
         except requests.exceptions.ConnectionError as e:
-            logger.error(f"Ошибка подключения при запросе онлайн стаффа: {e}, URL: {url}")
+            logger.error("Ошибка подключения при запросе онлайн стаффа: %s, URL: %s", e, url)
             return None
         except requests.exceptions.HTTPError as e:
             status_code = e.response.status_code if e.response is not None else 'unknown'
             response_text = e.response.text[:200] if e.response is not None else 'N/A'
-            logger.error(f"HTTP ошибка при запросе онлайн стаффа: статус {status_code}, ответ: {response_text}, URL: {url}")
+            logger.error("HTTP ошибка при запросе онлайн стаффа: статус %s, ответ: %s, URL: %s", status_code, response_text, url)
             return None
         except requests.exceptions.RequestException as e:
-            logger.error(f"Ошибка при запросе онлайн стаффа: {type(e).__name__}: {e}, URL: {url}")
+            logger.error("Ошибка при запросе онлайн стаффа: %s: %s, URL: %s", type(e).__name__, e, url)
             return None
     
-    def get_total_online(self) -> Optional[Dict]:
-        url = f"{self.BASE_URL}/v1/core/online/total"
+    def get_total_online(self, timeout: float = 10) -> Optional[Dict]:
+        url = "/v1/core/online/total"
         
         try:
-            logger.debug(f"Запрос общего онлайн: {url}")
-            response = self.session.get(url, timeout=10)
-            logger.debug(f"Ответ API: статус {response.status_code}, URL: {url}")
+            logger.debug("Запрос общего онлайн: %s", url)
+            response = self._get(url, timeout)
+            logger.debug("Ответ API: статус %s, URL: %s", response.status_code, url)
             response.raise_for_status()
-            return response.json()
+            return self._decode(response, 'total_online')
         except requests.exceptions.Timeout as e:
-            logger.error(f"Таймаут при запросе общего онлайн: {e}, URL: {url}")
+            logger.error("Таймаут при запросе общего онлайн: %s, URL: %s", e, url)
             return None
         except requests.exceptions.ConnectionError as e:
-            logger.error(f"Ошибка подключения при запросе общего онлайн: {e}, URL: {url}")
+            logger.error("Ошибка подключения при запросе общего онлайн: %s, URL: %s", e, url)
             return None
         except requests.exceptions.HTTPError as e:
             status_code = e.response.status_code if e.response is not None else 'unknown'
             response_text = e.response.text[:200] if e.response is not None else 'N/A'
-            logger.error(f"HTTP ошибка при запросе общего онлайн: статус {status_code}, ответ: {response_text}, URL: {url}")
+            logger.error("HTTP ошибка при запросе общего онлайн: статус %s, ответ: %s, URL: %s", status_code, response_text, url)
             return None
         except requests.exceptions.RequestException as e:
-            logger.error(f"Ошибка при запросе общего онлайн: {type(e).__name__}: {e}, URL: {url}")
+            logger.error("Ошибка при запросе общего онлайн: %s: %s, URL: %s", type(e).__name__, e, url)
             return None
     
     def test_connection(self) -> bool:
-        url = f"{self.BASE_URL}/v1/test"
+        url = "/v1/test"
         
         try:
-            logger.info(f"Проверка подключения к API: {url}")
-            logger.debug(f"Заголовки запроса: {dict(self.session.headers)}")
-            response = self.session.get(url, timeout=5)
-            logger.info(f"Ответ от API: статус {response.status_code}, URL: {url}")
+            logger.info("Проверка подключения к API: %s", url)
+            response = self._get(url, 5, hedge=False)
+            logger.info("Ответ от API: статус %s, URL: %s", response.status_code, url)
             
             if response.status_code == 200:
                 logger.info("Соединение с API успешно установлено")
                 return True
             else:
-                logger.warning(f"API вернул неожиданный статус код: {response.status_code}, ответ: {response.text[:200]}")
+                logger.warning("API вернул неожиданный статус код: %s, ответ: %s", response.status_code, response.text[:200])
                 return False
         except requests.exceptions.Timeout as e:
-            logger.error(f"Таймаут при проверке подключения к API: {e}, URL: {url}")
+            logger.error("Таймаут при проверке подключения к API: %s, URL: %s", e, url)
             return False
         except requests.exceptions.ConnectionError as e:
-            logger.error(f"Ошибка подключения к API: {e}, URL: {url}")
-            logger.error(f"Проверьте, доступен ли сервер {self.BASE_URL} и есть ли интернет-соединение")
+            logger.error("Ошибка подключения к API: %s, URL: %s", e, url)
+            logger.error("Проверьте, доступен ли сервер %s и есть ли интернет-соединение",
+                         ", ".join(endpoint.host for endpoint in self.endpoints.endpoints))
             return False
         except requests.exceptions.HTTPError as e:
-            logger.error(f"HTTP ошибка при проверке подключения: {e}, URL: {url}")
+            logger.error("HTTP ошибка при проверке подключения: %s, URL: %s", e, url)
             if hasattr(e, 'response') and e.response is not None:
-                logger.error(f"Статус код: {e.response.status_code}, ответ: {e.response.text[:200]}")
+                logger.error("Статус код: %s, ответ: %s", e.response.status_code, e.response.text[:200])
             return False
         except requests.exceptions.RequestException as e:
-            logger.error(f"Неожиданная ошибка при проверке подключения к API: {type(e).__name__}: {e}, URL: {url}")
+            logger.error("Неожиданная ошибка при проверке подключения к API: %s: %s, URL: %s", type(e).__name__, e, url)
             return False
\ No newline at end of file
@@ -0,0 +1,59 @@
+from typing import Optional
+from urllib.parse import parse_qs, urlparse
+import hashlib
+import io
+import time
+
+from .cache import ResponseCache
+from .metrics import metrics
+
+
+class AttachmentRegistry:
+
+    def __init__(self, cache: ResponseCache, ttl: float = 3600.0, expiry_margin: float = 300.0):
+        self.cache = cache
+        self.ttl = ttl
+        self.expiry_margin = expiry_margin
+
+    @staticmethod
+    def digest(image: io.BytesIO) -> str:
+        return hashlib.sha256(image.getbuffer()).hexdigest()
+
+    @staticmethod
+    def _key(digest: str) -> str:
+        return f"attachment:{digest}"
+
+    def _ttl_for(self, url: str) -> float:
+        ttl = self.ttl
+        expires = parse_qs(urlparse(url).query).get('ex')
+        if expires:
+            try:
+                ttl = min(ttl, int(expires[0], 16) - time.time() - self.expiry_margin)
+            except ValueError:
+                pass
+        return ttl
+
+    def lookup(self, digest: str) -> Optional[str]:
+        if self.ttl <= 0:
+            return None
+        url = self.cache.get(self._key(digest))
+        metrics.inc('attachment_lookups', result='hit' if url else 'miss')
+        return url
+
+    def remember(self, digest: str, message) -> Optional[str]:
+        attachments = getattr(message, 'attachments', None)
+        if not attachments:
+            return None
+        return self.remember_url(digest, attachments[0].url)
+
+    def remember_url(self, digest: str, url: Optional[str]) -> Optional[str]:
+        if not url or self.ttl <= 0:
+            return None
+        ttl = self._ttl_for(url)
+        if ttl > 0:
+            self.cache.set(self._key(digest), url, ttl)
+        return url
+
+    def forget(self, digest: str):
+        self.cache.delete(self._key(digest))
+        metrics.inc('attachment_reuse_failures')
@@ -0,0 +1,48 @@
+from typing import Any, Optional
+import time
+
+from .memory import BudgetedLRU, deep_sizeof
+
+
+class ResponseCache:
+
+    stores_objects = False
+
+    def get(self, key: str) -> Optional[Any]:
+        raise NotImplementedError
+
+    def set(self, key: str, value: Any, ttl: float):
+        raise NotImplementedError
+
+    def delete(self, key: str):
+        raise NotImplementedError
+
+
+class MemoryResponseCache(ResponseCache):
+
+    stores_objects = True
+
+    def __init__(self, max_entries: int = 1024, max_bytes: int = 64 * 1024 * 1024, name: str = 'responses'):
+        self.max_entries = max_entries
+        self._entries = BudgetedLRU(name, max_bytes, max_entries=max_entries)
+
+    def get(self, key: str) -> Optional[Any]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires_at, value = entry
+        if expires_at <= time.monotonic():
+            self._entries.pop(key)
+            return None
+        return value
+
+    def set(self, key: str, value: Any, ttl: float):
+        if ttl <= 0:
+            return
+        self._entries.put(key, (time.monotonic() + ttl, value), deep_sizeof(key) + deep_sizeof(value))
+
+    def delete(self, key: str):
+        self._entries.pop(key)
+
+    def __len__(self):
+        return len(self._entries)
@@ -0,0 +1,31 @@
+from typing import Optional
+import time
+
+
+class DeadlineExceeded(Exception):
+    pass
+
+
+class Deadline:
+
+    __slots__ = ('expires_at',)
+
+    def __init__(self, expires_at: float):
+        self.expires_at = expires_at
+
+    @classmethod
+    def after(cls, seconds: float, start: Optional[float] = None) -> 'Deadline':
+        return cls((time.time() if start is None else start) + seconds)
+
+    def remaining(self) -> float:
+        return self.expires_at - time.time()
+
+    @property
+    def expired(self) -> bool:
+        return self.remaining() <= 0
+
+    def timeout(self, limit: float, reserve: float = 0.0) -> float:
+        remaining = self.remaining() - reserve
+        if remaining <= 0:
+            raise DeadlineExceeded("Бюджет времени команды исчерпан")
+        return min(limit, remaining)
@@ -0,0 +1,85 @@
+from typing import Iterable, List, Optional
+from urllib.parse import urlsplit
+import logging
+import threading
+import time
+
+from .metrics import metrics
+
+logger = logging.getLogger('endpoints')
+
+
+class Endpoint:
+
+    __slots__ = ('url', 'host', 'error_rate', 'failures', 'cooldown_until')
+
+    def __init__(self, url: str):
+        self.url = url.rstrip('/')
+        self.host = urlsplit(self.url).netloc or self.url
+        self.error_rate = 0.0
+        self.failures = 0
+        self.cooldown_until = 0.0
+
+    def percentile(self, q: int) -> Optional[float]:
+        return metrics.percentiles('api_latency_ms', (q,), host=self.host)[q]
+
+
+class EndpointPool:
+
+    def __init__(self, urls: Iterable[str], max_failures: int = 3, cooldown: float = 30.0,
+                 decay: float = 0.1, default_latency_ms: float = 200.0):
+        self.endpoints = [Endpoint(url) for url in dict.fromkeys(url.strip() for url in urls if url.strip())]
+        if not self.endpoints:
+            raise ValueError("Не задан ни один адрес API")
+        self.max_failures = max_failures
+        self.cooldown = cooldown
+        self.decay = decay
+        self.default_latency_ms = default_latency_ms
+        self._lock = threading.Lock()
+
+    def _score(self, endpoint: Endpoint, now: float) -> tuple:
+        latency = endpoint.percentile(50) or self.default_latency_ms
+        return endpoint.cooldown_until > now, latency * (1 + 10 * endpoint.error_rate)
+
+    def ranked(self) -> List[Endpoint]:
+        now = time.monotonic()
+        with self._lock:
+            return sorted(self.endpoints, key=lambda endpoint: self._score(endpoint, now))
+
+    def record(self, endpoint: Endpoint, ok: bool, elapsed_ms: Optional[float] = None):
+        if elapsed_ms is not None:
+            metrics.observe('api_latency_ms', elapsed_ms, host=endpoint.host)
+        with self._lock:
+            endpoint.error_rate += self.decay * ((0.0 if ok else 1.0) - endpoint.error_rate)
+            if ok:
+                endpoint.failures = 0
+                endpoint.cooldown_until = 0.0
+            else:
+                endpoint.failures += 1
+                if endpoint.failures == self.max_failures and len(self.endpoints) > 1:
+                    endpoint.cooldown_until = time.monotonic() + self.cooldown
+                    logger.warning("API %s недоступен (%d ошибок подряд), переключаемся на резервные адреса",
+                                   endpoint.host, endpoint.failures)
+            healthy = endpoint.cooldown_until <= time.monotonic()
+        metrics.set('api_endpoint_healthy', 1 if healthy else 0, host=endpoint.host)
+        metrics.set('api_endpoint_error_rate', endpoint.error_rate, host=endpoint.host)
+
+
+class HedgeBudget:
+
+    def __init__(self, ratio: float = 0.05, burst: float = 10.0):
+        self.ratio = max(0.0, ratio)
+        self.burst = burst
+        self._tokens = burst if ratio > 0 else 0.0
+        self._lock = threading.Lock()
+
+    def earn(self):
+        with self._lock:
+            self._tokens = min(self.burst, self._tokens + self.ratio)
+
+    def spend(self) -> bool:
+        with self._lock:
+            if self._tokens < 1:
+                return False
+            self._tokens -= 1
+            return True
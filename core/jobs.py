@@ -0,0 +1,213 @@
+from typing import Any, Dict, Optional
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+
+from . import codec
+from .cache import ResponseCache
+
+logger = logging.getLogger('job_queue')
+
+INTERACTION_TOKEN_TTL = 15 * 60
+
+
+class Job:
+
+    def __init__(self, job_id: Optional[int], command: str, args: Dict,
+                 application_id: int, token: str, created_at: Optional[float] = None, attempts: int = 0):
+        self.id = job_id
+        self.command = command
+        self.args = args
+        self.application_id = application_id
+        self.token = token
+        self.created_at = time.time() if created_at is None else created_at
+        self.attempts = attempts
+
+    def is_expired(self) -> bool:
+        return time.time() - self.created_at >= INTERACTION_TOKEN_TTL
+
+
+class JobQueue:
+
+    def put(self, job: Job) -> int:
+        raise NotImplementedError
+
+    def get(self, timeout: float = 1.0, worker: str = '') -> Optional[Job]:
+        raise NotImplementedError
+
+    def ack(self, job: Job):
+        raise NotImplementedError
+
+    def fail(self, job: Job, retry: bool = True):
+        raise NotImplementedError
+
+    def depth(self) -> int:
+        raise NotImplementedError
+
+    def response_cache(self) -> ResponseCache:
+        raise NotImplementedError
+
+
+class SQLiteBackend:
+
+    def __init__(self, path: str):
+        self.path = path
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._local = threading.local()
+        self._init_schema()
+
+    def connection(self) -> sqlite3.Connection:
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def _init_schema(self):
+        conn = self.connection()
+        conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS jobs (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                command TEXT NOT NULL,
+                args TEXT NOT NULL,
+                application_id INTEGER NOT NULL,
+                token TEXT NOT NULL,
+                status TEXT NOT NULL DEFAULT 'pending',
+                attempts INTEGER NOT NULL DEFAULT 0,
+                created_at REAL NOT NULL,
+                claimed_at REAL,
+                worker TEXT
+            );
+            CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status, id);
+            CREATE TABLE IF NOT EXISTS response_cache (
+                key TEXT PRIMARY KEY,
+                value BLOB NOT NULL,
+                expires_at REAL NOT NULL
+            );
+            """
+        )
+
+
+class SQLiteResponseCache(ResponseCache):
+
+    def __init__(self, backend: SQLiteBackend):
+        self.backend = backend
+
+    def get(self, key: str) -> Optional[Any]:
+        row = self.backend.connection().execute(
+            "SELECT value, expires_at FROM response_cache WHERE key = ?", (key,)
+        ).fetchone()
+        if row is None:
+            return None
+        if row[1] <= time.time():
+            self.delete(key)
+            return None
+        return codec.loads(row[0])
+
+    def set(self, key: str, value: Any, ttl: float):
+        if ttl <= 0:
+            return
+        self.backend.connection().execute(
+            "INSERT OR REPLACE INTO response_cache (key, value, expires_at) VALUES (?, ?, ?)",
+            (key, codec.dumps(value), time.time() + ttl)
+        )
+
+    def delete(self, key: str):
+        self.backend.connection().execute("DELETE FROM response_cache WHERE key = ?", (key,))
+
+    def purge_expired(self) -> int:
+        cursor = self.backend.connection().execute(
+            "DELETE FROM response_cache WHERE expires_at <= ?", (time.time(),)
+        )
+        return cursor.rowcount
+
+
+class SQLiteJobQueue(JobQueue):
+
+    def __init__(self, path: str, visibility_timeout: float = 120.0, max_attempts: int = 3,
+                 poll_interval: float = 0.05):
+        self.backend = SQLiteBackend(path)
+        self.visibility_timeout = visibility_timeout
+        self.max_attempts = max_attempts
+        self.poll_interval = poll_interval
+        self._cache = SQLiteResponseCache(self.backend)
+
+    def put(self, job: Job) -> int:
+        cursor = self.backend.connection().execute(
+            "INSERT INTO jobs (command, args, application_id, token, created_at) VALUES (?, ?, ?, ?, ?)",
+            (job.command, json.dumps(job.args, ensure_ascii=False), job.application_id, job.token, job.created_at)
+        )
+        job.id = cursor.lastrowid
+        return job.id
+
+    def _claim(self, worker: str) -> Optional[Job]:
+        conn = self.backend.connection()
+        now = time.time()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.execute(
+                "UPDATE jobs SET status = 'pending' WHERE status = 'running' AND claimed_at < ?",
+                (now - self.visibility_timeout,)
+            )
+            row = conn.execute(
+                "SELECT id, command, args, application_id, token, created_at, attempts "
+                "FROM jobs WHERE status = 'pending' ORDER BY id LIMIT 1"
+            ).fetchone()
+            if row is None:
+                conn.execute("COMMIT")
+                return None
+            conn.execute(
+                "UPDATE jobs SET status = 'running', claimed_at = ?, worker = ?, attempts = attempts + 1 "
+                "WHERE id = ?",
+                (now, worker, row[0])
+            )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return Job(row[0], row[1], json.loads(row[2]), row[3], row[4], row[5], row[6] + 1)
+
+    def get(self, timeout: float = 1.0, worker: str = '') -> Optional[Job]:
+        deadline = time.monotonic() + timeout
+        while True:
+            job = self._claim(worker)
+            if job is not None or time.monotonic() >= deadline:
+                return job
+            time.sleep(self.poll_interval)
+
+    def ack(self, job: Job):
+        self.backend.connection().execute("DELETE FROM jobs WHERE id = ?", (job.id,))
+
+    def fail(self, job: Job, retry: bool = True):
+        conn = self.backend.connection()
+        if retry and job.attempts < self.max_attempts and not job.is_expired():
+            conn.execute("UPDATE jobs SET status = 'pending', claimed_at = NULL WHERE id = ?", (job.id,))
+        else:
+            conn.execute("UPDATE jobs SET status = 'failed' WHERE id = ?", (job.id,))
+
+    def depth(self) -> int:
+        row = self.backend.connection().execute(
+            "SELECT COUNT(*) FROM jobs WHERE status IN ('pending', 'running')"
+        ).fetchone()
+        return row[0]
+
+    def response_cache(self) -> ResponseCache:
+        return self._cache
+
+
+def default_queue_url(data_dir: str) -> str:
+    return f"sqlite:///{os.path.join(data_dir, 'jobs.sqlite3')}"
+
+
+def create_job_queue(url: str) -> JobQueue:
+    if url.startswith('sqlite:///'):
+        return SQLiteJobQueue(url[len('sqlite:///'):])
+    raise ValueError(f"Неподдерживаемый бэкенд очереди: {url}")
@@ -0,0 +1,205 @@
+from bisect import bisect_left, insort
+from typing import Dict, List, Optional, Tuple
+import json
+import logging
+import os
+import threading
+import time
+
+from .models import PlayerStats
+
+logger = logging.getLogger('leaderboard')
+
+DERIVED_STATS = {
+    'kd': lambda v: v['kills'] / max(v['deaths'], 1) if 'kills' in v and 'deaths' in v else None,
+    'wl': lambda v: v['wins'] / max(v['losses'], 1) if 'wins' in v and 'losses' in v else None,
+    'winrate': lambda v: v['wins'] / (v['wins'] + v['losses']) * 100
+    if 'wins' in v and 'losses' in v and v['wins'] + v['losses'] > 0 else None,
+}
+
+NAME_KEYS = ('name', 'playerName')
+
+
+def numeric_stats(stats: PlayerStats, excluded_keys=frozenset()) -> Dict[str, float]:
+    values = {}
+    for key, value, parent in stats.fields:
+        if parent is None and key not in excluded_keys and isinstance(value, (int, float)) \
+                and not isinstance(value, bool):
+            values[key] = float(value)
+    for key, derive in DERIVED_STATS.items():
+        if key not in values:
+            derived = derive(values)
+            if derived is not None:
+                values[key] = round(derived, 4)
+    return values
+
+
+class TopK:
+
+    __slots__ = ('k', 'entries', 'members')
+
+    def __init__(self, k: int):
+        self.k = k
+        self.entries: List[Tuple[float, str]] = []
+        self.members: Dict[str, float] = {}
+
+    def discard(self, player: str):
+        value = self.members.pop(player, None)
+        if value is not None:
+            index = bisect_left(self.entries, (-value, player))
+            del self.entries[index]
+
+    def update(self, player: str, value: Optional[float]):
+        self.discard(player)
+        if value is None:
+            return
+        entry = (-value, player)
+        if len(self.entries) >= self.k and entry >= self.entries[-1]:
+            return
+        insort(self.entries, entry)
+        self.members[player] = value
+        if len(self.entries) > self.k:
+            _, dropped = self.entries.pop()
+            del self.members[dropped]
+
+    def rebuild(self, values: Dict[str, float]):
+        self.entries = sorted((-value, player) for player, value in values.items())[:self.k]
+        self.members = {player: -value for value, player in self.entries}
+
+
+class LeaderboardIndex:
+
+    def __init__(self, path: str, top_k: int = 100, save_interval: float = 60.0, excluded_keys=frozenset()):
+        self.path = path
+        self.top_k = top_k
+        self.excluded_keys = frozenset(excluded_keys)
+        self.save_interval = save_interval
+        self._lock = threading.RLock()
+        self._players: Dict[str, Dict[str, dict]] = {}
+        self._boards: Dict[Tuple[str, str], TopK] = {}
+        self._dirty = False
+        self._saved_at = time.monotonic()
+        self._loaded_mtime = 0.0
+        self._reload()
+
+    def _board(self, mode: str, stat: str) -> TopK:
+        board = self._boards.get((mode, stat))
+        if board is None:
+            board = self._boards[(mode, stat)] = TopK(self.top_k)
+        return board
+
+    def _apply(self, mode: str, player: str, entry: dict):
+        players = self._players.setdefault(mode, {})
+        previous = players.get(player)
+        players[player] = entry
+        stats = set(entry['values'])
+        if previous is not None:
+            stats.update(previous['values'])
+
+        for stat in stats:
+            board = self._board(mode, stat)
+            old_value = board.members.get(player)
+            value = entry['values'].get(stat)
+            board.update(player, value)
+            if old_value is not None and (value is None or value < old_value):
+                population = {name: data['values'][stat] for name, data in players.items()
+                              if stat in data['values']}
+                if len(population) > len(board.entries):
+                    board.rebuild(population)
+
+    def update(self, stats: PlayerStats):
+        if not stats.valid or not stats.mode or not stats.nickname:
+            return
+        values = numeric_stats(stats, self.excluded_keys)
+        if not values:
+            return
+
+        mode = stats.mode.upper()
+        player = stats.nickname.lower()
+        name = next((stats.get(key) for key in NAME_KEYS if isinstance(stats.get(key), str)), stats.nickname)
+
+        with self._lock:
+            previous = self._players.get(mode, {}).get(player)
+            if previous is not None and previous['values'] == values and previous['name'] == name:
+                return
+            self._apply(mode, player, {'name': name, 'updated': time.time(), 'values': values})
+            self._dirty = True
+            due = time.monotonic() - self._saved_at >= self.save_interval
+
+        if due:
+            self.save()
+
+    def top(self, mode: str, stat: str, limit: int = 10) -> List[Tuple[str, float]]:
+        self._reload()
+        mode = mode.upper()
+        with self._lock:
+            board = self._boards.get((mode, stat))
+            if board is None:
+                return []
+            players = self._players[mode]
+            return [(players[player]['name'], -value) for value, player in board.entries[:limit]]
+
+    def stats(self, mode: str) -> List[str]:
+        mode = mode.upper()
+        with self._lock:
+            return sorted(stat for board_mode, stat in self._boards if board_mode == mode)
+
+    def modes(self) -> List[str]:
+        with self._lock:
+            return sorted(self._players)
+
+    def __len__(self):
+        with self._lock:
+            return sum(len(players) for players in self._players.values())
+
+    def _read(self) -> Optional[dict]:
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError) as e:
+            logger.warning("Не удалось загрузить таблицу лидеров %s: %s", self.path, e)
+            return None
+
+    def _merge(self, data: Optional[dict]):
+        if not data:
+            return
+        for mode, players in data.get('modes', {}).items():
+            known = self._players.get(mode, {})
+            for player, entry in players.items():
+                current = known.get(player)
+                if current is None or entry.get('updated', 0) > current['updated']:
+                    self._apply(mode, player, entry)
+
+    def _reload(self):
+        try:
+            mtime = os.path.getmtime(self.path)
+        except OSError:
+            return
+        if mtime <= self._loaded_mtime:
+            return
+        with self._lock:
+            self._loaded_mtime = mtime
+            self._merge(self._read())
+
+    def save(self):
+        with self._lock:
+            if not self._dirty:
+                return
+            self._merge(self._read())
+            data = {'version': 1, 'modes': self._players}
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            tmp_path = f"{self.path}.{os.getpid()}.tmp"
+            try:
+                with open(tmp_path, 'w', encoding='utf-8') as f:
+                    json.dump(data, f, ensure_ascii=False, separators=(',', ':'))
+                os.replace(tmp_path, self.path)
+            except OSError as e:
+                logger.warning("Не удалось сохранить таблицу лидеров %s: %s", self.path, e)
+                return
+            self._dirty = False
+            self._saved_at = time.monotonic()
+            self._loaded_mtime = os.path.getmtime(self.path)
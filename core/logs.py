@@ -0,0 +1,117 @@
+from logging.handlers import QueueHandler, QueueListener
+from typing import Dict, Iterable, Optional, Tuple
+import atexit
+import logging
+import os
+import queue
+import re
+import threading
+import time
+
+from .metrics import metrics
+
+LOG_FORMAT = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+LOG_DATEFMT = '%Y-%m-%d %H:%M:%S'
+REDACTED = '***'
+
+_API_KEY_PATTERN = re.compile(r"""(['"]?x-api-key['"]?\s*[:=]\s*['"]?)([^'"\s,}]+)""", re.IGNORECASE)
+
+_listener: Optional[QueueListener] = None
+_listener_pid: Optional[int] = None
+
+
+class RedactingFilter(logging.Filter):
+
+    def __init__(self, secrets: Iterable[str] = (), min_substring_length: int = 8):
+        super().__init__()
+        self.secrets = tuple(sorted({secret for secret in secrets if secret}, key=len, reverse=True))
+        self._pattern = re.compile('|'.join(
+            re.escape(secret) if len(secret) >= min_substring_length else rf'(?<!\w){re.escape(secret)}(?!\w)'
+            for secret in self.secrets
+        )) if self.secrets else None
+
+    def redact(self, text: str) -> str:
+        text = _API_KEY_PATTERN.sub(lambda match: match.group(1) + REDACTED, text)
+        if self._pattern is not None:
+            text = self._pattern.sub(REDACTED, text)
+        return text
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        record.msg = self.redact(record.getMessage())
+        record.args = None
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.redact(logging.Formatter().formatException(record.exc_info))
+        return True
+
+
+class SamplingFilter(logging.Filter):
+
+    def __init__(self, rate: float = 20.0, burst: Optional[float] = None, level: int = logging.DEBUG,
+                 max_keys: int = 1024):
+        super().__init__()
+        self.rate = rate
+        self.burst = burst or max(rate, 1.0)
+        self.level = level
+        self.max_keys = max_keys
+        self._lock = threading.Lock()
+        self._buckets: Dict[Tuple[str, str], list] = {}
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno > self.level or self.rate <= 0:
+            return True
+        key = (record.name, str(record.msg))
+        now = time.monotonic()
+        with self._lock:
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                if len(self._buckets) >= self.max_keys:
+                    self._buckets.clear()
+                bucket = self._buckets[key] = [self.burst, now]
+            tokens = min(self.burst, bucket[0] + (now - bucket[1]) * self.rate)
+            bucket[1] = now
+            allowed = tokens >= 1
+            bucket[0] = tokens - 1 if allowed else tokens
+        if not allowed:
+            metrics.inc('log_dropped', logger=record.name)
+        return allowed
+
+
+class DeferredQueueHandler(QueueHandler):
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record
+
+
+def stop_logging():
+    global _listener
+    if _listener is not None and _listener_pid == os.getpid() and _listener._thread is not None:
+        _listener.stop()
+    _listener = None
+
+
+def setup_logging(level=logging.INFO, secrets: Iterable[str] = (), debug_rate: float = 20.0,
+                  stream=None) -> QueueListener:
+    global _listener, _listener_pid
+
+    stop_logging()
+
+    output = logging.StreamHandler(stream)
+    output.setFormatter(logging.Formatter(LOG_FORMAT, LOG_DATEFMT))
+    output.addFilter(RedactingFilter(secrets))
+
+    records = queue.SimpleQueue()
+    handler = DeferredQueueHandler(records)
+    handler.addFilter(SamplingFilter(debug_rate))
+
+    root = logging.getLogger()
+    for existing in root.handlers[:]:
+        root.removeHandler(existing)
+    root.addHandler(handler)
+    root.setLevel(level.upper() if isinstance(level, str) else level)
+
+    _listener = QueueListener(records, output, respect_handler_level=True)
+    _listener.start()
+    if _listener_pid is None:
+        atexit.register(stop_logging)
+    _listener_pid = os.getpid()
+    return _listener
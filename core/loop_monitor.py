@@ -0,0 +1,132 @@
+from typing import Callable, List, Optional
+import asyncio
+import functools
+import logging
+import sys
+import threading
+import time
+import traceback
+import types
+
+from .metrics import metrics
+
+logger = logging.getLogger('loop_monitor')
+
+
+class LoopBlockedError(RuntimeError):
+
+    def __init__(self, handler: str, blocked_ms: float, threshold_ms: float):
+        self.handler = handler
+        self.blocked_ms = blocked_ms
+        self.threshold_ms = threshold_ms
+        super().__init__(
+            f"Обработчик {handler} заблокировал цикл событий на {blocked_ms:.1f}мс "
+            f"(порог {threshold_ms:.1f}мс)"
+        )
+
+
+class LoopMonitor:
+
+    def __init__(self, interval: float = 0.25, slow_callback_ms: float = 100.0,
+                 strict_ms: Optional[float] = None):
+        self.interval = interval
+        self.slow_callback_ms = slow_callback_ms
+        self.strict_ms = strict_ms
+        self.violations: List[LoopBlockedError] = []
+        self._heartbeat = time.monotonic()
+        self._loop_thread_id: Optional[int] = None
+        self._task: Optional[asyncio.Task] = None
+        self._watchdog: Optional[threading.Thread] = None
+        self._stopped = threading.Event()
+
+    def start(self, loop: Optional[asyncio.AbstractEventLoop] = None):
+        loop = loop or asyncio.get_running_loop()
+        if self._task is not None:
+            return
+        self._loop_thread_id = threading.get_ident()
+        self._heartbeat = time.monotonic()
+        self._stopped.clear()
+        self._task = loop.create_task(self._measure_lag())
+        self._watchdog = threading.Thread(target=self._watch, name='loop-watchdog', daemon=True)
+        self._watchdog.start()
+
+    def stop(self):
+        self._stopped.set()
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    async def _measure_lag(self):
+        while True:
+            expected = time.monotonic() + self.interval
+            await asyncio.sleep(self.interval)
+            now = time.monotonic()
+            self._heartbeat = now
+            metrics.observe('event_loop_lag_ms', max(0.0, (now - expected) * 1000))
+
+    def _watch(self):
+        threshold = self.slow_callback_ms / 1000
+        reported_for = None
+        while not self._stopped.wait(self.interval):
+            heartbeat = self._heartbeat
+            stalled = time.monotonic() - heartbeat - self.interval
+            if stalled < threshold or reported_for == heartbeat:
+                continue
+            reported_for = heartbeat
+            metrics.inc('event_loop_stalls')
+            frame = sys._current_frames().get(self._loop_thread_id)
+            stack = "".join(traceback.format_stack(frame)) if frame is not None else "<стек недоступен>"
+            logger.warning("Цикл событий заблокирован более %.0fмс, стек:\n%s", stalled * 1000, stack)
+
+    def lag_percentiles(self):
+        return metrics.percentiles('event_loop_lag_ms')
+
+    def record_step(self, handler: str, elapsed_ms: float):
+        metrics.observe('handler_step_ms', elapsed_ms, handler=handler)
+        if elapsed_ms >= self.slow_callback_ms:
+            metrics.inc('handler_slow_steps', handler=handler)
+            logger.warning("Обработчик %s выполнялся в цикле событий %.1fмс без await", handler, elapsed_ms)
+        if self.strict_ms is not None and elapsed_ms > self.strict_ms:
+            error = LoopBlockedError(handler, elapsed_ms, self.strict_ms)
+            self.violations.append(error)
+            raise error
+
+    def watch_handler(self, func: Callable) -> Callable:
+        name = func.__name__
+
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            return await _timed_steps(func(*args, **kwargs), name, self.record_step)
+
+        return wrapper
+
+
+@types.coroutine
+def _timed_steps(coro, name: str, on_step: Callable[[str, float], None]):
+    send_value = None
+    error = None
+    while True:
+        started = time.perf_counter()
+        try:
+            if error is not None:
+                future = coro.throw(error)
+            else:
+                future = coro.send(send_value)
+        except StopIteration as stop:
+            on_step(name, (time.perf_counter() - started) * 1000)
+            return stop.value
+        except BaseException:
+            on_step(name, (time.perf_counter() - started) * 1000)
+            raise
+        try:
+            on_step(name, (time.perf_counter() - started) * 1000)
+        except LoopBlockedError:
+            coro.close()
+            raise
+
+        try:
+            send_value = yield future
+            error = None
+        except BaseException as e:
+            send_value = None
+            error = e
@@ -0,0 +1,224 @@
+from collections import OrderedDict, defaultdict
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Hashable, List, Optional
+import io
+import logging
+import sys
+import threading
+import tracemalloc
+import weakref
+
+from .metrics import metrics
+
+logger = logging.getLogger('memory')
+
+
+def image_nbytes(image) -> int:
+    return image.width * image.height * len(image.getbands())
+
+
+def deep_sizeof(obj: Any, _seen: Optional[set] = None) -> int:
+    if _seen is None:
+        _seen = set()
+    if id(obj) in _seen:
+        return 0
+    _seen.add(id(obj))
+
+    size = sys.getsizeof(obj)
+    if isinstance(obj, (str, bytes, bytearray, int, float, bool)) or obj is None:
+        return size
+    if hasattr(obj, 'getbands') and hasattr(obj, 'width'):
+        return size + image_nbytes(obj)
+    if isinstance(obj, dict):
+        return size + sum(deep_sizeof(k, _seen) + deep_sizeof(v, _seen) for k, v in obj.items())
+    if isinstance(obj, (list, tuple, set, frozenset)):
+        return size + sum(deep_sizeof(item, _seen) for item in obj)
+
+    for name in getattr(type(obj), '__slots__', ()):
+        size += deep_sizeof(getattr(obj, name, None), _seen)
+    if hasattr(obj, '__dict__'):
+        size += deep_sizeof(vars(obj), _seen)
+    return size
+
+
+class LiveObjects:
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counts: Dict[str, int] = defaultdict(int)
+        self._bytes: Dict[str, int] = defaultdict(int)
+
+    def _publish(self, kind: str):
+        metrics.set('live_objects', self._counts[kind], kind=kind)
+        metrics.set('live_bytes', self._bytes[kind], kind=kind)
+
+    def _release(self, kind: str, nbytes: int):
+        with self._lock:
+            self._counts[kind] -= 1
+            self._bytes[kind] -= nbytes
+            self._publish(kind)
+
+    def track(self, obj, kind: str, nbytes: int):
+        with self._lock:
+            self._counts[kind] += 1
+            self._bytes[kind] += nbytes
+            self._publish(kind)
+        weakref.finalize(obj, self._release, kind, nbytes)
+        return obj
+
+    def track_image(self, image):
+        return self.track(image, 'image', image_nbytes(image))
+
+    def track_buffer(self, buffer: io.BytesIO):
+        with buffer.getbuffer() as view:
+            nbytes = view.nbytes
+        return self.track(buffer, 'buffer', nbytes)
+
+    def summary(self) -> Dict[str, tuple]:
+        with self._lock:
+            return {kind: (self._counts[kind], self._bytes[kind]) for kind in self._counts}
+
+
+class BudgetedLRU:
+
+    def __init__(self, name: str, max_bytes: int, max_entries: Optional[int] = None,
+                 sizeof: Callable[[Any], int] = deep_sizeof, on_evict: Optional[Callable[[Any], None]] = None):
+        self.name = name
+        self.max_bytes = max_bytes
+        self.max_entries = max_entries
+        self.sizeof = sizeof
+        self.on_evict = on_evict
+        self.nbytes = 0
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[Hashable, tuple]" = OrderedDict()
+
+    def get(self, key: Hashable, default=None):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return default
+            self._entries.move_to_end(key)
+            return entry[0]
+
+    def put(self, key: Hashable, value: Any, size: Optional[int] = None) -> bool:
+        size = self.sizeof(value) if size is None else size
+        dropped = []
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self.nbytes -= previous[1]
+                if previous[0] is not value:
+                    dropped.append(previous[0])
+            if size > self.max_bytes:
+                metrics.inc('cache_rejected', cache=self.name)
+                self._publish()
+                stored = False
+            else:
+                self._entries[key] = (value, size)
+                self.nbytes += size
+                evicted = 0
+                while self.nbytes > self.max_bytes or (self.max_entries and len(self._entries) > self.max_entries):
+                    _, (evicted_value, evicted_size) = self._entries.popitem(last=False)
+                    self.nbytes -= evicted_size
+                    dropped.append(evicted_value)
+                    evicted += 1
+                self._publish()
+                stored = True
+
+        if stored and evicted:
+            metrics.inc('cache_evictions', evicted, cache=self.name)
+        self._dropped(dropped)
+        return stored
+
+    def setdefault(self, key: Hashable, value: Any, size: Optional[int] = None):
+        existing = self.get(key)
+        if existing is not None:
+            return existing
+        self.put(key, value, size)
+        return value
+
+    def pop(self, key: Hashable, default=None):
+        with self._lock:
+            entry = self._entries.pop(key, None)
+            if entry is None:
+                return default
+            self.nbytes -= entry[1]
+            self._publish()
+            return entry[0]
+
+    def resize(self, max_bytes: int):
+        dropped = []
+        with self._lock:
+            self.max_bytes = max_bytes
+            while self._entries and self.nbytes > self.max_bytes:
+                _, (evicted_value, evicted_size) = self._entries.popitem(last=False)
+                self.nbytes -= evicted_size
+                dropped.append(evicted_value)
+            self._publish()
+        self._dropped(dropped)
+
+    def _dropped(self, values):
+        if self.on_evict is not None:
+            for value in values:
+                self.on_evict(value)
+
+    def _publish(self):
+        metrics.set('cache_bytes', self.nbytes, cache=self.name)
+        metrics.set('cache_entries', len(self._entries), cache=self.name)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._entries
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class AllocationTracer:
+
+    def __init__(self, frames: int = 10, top: int = 10):
+        self.frames = frames
+        self.top = top
+        self.enabled = False
+        self._lock = threading.Lock()
+        self._filters = [
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, '<frozen importlib._bootstrap*>'),
+        ]
+        self.last: Dict[str, List[str]] = {}
+
+    def start(self):
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(self.frames)
+        self.enabled = True
+        logger.info("Трассировка выделений памяти включена (глубина стека %d)", self.frames)
+
+    def stop(self):
+        self.enabled = False
+        if tracemalloc.is_tracing():
+            tracemalloc.stop()
+
+    @contextmanager
+    def track(self, command: str):
+        if not self.enabled:
+            yield
+            return
+
+        before = tracemalloc.take_snapshot().filter_traces(self._filters)
+        current_before, _ = tracemalloc.get_traced_memory()
+        try:
+            yield
+        finally:
+            after = tracemalloc.take_snapshot().filter_traces(self._filters)
+            current_after, peak = tracemalloc.get_traced_memory()
+            diff = after.compare_to(before, 'lineno')[:self.top]
+            lines = [str(stat) for stat in diff]
+            with self._lock:
+                self.last[command] = lines
+
+            metrics.observe('alloc_net_bytes', current_after - current_before, command=command)
+            metrics.set('alloc_traced_peak_bytes', peak)
+            logger.debug("Выделения памяти в команде %s:\n%s", command, "\n".join(lines))
+
+
+live_objects = LiveObjects()
+tracer = AllocationTracer()
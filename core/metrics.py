@@ -0,0 +1,78 @@
+from collections import defaultdict, deque
+from typing import Dict, Iterable, Optional, Tuple
+import threading
+
+
+def _key(name: str, labels: Dict) -> Tuple:
+    if not labels:
+        return (name, ())
+    return (name, tuple(sorted(labels.items())))
+
+
+def _format_key(key: Tuple) -> str:
+    name, labels = key
+    if not labels:
+        return name
+    rendered = ",".join(f"{label}={value}" for label, value in labels)
+    return f"{name}{{{rendered}}}"
+
+
+def percentile(values: Iterable[float], q: float) -> Optional[float]:
+    ordered = sorted(values)
+    if not ordered:
+        return None
+    index = min(len(ordered) - 1, max(0, int(round(q / 100 * (len(ordered) - 1)))))
+    return ordered[index]
+
+
+class Metrics:
+
+    def __init__(self, window: int = 1024):
+        self.window = window
+        self._lock = threading.Lock()
+        self._counters: Dict[Tuple, float] = defaultdict(float)
+        self._gauges: Dict[Tuple, float] = {}
+        self._samples: Dict[Tuple, deque] = {}
+
+    def inc(self, name: str, value: float = 1, **labels):
+        with self._lock:
+            self._counters[_key(name, labels)] += value
+
+    def set(self, name: str, value: float, **labels):
+        with self._lock:
+            self._gauges[_key(name, labels)] = value
+
+    def observe(self, name: str, value: float, **labels):
+        key = _key(name, labels)
+        with self._lock:
+            samples = self._samples.get(key)
+            if samples is None:
+                samples = self._samples[key] = deque(maxlen=self.window)
+            samples.append(value)
+
+    def counter(self, name: str, **labels) -> float:
+        return self._counters.get(_key(name, labels), 0)
+
+    def gauge(self, name: str, **labels) -> Optional[float]:
+        return self._gauges.get(_key(name, labels))
+
+    def percentiles(self, name: str, qs=(50, 95, 99), **labels) -> Dict[int, Optional[float]]:
+        with self._lock:
+            values = list(self._samples.get(_key(name, labels), ()))
+        return {q: percentile(values, q) for q in qs}
+
+    def snapshot(self) -> Dict[str, float]:
+        with self._lock:
+            result = {_format_key(key): value for key, value in self._counters.items()}
+            result.update({_format_key(key): value for key, value in self._gauges.items()})
+            samples = {key: list(values) for key, values in self._samples.items()}
+
+        for key, values in samples.items():
+            name = _format_key(key)
+            result[f"{name}.count"] = len(values)
+            for q in (50, 95, 99):
+                result[f"{name}.p{q}"] = percentile(values, q)
+        return result
+
+
+metrics = Metrics()
@@ -0,0 +1,263 @@
+from datetime import datetime
+from typing import Any, List, Optional, Tuple
+import re
+
+_MC_FORMATTING = re.compile(r'§[0-9a-fA-Fk-oK-OrR]')
+
+STATS_CONTAINER_KEYS = ('data', 'stats', 'values', 'statistics', 'playerStats')
+
+
+def remove_mc_formatting(text: Optional[str]) -> Optional[str]:
+    if not text:
+        return text
+    return _MC_FORMATTING.sub('', text)
+
+
+def format_rank_name(rank_name: Optional[str]) -> Optional[str]:
+    if not rank_name:
+        return rank_name
+    if rank_name.upper() == 'AX_TEAM':
+        return 'TEAM'
+    return rank_name
+
+
+def format_timestamp(ts_value) -> str:
+    try:
+        if ts_value is None:
+            return "Не указано"
+
+        if isinstance(ts_value, str):
+            ts_value = ts_value.strip()
+            ts_float = float(ts_value)
+        else:
+            ts_float = float(ts_value)
+
+        if ts_float > 10000000000:
+            ts_float = ts_float / 1000
+
+        dt = datetime.fromtimestamp(ts_float)
+        return dt.strftime("%d.%m.%Y %H:%M")
+
+    except ValueError:
+        return str(ts_value)
+    except Exception:
+        return str(ts_value)
+
+
+def extract_rank(profile_data) -> Optional[str]:
+    if not profile_data or not isinstance(profile_data, dict):
+        return None
+
+    rank = None
+    ranks = profile_data.get('ranks', [])
+    if ranks and isinstance(ranks, list) and len(ranks) > 0:
+        first_rank = ranks[0]
+        if isinstance(first_rank, dict):
+            rank = first_rank.get('name') or first_rank.get('displayName')
+        elif isinstance(first_rank, str):
+            rank = first_rank
+
+    if rank:
+        rank = remove_mc_formatting(str(rank))
+    return rank or None
+
+
+class PlayerStats:
+
+    __slots__ = ('nickname', 'mode', 'fields', 'valid')
+
+    def __init__(self, nickname: str, mode: str, fields: Tuple[Tuple[str, Any, Optional[str]], ...], valid: bool = True):
+        self.nickname = nickname
+        self.mode = mode
+        self.fields = fields
+        self.valid = valid
+
+    @property
+    def signature(self) -> Tuple[Tuple[str, Optional[str]], ...]:
+        return tuple((key, parent) for key, _, parent in self.fields)
+
+    def get(self, key: str, default=None):
+        for field_key, value, parent in self.fields:
+            if field_key == key and parent is None:
+                return value
+        return default
+
+    @classmethod
+    def from_api(cls, nickname: str, mode: str, stats_data) -> 'PlayerStats':
+        if isinstance(stats_data, PlayerStats):
+            return stats_data
+        if not isinstance(stats_data, dict):
+            return cls(nickname, mode, (), valid=False)
+
+        data = None
+        for key in STATS_CONTAINER_KEYS:
+            if key in stats_data and isinstance(stats_data[key], dict):
+                data = stats_data[key]
+                break
+        if data is None:
+            data = stats_data
+
+        fields = []
+        for key, value in data.items():
+            if value is None or isinstance(value, list):
+                continue
+            if isinstance(value, dict):
+                for nested_key, nested_value in value.items():
+                    if nested_value is not None and not isinstance(nested_value, (dict, list)):
+                        fields.append((nested_key, nested_value, key))
+                continue
+            fields.append((key, value, None))
+
+        return cls(nickname, mode, tuple(fields))
+
+
+class PlayerProfile:
+
+    __slots__ = ('nickname', 'username', 'display_name', 'user_id', 'language',
+                 'current_server', 'online', 'last_login', 'rank')
+
+    def __init__(self, nickname: str, username: str, display_name: str, user_id=None, language=None,
+                 current_server=None, online: bool = False, last_login=None, rank: Optional[str] = None):
+        self.nickname = nickname
+        self.username = username
+        self.display_name = display_name
+        self.user_id = user_id
+        self.language = language
+        self.current_server = current_server
+        self.online = online
+        self.last_login = last_login
+        self.rank = rank
+
+    @classmethod
+    def from_api(cls, nickname: str, profile_data) -> 'PlayerProfile':
+        if isinstance(profile_data, PlayerProfile):
+            return profile_data
+
+        username = profile_data.get("username", nickname)
+        return cls(
+            nickname=nickname,
+            username=username,
+            display_name=remove_mc_formatting(profile_data.get("displayName", username)),
+            user_id=profile_data.get("userId"),
+            language=profile_data.get("language"),
+            current_server=profile_data.get("currentServer"),
+            online=profile_data.get("online", False),
+            last_login=profile_data.get("lastLogin"),
+            rank=extract_rank(profile_data),
+        )
+
+    def info_items(self) -> List[Tuple[str, str]]:
+        info_items = []
+
+        if self.user_id is not None:
+            info_items.append(("ID пользователя", str(self.user_id)))
+
+        rank_display = format_rank_name(self.rank)
+        if rank_display:
+            info_items.append(("Ранг", rank_display))
+        else:
+            info_items.append(("Ранг", "DEFAULT"))
+
+        info_items.append(("Отображаемое имя", self.username))
+
+        if self.language:
+            info_items.append(("Язык", self.language))
+
+        if self.current_server is not None:
+            info_items.append(("Текущий сервер", self.current_server))
+
+        info_items.append(("Онлайн", "Да" if self.online else "Нет"))
+
+        if self.last_login is not None:
+            info_items.append(("Последний вход", format_timestamp(self.last_login)))
+
+        return info_items
+
+
+class StaffStats:
+
+    __slots__ = ('total_bans', 'total_mutes', 'total_active_bans', 'total_active_mutes',
+                 'total_week_bans', 'total_week_mutes')
+
+    def __init__(self, total_bans=0, total_mutes=0, total_active_bans=0, total_active_mutes=0,
+                 total_week_bans=0, total_week_mutes=0):
+        self.total_bans = total_bans
+        self.total_mutes = total_mutes
+        self.total_active_bans = total_active_bans
+        self.total_active_mutes = total_active_mutes
+        self.total_week_bans = total_week_bans
+        self.total_week_mutes = total_week_mutes
+
+    @classmethod
+    def from_api(cls, stats_data) -> 'StaffStats':
+        if isinstance(stats_data, StaffStats):
+            return stats_data
+
+        return cls(
+            total_bans=stats_data.get('totalBans', 0),
+            total_mutes=stats_data.get('totalMutes', 0),
+            total_active_bans=stats_data.get('totalActiveBans', 0),
+            total_active_mutes=stats_data.get('totalActiveMutes', 0),
+            total_week_bans=stats_data.get('totalWeekBans', 0),
+            total_week_mutes=stats_data.get('totalWeekMutes', 0),
+        )
+
+    def items(self) -> List[Tuple[str, Any]]:
+        return [
+            ("Всего банов", self.total_bans),
+            ("Всего мутов", self.total_mutes),
+            ("Активных банов", self.total_active_bans),
+            ("Активных мутов", self.total_active_mutes),
+            ("Банов за неделю", self.total_week_bans),
+            ("Мутов за неделю", self.total_week_mutes)
+        ]
+
+
+class OnlineStaff:
+
+    __slots__ = ('players',)
+
+    def __init__(self, players: Tuple[Tuple[str, Any], ...]):
+        self.players = players
+
+    def __len__(self):
+        return len(self.players)
+
+    @classmethod
+    def from_api(cls, staff_data) -> 'OnlineStaff':
+        if isinstance(staff_data, OnlineStaff):
+            return staff_data
+
+        players = []
+        for player in staff_data.get('players', []):
+            display_name = remove_mc_formatting(player.get('displayName', 'Неизвестно'))
+            players.append((display_name, player.get('userId', 'N/A')))
+        return cls(tuple(players))
+
+
+def online_count(online_data) -> float:
+    if isinstance(online_data, dict):
+        return online_data.get('online') or online_data.get('count') or 0
+    if isinstance(online_data, (int, float)):
+        return online_data
+    return 0
+
+
+def api_error(data) -> Optional[str]:
+    if isinstance(data, dict) and not data.get('success', True):
+        return data.get('message', 'Неизвестная ошибка')
+    return None
+
+
+def parse_response(kind: str, data, **context) -> Any:
+    if data is None or api_error(data) is not None:
+        return data
+    if kind == 'stats':
+        return PlayerStats.from_api(context['nickname'], context['mode'], data)
+    if kind == 'profile':
+        return PlayerProfile.from_api(context['nickname'], data) if isinstance(data, dict) else data
+    if kind == 'staff_stats':
+        return StaffStats.from_api(data) if isinstance(data, dict) else data
+    if kind == 'staff_online':
+        return OnlineStaff.from_api(data) if isinstance(data, dict) else data
+    return data
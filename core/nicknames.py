@@ -0,0 +1,148 @@
+from bisect import bisect_left, insort
+from typing import Dict, List, Tuple
+import heapq
+import json
+import logging
+import os
+import threading
+import time
+
+logger = logging.getLogger('nicknames')
+
+
+class NicknameIndex:
+
+    def __init__(self, path: str, exact_scan_limit: int = 2048, prefix_cache_ttl: float = 60.0,
+                 prefix_cache_size: int = 256):
+        self.path = path
+        self.exact_scan_limit = exact_scan_limit
+        self.prefix_cache_ttl = prefix_cache_ttl
+        self.prefix_cache_size = prefix_cache_size
+        self._lock = threading.Lock()
+        self._keys: List[str] = []
+        self._names: Dict[str, List] = {}
+        self._pending: Dict[str, int] = {}
+        self._prefix_cache: Dict[str, Tuple[float, List[str]]] = {}
+        self._top: List[str] = []
+        self._loaded_mtime = 0.0
+        self.sync()
+
+    def __len__(self):
+        return len(self._keys)
+
+    def record(self, nickname: str):
+        if not nickname:
+            return
+        key = nickname.lower()
+        with self._lock:
+            entry = self._names.get(key)
+            if entry is None:
+                self._names[key] = [nickname, 1]
+                insort(self._keys, key)
+            else:
+                entry[0] = nickname
+                entry[1] += 1
+            self._pending[key] = self._pending.get(key, 0) + 1
+            self._promote(key)
+
+    def _promote(self, key: str, size: int = 25):
+        names = self._names
+        top = self._top
+        if key not in top:
+            if len(top) >= size and names[key][1] <= names[top[-1]][1]:
+                return
+            top.append(key)
+        top.sort(key=lambda name: names[name][1], reverse=True)
+        del top[size:]
+
+    def _rank(self, lo: int, hi: int, limit: int) -> List[str]:
+        names = self._names
+        keys = self._keys
+        return [names[key][0] for key in heapq.nlargest(limit, (keys[i] for i in range(lo, hi)),
+                                                        key=lambda key: names[key][1])]
+
+    def suggest(self, prefix: str, limit: int = 25) -> List[str]:
+        prefix = prefix.strip().lower()
+        if not prefix:
+            return [self._names[key][0] for key in self._top[:limit]]
+        keys = self._keys
+        lo = bisect_left(keys, prefix)
+        hi = bisect_left(keys, prefix + '\uffff', lo)
+
+        if hi - lo <= self.exact_scan_limit:
+            return self._rank(lo, hi, limit)
+
+        cached = self._prefix_cache.get(prefix)
+        if cached is not None and cached[0] > time.monotonic() and len(cached[1]) >= limit:
+            return cached[1][:limit]
+        result = self._rank(lo, hi, max(limit, 25))
+        if len(self._prefix_cache) >= self.prefix_cache_size:
+            now = time.monotonic()
+            self._prefix_cache = {key: entry for key, entry in self._prefix_cache.items() if entry[0] > now}
+            if len(self._prefix_cache) >= self.prefix_cache_size:
+                self._prefix_cache.clear()
+        self._prefix_cache[prefix] = (time.monotonic() + self.prefix_cache_ttl, result)
+        return result[:limit]
+
+    def _read(self) -> Dict[str, List]:
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except FileNotFoundError:
+            return {}
+        except (OSError, ValueError) as e:
+            logger.warning("Не удалось загрузить индекс ников %s: %s", self.path, e)
+            return {}
+        return {key: list(entry) for key, entry in data.get('names', {}).items()}
+
+    def sync(self):
+        try:
+            mtime = os.path.getmtime(self.path)
+        except OSError:
+            mtime = 0.0
+
+        with self._lock:
+            pending = self._pending
+            if not pending and mtime <= self._loaded_mtime:
+                return
+            self._pending = {}
+            local = {key: self._names[key][0] for key in pending}
+
+        names = self._read() if mtime else {}
+        for key, count in pending.items():
+            entry = names.get(key)
+            if entry is None:
+                names[key] = [local[key], count]
+            else:
+                entry[0] = local[key]
+                entry[1] += count
+
+        if pending:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            tmp_path = f"{self.path}.{os.getpid()}.tmp"
+            try:
+                with open(tmp_path, 'w', encoding='utf-8') as f:
+                    json.dump({'version': 1, 'names': names}, f, ensure_ascii=False, separators=(',', ':'))
+                os.replace(tmp_path, self.path)
+                mtime = os.path.getmtime(self.path)
+            except OSError as e:
+                logger.warning("Не удалось сохранить индекс ников %s: %s", self.path, e)
+                with self._lock:
+                    for key, count in pending.items():
+                        self._pending[key] = self._pending.get(key, 0) + count
+                return
+
+        keys = sorted(names)
+        top = heapq.nlargest(25, names, key=lambda key: names[key][1])
+        with self._lock:
+            for key, count in self._pending.items():
+                names.setdefault(key, [self._names[key][0], 0])[1] += count
+            self._names = names
+            self._keys = sorted(names) if self._pending else keys
+            self._top = top
+            for key in self._pending:
+                self._promote(key)
+            self._prefix_cache = {}
+            self._loaded_mtime = mtime
@@ -0,0 +1,568 @@
+from concurrent.futures import Future, ThreadPoolExecutor, TimeoutError as FutureTimeout
+from typing import Callable, Dict, List, Optional, Tuple
+import contextvars
+import io
+import logging
+import threading
+import time
+
+from .deadline import Deadline, DeadlineExceeded
+from .jobs import INTERACTION_TOKEN_TTL
+from .memory import BudgetedLRU, tracer
+from .metrics import metrics
+from .models import api_error, format_rank_name, online_count, parse_response
+from .scheduler import INTERACTIVE, request_priority
+from .timeseries import HISTORY_LABELS, HISTORY_PERIODS, summarize
+
+logger = logging.getLogger('pipeline')
+
+DEFAULT_RESOLUTION = 'standard'
+
+_cached_only = contextvars.ContextVar('cached_only', default=False)
+
+
+class CacheMiss(Exception):
+    pass
+
+
+class CommandResult:
+
+    def __init__(self, content: str, image: Optional[io.BytesIO] = None, filename: Optional[str] = None,
+                 embed: Optional[Dict] = None, render_request: Optional[str] = None, page: int = 1,
+                 pages: int = 1, page_request: Optional[str] = None, edit: bool = False):
+        self.content = content
+        self.image = image
+        self.filename = filename
+        self.embed = embed
+        self.render_request = render_request
+        self.page = page
+        self.pages = pages
+        self.page_request = page_request
+        self.edit = edit
+
+    def buttons(self) -> List[Tuple[str, str, str, bool]]:
+        if self.render_request is not None:
+            return [("Получить изображение", "🖼️", self.render_request[:100], False)]
+        if self.pages > 1 and self.page_request is not None:
+            return [
+                ("Назад", "◀️", f"{self.page_request}:{self.page - 1}", self.page <= 1),
+                ("Вперёд", "▶️", f"{self.page_request}:{self.page + 1}", self.page >= self.pages),
+            ]
+        return []
+
+    def release(self):
+        from generators import assets
+
+        assets.release_buffer(self.image)
+        self.image = None
+
+
+def _embed(title: str, items, color=None, description: Optional[str] = None) -> Dict:
+    embed = {
+        'title': title,
+        'fields': [{'name': str(label), 'value': str(value), 'inline': True} for label, value in items][:25],
+        'footer': {'text': 'AgeraPvP Stats Bot'},
+    }
+    if description:
+        embed['description'] = description
+    if color is not None:
+        embed['color'] = (color[0] << 16) + (color[1] << 8) + color[2]
+    return embed
+
+
+def parse_render_request(custom_id: str) -> Optional[tuple]:
+    parts = custom_id.split(':', 3)
+    if len(parts) == 4 and parts[:2] == ['page', 'stats']:
+        nickname, _, page = parts[3].rpartition(':')
+        if not nickname or not page.isdigit():
+            return None
+        return 'stats', {'mode': parts[2], 'nickname': nickname, 'page': int(page), 'navigate': True}
+    if len(parts) < 2 or parts[0] != 'render':
+        return None
+    command = parts[1]
+    if command == 'stats' and len(parts) == 4:
+        return command, {'mode': parts[2], 'nickname': parts[3]}
+    if command == 'profile' and len(parts) >= 3:
+        return command, {'nickname': ':'.join(parts[2:])}
+    if command == 'punishments':
+        return command, {}
+    if command == 'history' and len(parts) == 4:
+        return command, {'metric': parts[2], 'period': parts[3]}
+    if command == 'top' and len(parts) == 4:
+        return command, {'mode': parts[2], 'stat': parts[3]}
+    return None
+
+
+class CommandPipeline:
+
+    COMMANDS = ('stats', 'profile', 'punishments', 'staff', 'online', 'history', 'top')
+    IMAGE_COMMANDS = ('stats', 'profile', 'punishments', 'history', 'top')
+    READY_COMMANDS = ('stats', 'staff', 'online')
+
+    def __init__(self, api_client, cache=None, cache_ttl: float = 60.0, admission=None, history=None,
+                 leaderboard=None, nicknames=None, api_timeout: float = 10.0, render_reserve: float = 1.0,
+                 side_workers: int = 8, page_cache_bytes: int = 32 * 1024 * 1024, scheduler=None):
+        self.api_client = api_client
+        self.scheduler = scheduler
+        self.cache = cache
+        self.cache_ttl = cache_ttl
+        self.api_timeout = api_timeout
+        self.render_reserve = render_reserve
+        self._side = ThreadPoolExecutor(max_workers=side_workers, thread_name_prefix='pipeline-side')
+        self._stat_payloads = BudgetedLRU('stat_payloads', page_cache_bytes // 4, max_entries=1024)
+        self._stat_pages = BudgetedLRU('stat_pages', page_cache_bytes, sizeof=len)
+        self.admission = admission
+        self.history_store = history
+        self.leaderboard = leaderboard
+        self.nicknames = nicknames
+        self._lock = threading.Lock()
+        self._generators: Dict[str, object] = {}
+
+    def _generator(self, name: str, resolution: str = DEFAULT_RESOLUTION):
+        key = (name, resolution)
+        generator = self._generators.get(key)
+        if generator is None:
+            with self._lock:
+                generator = self._generators.get(key)
+                if generator is None:
+                    import generators
+                    generator = getattr(generators, name)(resolution)
+                    self._generators[key] = generator
+        return generator
+
+    def stats_generator(self, resolution: str = DEFAULT_RESOLUTION):
+        return self._generator('StatsImageGenerator', resolution)
+
+    def profile_generator(self, resolution: str = DEFAULT_RESOLUTION):
+        return self._generator('ProfileImageGenerator', resolution)
+
+    def punishments_generator(self, resolution: str = DEFAULT_RESOLUTION):
+        return self._generator('PunishmentsImageGenerator', resolution)
+
+    def history_generator(self, resolution: str = DEFAULT_RESOLUTION):
+        return self._generator('HistoryImageGenerator', resolution)
+
+    def leaderboard_generator(self, resolution: str = DEFAULT_RESOLUTION):
+        return self._generator('LeaderboardImageGenerator', resolution)
+
+    def warm_up(self, resolutions=(DEFAULT_RESOLUTION,)):
+        from generators import assets
+
+        for resolution in resolutions:
+            stats = self.stats_generator(resolution)
+            profile = self.profile_generator(resolution)
+            punishments = self.punishments_generator(resolution)
+            assets.warm_up(
+                font_sizes=(
+                    stats.title_font_size, stats.header_font_size, stats.text_font_size, stats.small_font_size,
+                    profile.title_font_size, profile.text_font_size,
+                    punishments.title_font_size, punishments.text_font_size, punishments.small_font_size,
+                ),
+                canvas_sizes=(
+                    (stats.width, stats.height),
+                    (profile.width, profile.height),
+                    (punishments.width, punishments.height),
+                ),
+            )
+
+    def fetch(self, key: str, func: Callable, *args, kind: Optional[str] = None,
+              deadline: Optional[Deadline] = None, **context):
+        stores_objects = getattr(self.cache, 'stores_objects', False)
+
+        if self.cache is not None:
+            cached = self.cache.get(key)
+            if cached is not None:
+                return cached if stores_objects else parse_response(kind, cached, **context)
+        if _cached_only.get():
+            raise CacheMiss(key)
+
+        if self.scheduler is None:
+            data = self._call(key, func, args, deadline)
+        else:
+            with self.scheduler.slot(deadline):
+                data = self._call(key, func, args, deadline)
+        parsed = parse_response(kind, data, **context)
+
+        if self.cache is not None and data is not None and api_error(data) is None:
+            self.cache.set(key, parsed if stores_objects else data, self.cache_ttl)
+        return parsed
+
+    def _call(self, key: str, func: Callable, args: tuple, deadline: Optional[Deadline]):
+        if deadline is None:
+            return func(*args)
+        data = func(*args, timeout=deadline.timeout(self.api_timeout))
+        if data is None and deadline.expired:
+            raise DeadlineExceeded(f"Нет ответа API для {key}")
+        return data
+
+    def _reserve(self, command: str) -> float:
+        p95 = metrics.percentiles('render_ms', (95,), command=command)[95]
+        return self.render_reserve if p95 is None else max(self.render_reserve, p95 / 1000)
+
+    def _side_task(self, func: Callable, *args, **kwargs) -> Future:
+        return self._side.submit(contextvars.copy_context().run, func, *args, **kwargs)
+
+    def _discard(self, future: Future):
+        def close(done: Future):
+            if not done.cancelled() and done.exception() is None:
+                closer = getattr(done.result(), 'close', None)
+                if closer is not None:
+                    closer()
+
+        if not future.cancel():
+            future.add_done_callback(close)
+
+    def _collect(self, command: str, part: str, future: Future, deadline: Optional[Deadline]):
+        try:
+            if deadline is None:
+                result = future.result()
+            else:
+                result = future.result(timeout=max(0.0, deadline.remaining() - self._reserve(command)))
+        except (FutureTimeout, DeadlineExceeded):
+            self._discard(future)
+            metrics.inc('partial_results', command=command, part=part, reason='deadline')
+            logger.info("Команда %s: %s не получен вовремя, отвечаем без него", command, part)
+            return None
+        except CacheMiss:
+            raise
+        except Exception as e:
+            metrics.inc('partial_results', command=command, part=part, reason='error')
+            logger.warning("Команда %s: не удалось получить %s: %s", command, part, e)
+            return None
+        if result is None or api_error(result) is not None:
+            metrics.inc('partial_results', command=command, part=part, reason='error')
+            return None
+        return result
+
+    def _render(self, command: str, render: Callable, shed: Callable, allow_shed: bool,
+                deadline: Optional[Deadline] = None):
+        if _cached_only.get():
+            raise CacheMiss(command)
+        if allow_shed and deadline is not None and deadline.expired:
+            metrics.inc('partial_results', command=command, part='image', reason='deadline')
+            return None, shed()
+        if self.admission is None:
+            return render(), None
+        if allow_shed and not self.admission.admit(command):
+            return None, shed()
+        with self.admission.rendering(command):
+            return render(), None
+
+    def ready(self, command: str, args: Dict, guild_id=None) -> Optional[CommandResult]:
+        if command not in self.READY_COMMANDS:
+            return None
+        token = _cached_only.set(True)
+        try:
+            result = self.run(command, dict(args), guild_id=guild_id)
+        except CacheMiss:
+            result = None
+        finally:
+            _cached_only.reset(token)
+        metrics.inc('ready_result', command=command, result='miss' if result is None else 'hit')
+        return result
+
+    def run(self, command: str, args: Dict, deadline: Optional[Deadline] = None, guild_id=None) -> CommandResult:
+        if command not in self.COMMANDS:
+            raise ValueError(f"Неизвестная команда: {command}")
+        with tracer.track(command), request_priority(INTERACTIVE, guild_id):
+            try:
+                if self.admission is not None and command in self.IMAGE_COMMANDS:
+                    with self.admission.pending():
+                        return getattr(self, command)(deadline=deadline, **args)
+                return getattr(self, command)(deadline=deadline, **args)
+            except DeadlineExceeded as e:
+                metrics.inc('deadline_exceeded', command=command)
+                logger.warning("Команда %s не уложилась в срок: %s", command, e)
+                return CommandResult("⏱️ API не ответил вовремя. Попробуйте ещё раз чуть позже.")
+
+    def _stats_payload(self, nickname: str, mode: str, deadline: Optional[Deadline]):
+        profile_future = self._side_task(self.fetch, f"profile:{nickname.lower()}",
+                                         self.api_client.get_player_profile, nickname,
+                                         kind='profile', nickname=nickname, deadline=deadline)
+        try:
+            stats_data = self.fetch(f"stats:{nickname.lower()}:{mode.lower()}",
+                                    self.api_client.get_player_stats, nickname, mode,
+                                    kind='stats', nickname=nickname, mode=mode, deadline=deadline)
+        except (DeadlineExceeded, CacheMiss):
+            self._discard(profile_future)
+            raise
+
+        if stats_data is None or api_error(stats_data) is not None:
+            self._discard(profile_future)
+
+        if stats_data is None:
+            return None, CommandResult(
+                f"❌ Не удалось получить статистику для игрока **{nickname}** в режиме **{mode.upper()}**.\n"
+                "Проверьте правильность ника и режима."
+            )
+
+        error_msg = api_error(stats_data)
+        if error_msg is not None:
+            return None, CommandResult(f"❌ Ошибка: {error_msg}")
+
+        if not _cached_only.get():
+            if self.leaderboard is not None:
+                self.leaderboard.update(stats_data)
+            if self.nicknames is not None and getattr(stats_data, 'valid', False) and stats_data.fields:
+                self.nicknames.record(nickname)
+
+        profile_data = self._collect('stats', 'rank', profile_future, deadline)
+        return (stats_data, getattr(profile_data, 'rank', None), time.time()), None
+
+    def stats(self, nickname: str, mode: str, resolution: str = DEFAULT_RESOLUTION,
+              allow_shed: bool = True, deadline: Optional[Deadline] = None, page: int = 1,
+              navigate: bool = False) -> CommandResult:
+        payload_key = (nickname.lower(), mode.upper())
+        payload = self._stat_payloads.get(payload_key)
+        if payload is None or time.time() - payload[2] > (INTERACTION_TOKEN_TTL if navigate else self.cache_ttl):
+            payload, error = self._stats_payload(nickname, mode, deadline)
+            if error is not None:
+                return error
+            self._stat_payloads.put(payload_key, payload)
+        stats_data, rank, fetched_at = payload
+
+        generator = self.stats_generator(resolution)
+        pages = generator.page_count(mode, stats_data)
+        page = max(1, min(page, pages))
+        content = f"📊 Статистика игрока **{nickname}** в режиме **{mode.upper()}**"
+
+        def shed():
+            title = f"Статистика игрока {nickname}"
+            color = None
+            if rank:
+                title = f"Статистика игрока {format_rank_name(rank)} {nickname}"
+                color = generator._get_rank_color(rank) or (255, 0, 0)
+            return CommandResult(
+                content,
+                embed=_embed(title, generator.schema_rows(mode, stats_data), color,
+                             f"Режим: {generator._get_mode_name(mode)}"),
+                render_request=f"render:stats:{mode}:{nickname}"
+            )
+
+        page_key = payload_key + (generator.resolution, fetched_at, page)
+        cached = self._stat_pages.get(page_key)
+        if cached is not None:
+            metrics.inc('stat_page_cache', result='hit')
+            image_bytes = io.BytesIO(cached)
+        else:
+            image_bytes, shed_result = self._render(
+                'stats', lambda: generator.generate(nickname, mode, stats_data, rank, page), shed, allow_shed,
+                deadline
+            )
+            if shed_result is not None:
+                return shed_result
+
+            if image_bytes is None:
+                return CommandResult("❌ Не удалось сгенерировать изображение со статистикой.")
+
+            metrics.inc('stat_page_cache', result='miss')
+            self._stat_pages.put(page_key, image_bytes.getvalue())
+
+        return CommandResult(
+            content,
+            image_bytes,
+            f"stats_{nickname}_{mode}.png" if page == 1 else f"stats_{nickname}_{mode}_{page}.png",
+            page=page,
+            pages=pages,
+            page_request=f"page:stats:{mode}:{nickname}",
+            edit=navigate
+        )
+
+    def _load_skin(self, generator, nickname: str, deadline: Optional[Deadline]):
+        if _cached_only.get():
+            raise CacheMiss(f"skin:{nickname.lower()}")
+        if deadline is None:
+            return generator._load_skin_image(nickname, self.api_timeout)
+        return generator._load_skin_image(nickname, deadline.timeout(self.api_timeout, self._reserve('profile')))
+
+    def profile(self, nickname: str, resolution: str = DEFAULT_RESOLUTION,
+                allow_shed: bool = True, deadline: Optional[Deadline] = None) -> CommandResult:
+        generator = self.profile_generator(resolution)
+        skin_future = self._side_task(self._load_skin, generator, nickname, deadline)
+        try:
+            profile_data = self.fetch(f"profile:{nickname.lower()}",
+                                      self.api_client.get_player_profile, nickname,
+                                      kind='profile', nickname=nickname, deadline=deadline)
+        except (DeadlineExceeded, CacheMiss):
+            self._discard(skin_future)
+            raise
+
+        if profile_data is None or api_error(profile_data) is not None:
+            self._discard(skin_future)
+
+        if profile_data is None:
+            return CommandResult(
+                f"❌ Не удалось получить профиль для игрока **{nickname}**.\n"
+                "Проверьте правильность ника."
+            )
+
+        error_msg = api_error(profile_data)
+        if error_msg is not None:
+            return CommandResult(f"❌ Ошибка: {error_msg}")
+
+        if self.nicknames is not None and not _cached_only.get():
+            self.nicknames.record(profile_data.username or nickname)
+
+        def shed():
+            rank = profile_data.rank
+            color = generator._get_rank_color(rank) if rank and rank.upper() != "DEFAULT" else None
+            return CommandResult(
+                f"👤 Профиль игрока **{nickname}**",
+                embed=_embed(profile_data.username, profile_data.info_items(), color),
+                render_request=f"render:profile:{nickname}"
+            )
+
+        skin = self._collect('profile', 'skin', skin_future, deadline)
+        image_bytes, shed_result = self._render(
+            'profile', lambda: generator.generate(nickname, profile_data, skin, load_skin=False),
+            shed, allow_shed, deadline
+        )
+        if shed_result is not None:
+            if skin is not None:
+                skin.close()
+            return shed_result
+
+        if image_bytes is None:
+            return CommandResult("❌ Не удалось сгенерировать изображение профиля.")
+
+        return CommandResult(f"👤 Профиль игрока **{nickname}**", image_bytes, f"profile_{nickname}.png")
+
+    def punishments(self, resolution: str = DEFAULT_RESOLUTION, allow_shed: bool = True,
+                    deadline: Optional[Deadline] = None) -> CommandResult:
+        stats_data = self.fetch("staff_stats", self.api_client.get_staff_stats, kind='staff_stats',
+                                deadline=deadline)
+
+        if stats_data is None:
+            return CommandResult("❌ Не удалось получить статистику наказаний.")
+
+        error_msg = api_error(stats_data)
+        if error_msg is not None:
+            return CommandResult(f"❌ Ошибка: {error_msg}")
+
+        generator = self.punishments_generator(resolution)
+
+        def shed():
+            return CommandResult(
+                "📊 Статистика наказаний",
+                embed=_embed("Статистика наказаний", stats_data.items()),
+                render_request="render:punishments"
+            )
+
+        image_bytes, shed_result = self._render(
+            'punishments', lambda: generator.generate(stats_data), shed, allow_shed, deadline
+        )
+        if shed_result is not None:
+            return shed_result
+
+        if image_bytes is None:
+            return CommandResult("❌ Не удалось сгенерировать изображение статистики наказаний.")
+
+        return CommandResult("📊 Статистика наказаний", image_bytes, "punishments.png")
+
+    def history(self, metric: str, period: str = 'day', resolution: str = DEFAULT_RESOLUTION,
+                allow_shed: bool = True, deadline: Optional[Deadline] = None) -> CommandResult:
+        if self.history_store is None:
+            return CommandResult("❌ История не ведётся.")
+        if metric not in HISTORY_LABELS or period not in HISTORY_PERIODS:
+            return CommandResult("❌ Неизвестная метрика или период.")
+
+        duration, period_name = HISTORY_PERIODS[period]
+        end = int(time.time())
+        start = end - duration
+        generator = self.history_generator(resolution)
+        points = self.history_store.query(metric, start, end, buckets=generator.width // 8)
+        title = HISTORY_LABELS[metric]
+        content = f"📈 {title} {period_name}"
+
+        def shed():
+            summary = summarize(points)
+            items = [] if summary is None else [("Минимум", summary[0]), ("Максимум", summary[1]),
+                                                ("Среднее", round(summary[2], 1))]
+            return CommandResult(content, embed=_embed(f"{title} {period_name}", items,
+                                                       description=None if items else "Нет данных за этот период"),
+                                 render_request=f"render:history:{metric}:{period}")
+
+        image_bytes, shed_result = self._render(
+            'history', lambda: generator.generate(title, period_name.capitalize(), points, start, end),
+            shed, allow_shed, deadline
+        )
+        if shed_result is not None:
+            return shed_result
+
+        if image_bytes is None:
+            return CommandResult("❌ Не удалось сгенерировать график.")
+
+        return CommandResult(content, image_bytes, f"history_{metric}_{period}.png")
+
+    def top(self, mode: str, stat: str, limit: int = 10, resolution: str = DEFAULT_RESOLUTION,
+            allow_shed: bool = True, deadline: Optional[Deadline] = None) -> CommandResult:
+        if self.leaderboard is None:
+            return CommandResult("❌ Таблица лидеров не ведётся.")
+
+        stat = stat.lower()
+        entries = self.leaderboard.top(mode, stat, max(1, min(limit, 25)))
+        if not entries:
+            known = ", ".join(self.leaderboard.stats(mode)[:25])
+            hint = f"\nДоступные показатели: {known}" if known else ""
+            return CommandResult(
+                f"❌ Нет данных для таблицы лидеров **{stat}** в режиме **{mode.upper()}**.{hint}"
+            )
+
+        generator = self.leaderboard_generator(resolution)
+        label = generator._format_stat_label(stat)
+        mode_name = self.stats_generator(resolution)._get_mode_name(mode)
+        content = f"🏆 Топ игроков по показателю **{label}** в режиме **{mode.upper()}**"
+
+        def shed():
+            from generators.leaderboard_generator import format_leaderboard_value
+            items = [(f"{place}. {name}", format_leaderboard_value(stat, value))
+                     for place, (name, value) in enumerate(entries, 1)]
+            return CommandResult(content, embed=_embed(f"Топ: {label}", items, description=f"Режим: {mode_name}"),
+                                 render_request=f"render:top:{mode}:{stat}")
+
+        image_bytes, shed_result = self._render(
+            'top', lambda: generator.generate(f"Топ: {label}", f"Режим: {mode_name}", stat, entries),
+            shed, allow_shed, deadline
+        )
+        if shed_result is not None:
+            return shed_result
+
+        if image_bytes is None:
+            return CommandResult("❌ Не удалось сгенерировать таблицу лидеров.")
+
+        return CommandResult(content, image_bytes, f"top_{mode}_{stat}.png")
+
+    def staff(self, deadline: Optional[Deadline] = None) -> CommandResult:
+        staff_data = self.fetch("staff_online", self.api_client.get_staff_online, kind='staff_online',
+                                deadline=deadline)
+
+        if staff_data is None:
+            return CommandResult("❌ Не удалось получить список онлайн стаффа.")
+
+        error_msg = api_error(staff_data)
+        if error_msg is not None:
+            return CommandResult(f"❌ Ошибка: {error_msg}")
+
+        players = staff_data.players
+
+        if len(players) == 0:
+            return CommandResult("👮 **Онлайн стафф**\n\nНет онлайн стаффа")
+
+        lines = [f"👮 **Онлайн стафф ({len(players)})**", ""]
+
+        for i, (display_name, user_id) in enumerate(players, 1):
+            lines.append(f"{i}. **{display_name}** (ID: {user_id})")
+
+        return CommandResult("\n".join(lines))
+
+    def online(self, deadline: Optional[Deadline] = None) -> CommandResult:
+        online_data = self.fetch("total_online", self.api_client.get_total_online, deadline=deadline)
+
+        if online_data is None:
+            return CommandResult("❌ Не удалось получить количество онлайн игроков.")
+
+        error_msg = api_error(online_data)
+        if error_msg is not None:
+            return CommandResult(f"❌ Ошибка: {error_msg}")
+
+        return CommandResult(f"👥 Онлайн игроков: **{online_count(online_data)}**")
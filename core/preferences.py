@@ -0,0 +1,62 @@
+from typing import Dict, Optional
+import json
+import logging
+import os
+import threading
+
+logger = logging.getLogger('preferences')
+
+
+class PreferenceStore:
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._data: Dict[str, Dict[str, Dict[str, str]]] = {'users': {}, 'guilds': {}}
+        self._load()
+
+    def _load(self):
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except FileNotFoundError:
+            return
+        except (OSError, ValueError) as e:
+            logger.warning("Не удалось загрузить настройки %s: %s", self.path, e)
+            return
+        self._data['users'].update(data.get('users', {}))
+        self._data['guilds'].update(data.get('guilds', {}))
+
+    def _save(self):
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self._data, f, ensure_ascii=False)
+        os.replace(tmp_path, self.path)
+
+    def get(self, scope: str, owner_id, key: str) -> Optional[str]:
+        return self._data[scope].get(str(owner_id), {}).get(key)
+
+    def set(self, scope: str, owner_id, key: str, value: Optional[str]):
+        with self._lock:
+            entry = self._data[scope].setdefault(str(owner_id), {})
+            if value is None:
+                entry.pop(key, None)
+                if not entry:
+                    self._data[scope].pop(str(owner_id), None)
+            else:
+                entry[key] = value
+            self._save()
+
+    def resolve(self, key: str, user_id=None, guild_id=None, default: Optional[str] = None) -> Optional[str]:
+        if user_id is not None:
+            value = self.get('users', user_id, key)
+            if value is not None:
+                return value
+        if guild_id is not None:
+            value = self.get('guilds', guild_id, key)
+            if value is not None:
+                return value
+        return default
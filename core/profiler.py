@@ -0,0 +1,210 @@
+from collections import Counter
+from concurrent.futures import Future
+from html import escape
+from typing import Dict, List, Optional, Tuple
+import logging
+import os
+import re
+import sys
+import threading
+import time
+import zlib
+
+from .metrics import metrics
+
+logger = logging.getLogger('profiler')
+
+MAX_DURATION = 300.0
+MAX_DEPTH = 128
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+_THREAD_SUFFIX = re.compile(r'[_-]\d+$')
+_IDLE_FRAMES = {
+    ('threading.py', 'wait'), ('selectors.py', 'select'), ('queue.py', 'get'), ('thread.py', '_worker'),
+    ('base_events.py', '_run_once'),
+}
+
+
+def _frame_label(frame) -> str:
+    code = frame.f_code
+    name = getattr(code, 'co_qualname', code.co_name)
+    return f"{name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+def _is_idle(frame) -> bool:
+    return (os.path.basename(frame.f_code.co_filename), frame.f_code.co_name) in _IDLE_FRAMES
+
+
+def _is_project_frame(frame) -> bool:
+    filename = os.path.abspath(frame.f_code.co_filename)
+    return filename.startswith(PROJECT_ROOT) and f"{os.sep}site-packages{os.sep}" not in filename
+
+
+def render_flamegraph(stacks: Counter, title: str, width: int = 1200, row_height: int = 16) -> str:
+    tree: Dict = {}
+    total = sum(stacks.values())
+    for stack, count in stacks.items():
+        node = tree
+        for frame in stack.split(';'):
+            child = node.setdefault(frame, [0, {}])
+            child[0] += count
+            node = child[1]
+
+    depth_max = max(stack.count(';') for stack in stacks) + 1
+    height = (depth_max + 1) * row_height + 24
+    rects: List[str] = []
+
+    def walk(children: Dict, x: float, depth: int):
+        y = height - (depth + 1) * row_height
+        for name, (count, grandchildren) in sorted(children.items()):
+            span = width * count / total
+            if span >= 0.5:
+                hue = zlib.crc32(name.encode('utf-8')) % 60
+                label = escape(name)
+                text = f'<text x="{x + 3:.1f}" y="{y + row_height - 4}">{label[:int(span // 7)]}</text>'
+                rects.append(
+                    f'<g><title>{label} — {count} ({100 * count / total:.1f}%)</title>'
+                    f'<rect x="{x:.1f}" y="{y}" width="{span:.1f}" height="{row_height - 1}" '
+                    f'fill="hsl({hue},80%,60%)"/>{text if span > 35 else ""}</g>'
+                )
+                walk(grandchildren, x, depth + 1)
+            x += span
+
+    walk(tree, 0.0, 0)
+    return (
+        f'<svg xmlns="http://www.w3.org/2000/svg" width="{width}" height="{height}" '
+        f'font-family="monospace" font-size="11">'
+        f'<text x="{width // 2}" y="16" text-anchor="middle" font-size="14">{escape(title)}</text>'
+        f'{"".join(rects)}</svg>'
+    )
+
+
+class ProfileReport:
+
+    def __init__(self, stacks: Counter, hot: Counter, samples: int, busy: int, duration: float,
+                 paths: Tuple[str, ...]):
+        self.stacks = stacks
+        self.hot = hot
+        self.samples = samples
+        self.busy = busy
+        self.duration = duration
+        self.paths = paths
+
+    def top(self, limit: int = 5) -> List[Tuple[str, float]]:
+        if not self.busy:
+            return []
+        return [(name, 100 * count / self.busy) for name, count in self.hot.most_common(limit)]
+
+
+class SamplingProfiler:
+
+    def __init__(self, output_dir: str, interval: float = 0.01, keep: int = 10):
+        self.output_dir = output_dir
+        self.interval = max(0.001, interval)
+        self.keep = keep
+        self._lock = threading.Lock()
+        self._running: Optional[Future] = None
+
+    @property
+    def running(self) -> bool:
+        return self._running is not None
+
+    def start(self, seconds: float) -> Optional[Future]:
+        seconds = min(max(1.0, seconds), MAX_DURATION)
+        with self._lock:
+            if self._running is not None:
+                return None
+            future = self._running = Future()
+        thread = threading.Thread(target=self._run, args=(seconds, future), name='profiler', daemon=True)
+        thread.start()
+        logger.info("Профилирование запущено на %.0f с (интервал %.0f мс)", seconds, self.interval * 1000)
+        return future
+
+    def _sample(self, stacks: Counter, hot: Counter, own_ident: int) -> int:
+        names = {thread.ident: _THREAD_SUFFIX.sub('', thread.name) for thread in threading.enumerate()}
+        busy = 0
+        for ident, frame in sys._current_frames().items():
+            if ident == own_ident:
+                continue
+            idle = _is_idle(frame)
+            labels = []
+            owner = None
+            while frame is not None and len(labels) < MAX_DEPTH:
+                label = _frame_label(frame)
+                labels.append(label)
+                if owner is None and _is_project_frame(frame):
+                    owner = label
+                frame = frame.f_back
+            labels.append(names.get(ident, str(ident)))
+            stacks[';'.join(reversed(labels))] += 1
+            if not idle:
+                busy += 1
+                if owner is not None:
+                    hot[owner] += 1
+        return busy
+
+    def _run(self, seconds: float, future: Future):
+        stacks: Counter = Counter()
+        hot: Counter = Counter()
+        own_ident = threading.get_ident()
+        samples = busy = 0
+        started = time.perf_counter()
+        try:
+            deadline = started + seconds
+            next_at = started
+            while True:
+                now = time.perf_counter()
+                if now >= deadline:
+                    break
+                if now < next_at:
+                    time.sleep(next_at - now)
+                    continue
+                busy += self._sample(stacks, hot, own_ident)
+                samples += 1
+                next_at += self.interval
+                if next_at < now:
+                    next_at = now + self.interval
+
+            duration = time.perf_counter() - started
+            paths = self._write(stacks, samples, duration)
+            metrics.inc('profiler_runs')
+            metrics.inc('profiler_samples', samples)
+            logger.info("Профилирование завершено: %d срезов за %.1f с, файлы: %s",
+                        samples, duration, ", ".join(paths))
+            future.set_result(ProfileReport(stacks, hot, samples, busy, duration, paths))
+        except Exception as e:
+            logger.error("Ошибка профилирования: %s", e)
+            future.set_exception(e)
+        finally:
+            with self._lock:
+                self._running = None
+
+    def _write(self, stacks: Counter, samples: int, duration: float) -> Tuple[str, ...]:
+        os.makedirs(self.output_dir, exist_ok=True)
+        stem = os.path.join(self.output_dir, f"profile-{time.strftime('%Y%m%d-%H%M%S')}-{os.getpid()}")
+
+        collapsed_path = f"{stem}.collapsed"
+        with open(collapsed_path, 'w', encoding='utf-8') as f:
+            for stack, count in stacks.most_common():
+                f.write(f"{stack} {count}\n")
+
+        svg_path = f"{stem}.svg"
+        title = f"{samples} срезов за {duration:.1f} с, pid {os.getpid()}"
+        with open(svg_path, 'w', encoding='utf-8') as f:
+            f.write(render_flamegraph(stacks, title) if stacks else '<svg xmlns="http://www.w3.org/2000/svg"/>')
+
+        self._prune()
+        return collapsed_path, svg_path
+
+    def _prune(self):
+        runs = sorted(
+            (os.path.join(self.output_dir, name) for name in os.listdir(self.output_dir)
+             if name.startswith('profile-') and name.endswith('.collapsed')),
+            key=os.path.getmtime
+        )
+        for collapsed_path in runs[:max(0, len(runs) - self.keep)]:
+            for path in (collapsed_path, collapsed_path[:-len('.collapsed')] + '.svg'):
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
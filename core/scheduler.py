@@ -0,0 +1,138 @@
+from contextlib import contextmanager
+from typing import Dict, List, Optional
+import contextvars
+import itertools
+import threading
+import time
+
+from .deadline import Deadline, DeadlineExceeded
+from .metrics import metrics
+
+INTERACTIVE = 'interactive'
+URGENT = 'urgent'
+BACKGROUND = 'background'
+
+_request = contextvars.ContextVar('api_request', default=(BACKGROUND, None))
+
+
+@contextmanager
+def request_priority(priority: str, guild_id=None):
+    token = _request.set((priority, guild_id))
+    try:
+        yield
+    finally:
+        _request.reset(token)
+
+
+class _Waiter:
+
+    __slots__ = ('priority', 'guild', 'deadline', 'tag', 'seq', 'enqueued', 'granted', 'preempted', 'label')
+
+    def __init__(self, priority: str, guild, deadline: Optional[Deadline], tag: float, seq: int):
+        self.priority = priority
+        self.guild = guild
+        self.deadline = deadline
+        self.tag = tag
+        self.seq = seq
+        self.enqueued = time.perf_counter()
+        self.granted = threading.Event()
+        self.preempted = False
+        self.label = priority
+
+
+class ApiScheduler:
+
+    def __init__(self, concurrency: int = 8, reserved: int = 2, urgent_window: float = 2.0,
+                 weights: Optional[Dict] = None):
+        self.concurrency = max(1, concurrency)
+        self.reserved = min(max(0, reserved), self.concurrency - 1)
+        self.urgent_window = urgent_window
+        self.weights = dict(weights or {})
+        self._lock = threading.Lock()
+        self._seq = itertools.count()
+        self._queues: Dict[str, List[_Waiter]] = {INTERACTIVE: [], BACKGROUND: []}
+        self._virtual: Dict[str, float] = {INTERACTIVE: 0.0, BACKGROUND: 0.0}
+        self._finish: Dict[str, Dict] = {INTERACTIVE: {}, BACKGROUND: {}}
+        self._active: Dict[str, int] = {INTERACTIVE: 0, BACKGROUND: 0}
+
+    def _enqueue(self, priority: str, guild, deadline: Optional[Deadline]) -> _Waiter:
+        finish = self._finish[priority]
+        start = max(self._virtual[priority], finish.get(guild, 0.0))
+        finish[guild] = start + 1.0 / self.weights.get(guild, 1.0)
+        waiter = _Waiter(priority, guild, deadline, start, next(self._seq))
+        self._queues[priority].append(waiter)
+        return waiter
+
+    def _next(self) -> Optional[_Waiter]:
+        interactive = self._queues[INTERACTIVE]
+        if interactive:
+            urgent = [waiter for waiter in interactive if waiter.deadline is not None
+                      and waiter.deadline.remaining() < self.urgent_window]
+            if urgent:
+                waiter = min(urgent, key=lambda waiter: waiter.deadline.expires_at)
+                waiter.label = URGENT
+                return waiter
+            return min(interactive, key=lambda waiter: (waiter.tag, waiter.seq))
+
+        background = self._queues[BACKGROUND]
+        if not background:
+            return None
+        if self._active[BACKGROUND] >= self.concurrency - self.reserved:
+            return None
+        if self._active[INTERACTIVE] >= self.reserved > 0:
+            for waiter in background:
+                if not waiter.preempted:
+                    waiter.preempted = True
+                    metrics.inc('api_background_preempted')
+            return None
+        return min(background, key=lambda waiter: (waiter.tag, waiter.seq))
+
+    def _dispatch(self):
+        while sum(self._active.values()) < self.concurrency:
+            waiter = self._next()
+            if waiter is None:
+                break
+            queue = self._queues[waiter.priority]
+            queue.remove(waiter)
+            self._virtual[waiter.priority] = max(self._virtual[waiter.priority], waiter.tag)
+            if not queue:
+                self._finish[waiter.priority].clear()
+            self._active[waiter.priority] += 1
+            waiter.granted.set()
+
+    def _publish(self):
+        for priority, queue in self._queues.items():
+            metrics.set('api_queue_depth', len(queue), priority=priority)
+            metrics.set('api_in_flight', self._active[priority], priority=priority)
+
+    def _abandon(self, waiter: _Waiter) -> bool:
+        with self._lock:
+            if waiter.granted.is_set():
+                return False
+            self._queues[waiter.priority].remove(waiter)
+            self._dispatch()
+            self._publish()
+        return True
+
+    @contextmanager
+    def slot(self, deadline: Optional[Deadline] = None):
+        priority, guild = _request.get()
+        priority = INTERACTIVE if priority in (INTERACTIVE, URGENT) else BACKGROUND
+        with self._lock:
+            waiter = self._enqueue(priority, guild, deadline)
+            self._dispatch()
+            self._publish()
+
+        timeout = None if deadline is None else max(0.0, deadline.remaining())
+        if not waiter.granted.wait(timeout) and self._abandon(waiter):
+            metrics.inc('api_queue_timeouts', priority=priority)
+            raise DeadlineExceeded("Запрос к API не дождался очереди")
+
+        metrics.observe('api_queue_wait_ms', (time.perf_counter() - waiter.enqueued) * 1000, priority=waiter.label)
+        try:
+            yield
+        finally:
+            with self._lock:
+                self._active[priority] -= 1
+                self._dispatch()
+                self._publish()
@@ -0,0 +1,107 @@
+from contextlib import contextmanager
+from typing import Dict, List, Optional, Tuple
+import hashlib
+import json
+import logging
+import os
+import time
+
+logger = logging.getLogger('startup')
+
+
+class StartupTracker:
+
+    STARTING = 'starting'
+    WARMING = 'warming'
+    READY = 'ready'
+
+    def __init__(self):
+        self.started_at = time.perf_counter()
+        self.state = self.STARTING
+        self.phases: List[Tuple[str, float]] = []
+        self.marks: List[Tuple[str, float]] = []
+        self.gateway_ready = False
+        self.warm = False
+        self._reported = False
+
+    @contextmanager
+    def phase(self, name: str):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.phases.append((name, time.perf_counter() - started))
+
+    def mark(self, name: str):
+        self.marks.append((name, time.perf_counter() - self.started_at))
+
+    def elapsed(self) -> float:
+        return time.perf_counter() - self.started_at
+
+    def set_gateway_ready(self) -> bool:
+        self.gateway_ready = True
+        return self._update_state()
+
+    def set_warm(self) -> bool:
+        self.warm = True
+        return self._update_state()
+
+    def _update_state(self) -> bool:
+        if self.gateway_ready and self.warm:
+            self.state = self.READY
+        elif self.state == self.STARTING:
+            self.state = self.WARMING
+
+        if self.state == self.READY and not self._reported:
+            self._reported = True
+            return True
+        return False
+
+    def breakdown(self) -> str:
+        parts = [f"{name}@{offset * 1000:.0f}мс" for name, offset in self.marks]
+        parts.extend(f"{name}={duration * 1000:.0f}мс" for name, duration in self.phases)
+        parts.append(f"всего={self.elapsed() * 1000:.0f}мс")
+        return ", ".join(parts)
+
+
+def command_tree_hash(tree) -> str:
+    commands = sorted(tree.get_commands(), key=lambda command: command.name)
+    payload = [command.to_dict() for command in commands]
+    encoded = json.dumps(payload, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(encoded.encode('utf-8')).hexdigest()
+
+
+class CommandSyncState:
+
+    def __init__(self, path: str):
+        self.path = path
+
+    def load(self) -> Optional[str]:
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                return f.read().strip() or None
+        except OSError:
+            return None
+
+    def save(self, digest: str):
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.write(digest)
+        os.replace(tmp_path, self.path)
+
+
+async def sync_command_tree(tree, state: CommandSyncState, force: bool = False) -> Dict:
+    digest = command_tree_hash(tree)
+    previous = state.load()
+
+    if not force and previous == digest:
+        logger.info("Дерево команд не изменилось (%s), синхронизация пропущена", digest[:12])
+        return {'synced': False, 'hash': digest, 'count': len(tree.get_commands())}
+
+    synced = await tree.sync()
+    state.save(digest)
+    logger.info("Синхронизировано %d команд (хеш %s)", len(synced), digest[:12])
+    return {'synced': True, 'hash': digest, 'count': len(synced)}
@@ -0,0 +1,290 @@
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+import logging
+import math
+import mmap
+import os
+import struct
+import threading
+import time
+
+from .models import OnlineStaff, StaffStats, api_error, online_count
+
+logger = logging.getLogger('timeseries')
+
+HISTORY_FIELDS = (
+    'online', 'staff_online',
+    'total_bans', 'total_mutes', 'total_active_bans', 'total_active_mutes', 'total_week_bans', 'total_week_mutes',
+)
+
+HISTORY_LABELS = {
+    'online': "Онлайн игроков",
+    'staff_online': "Онлайн стаффа",
+    'total_bans': "Всего банов",
+    'total_mutes': "Всего мутов",
+    'total_active_bans': "Активных банов",
+    'total_active_mutes': "Активных мутов",
+    'total_week_bans': "Банов за неделю",
+    'total_week_mutes': "Мутов за неделю",
+}
+
+HISTORY_PERIODS = {
+    'day': (86400, "за сутки"),
+    'week': (7 * 86400, "за неделю"),
+    'month': (30 * 86400, "за месяц"),
+    'year': (365 * 86400, "за год"),
+}
+
+HISTORY_TIERS = (
+    (300, 14 * 86400),
+    (3600, 400 * 86400),
+    (86400, 10 * 366 * 86400),
+)
+
+_MAGIC = b'AGTS'
+_VERSION = 1
+_HEADER = struct.Struct('<4sHHIII')
+_HEADER_SIZE = 32
+_FIELD = 'ffdI'
+
+
+class RingFile:
+
+    def __init__(self, path: str, record: struct.Struct, capacity: int, create: bool = True):
+        self.path = path
+        self.record = record
+        self.capacity = capacity
+        size = _HEADER_SIZE + capacity * record.size
+
+        if not os.path.exists(path):
+            if not create:
+                raise FileNotFoundError(path)
+            directory = os.path.dirname(path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            with open(path, 'wb') as f:
+                f.truncate(size)
+
+        self._file = open(path, 'r+b' if create else 'rb')
+        if create and os.path.getsize(path) != size:
+            self._file.truncate(size)
+        self._mm = mmap.mmap(self._file.fileno(), size, access=mmap.ACCESS_WRITE if create else mmap.ACCESS_READ)
+
+        magic, version, record_size, capacity, _, _ = _HEADER.unpack_from(self._mm, 0)
+        if (magic, version, record_size, capacity) != (_MAGIC, _VERSION, record.size, self.capacity):
+            if not create:
+                raise ValueError(f"Несовместимый формат файла {path}")
+            if magic == _MAGIC:
+                logger.warning("Формат %s изменился, история будет начата заново", path)
+            self._write_header(0, 0)
+
+    def _write_header(self, head: int, count: int):
+        _HEADER.pack_into(self._mm, 0, _MAGIC, _VERSION, self.record.size, self.capacity, head, count)
+
+    def _state(self) -> Tuple[int, int]:
+        _, _, _, _, head, count = _HEADER.unpack_from(self._mm, 0)
+        return head, count
+
+    def _offset(self, slot: int) -> int:
+        return _HEADER_SIZE + (slot % self.capacity) * self.record.size
+
+    def __len__(self):
+        return self._state()[1]
+
+    def get(self, index: int, state: Optional[Tuple[int, int]] = None) -> tuple:
+        head, count = state or self._state()
+        return self.record.unpack_from(self._mm, self._offset(head - count + index))
+
+    def last(self) -> Optional[tuple]:
+        head, count = self._state()
+        if not count:
+            return None
+        return self.record.unpack_from(self._mm, self._offset(head - 1))
+
+    def append(self, values: Sequence):
+        head, count = self._state()
+        self.record.pack_into(self._mm, self._offset(head), *values)
+        self._write_header((head + 1) % self.capacity, min(count + 1, self.capacity))
+
+    def replace_last(self, values: Sequence):
+        head, count = self._state()
+        if not count:
+            self.append(values)
+            return
+        self.record.pack_into(self._mm, self._offset(head - 1), *values)
+
+    def bisect(self, timestamp: int, state: Optional[Tuple[int, int]] = None) -> int:
+        state = state or self._state()
+        lo, hi = 0, state[1]
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self.get(mid, state)[0] < timestamp:
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo
+
+    def flush(self):
+        self._mm.flush()
+
+    def close(self):
+        self._mm.close()
+        self._file.close()
+
+
+class TimeSeriesStore:
+
+    def __init__(self, directory: str, fields: Sequence[str] = HISTORY_FIELDS,
+                 tiers: Sequence[Tuple[int, int]] = HISTORY_TIERS, readonly: bool = False):
+        self.directory = directory
+        self.fields = tuple(fields)
+        self.tiers = tuple(sorted(tiers))
+        self.readonly = readonly
+        self.record = struct.Struct('<I' + _FIELD * len(self.fields))
+        self._lock = threading.Lock()
+        self._rings: Dict[int, RingFile] = {}
+
+    def _ring(self, width: int, retention: int) -> Optional[RingFile]:
+        ring = self._rings.get(width)
+        if ring is None:
+            path = os.path.join(self.directory, f"history_{width}.ring")
+            try:
+                ring = RingFile(path, self.record, retention // width, create=not self.readonly)
+            except (FileNotFoundError, ValueError):
+                return None
+            self._rings[width] = ring
+        return ring
+
+    def _merge(self, record: Optional[tuple], bucket: int, values: Dict[str, Optional[float]]) -> List:
+        merged = [bucket]
+        for index, field in enumerate(self.fields):
+            if record is not None:
+                low, high, total, count = record[1 + index * 4: 5 + index * 4]
+            else:
+                low, high, total, count = math.inf, -math.inf, 0.0, 0
+            value = values.get(field)
+            if value is not None:
+                low, high, total, count = min(low, value), max(high, value), total + value, count + 1
+            merged.extend((low, high, total, count))
+        return merged
+
+    def append(self, values: Dict[str, Optional[float]], timestamp: Optional[float] = None):
+        timestamp = int(time.time() if timestamp is None else timestamp)
+        with self._lock:
+            for width, retention in self.tiers:
+                ring = self._ring(width, retention)
+                if ring is None:
+                    continue
+                bucket = timestamp - timestamp % width
+                last = ring.last()
+                if last is not None and last[0] == bucket:
+                    ring.replace_last(self._merge(last, bucket, values))
+                elif last is None or last[0] < bucket:
+                    ring.append(self._merge(None, bucket, values))
+
+    def _select_tier(self, start: int, width: float) -> Optional[RingFile]:
+        available = [(w, ring) for w, retention in self.tiers
+                     for ring in (self._ring(w, retention),) if ring is not None and len(ring)]
+        if not available:
+            return None
+
+        chosen = available[0]
+        for candidate in available:
+            if candidate[0] <= width:
+                chosen = candidate
+        coarser = [candidate for candidate in available if candidate[0] >= chosen[0]]
+        for candidate in coarser:
+            if candidate[1].get(0)[0] <= start:
+                return candidate[1]
+        oldest = min(candidate[1].get(0)[0] for candidate in coarser)
+        for candidate in coarser:
+            if candidate[1].get(0)[0] - oldest <= coarser[-1][0]:
+                return candidate[1]
+        return coarser[-1][1]
+
+    def query(self, field: str, start: float, end: float, buckets: int = 120) -> List[Tuple[int, float, float, float]]:
+        index = self.fields.index(field)
+        start, end = int(start), int(end)
+        width = max(1.0, (end - start) / max(1, buckets))
+        ring = self._select_tier(start, width)
+        if ring is None:
+            return []
+
+        state = ring._state()
+        result: Dict[int, List[float]] = {}
+        position = ring.bisect(start, state)
+        while position < state[1]:
+            record = ring.get(position, state)
+            position += 1
+            timestamp = record[0]
+            if timestamp >= end:
+                break
+            low, high, total, count = record[1 + index * 4: 5 + index * 4]
+            if not count:
+                continue
+            slot = int((timestamp - start) // width)
+            aggregate = result.get(slot)
+            if aggregate is None:
+                result[slot] = [low, high, total, count]
+            else:
+                aggregate[0] = min(aggregate[0], low)
+                aggregate[1] = max(aggregate[1], high)
+                aggregate[2] += total
+                aggregate[3] += count
+
+        return [(int(start + slot * width), low, high, total / count)
+                for slot, (low, high, total, count) in sorted(result.items())]
+
+    def flush(self):
+        for ring in self._rings.values():
+            ring.flush()
+
+    def close(self):
+        with self._lock:
+            for ring in self._rings.values():
+                ring.close()
+            self._rings.clear()
+
+
+class HistorySampler:
+
+    def __init__(self, pipeline, store: TimeSeriesStore):
+        self.pipeline = pipeline
+        self.store = store
+
+    def _fetch(self, key: str, func, kind: Optional[str] = None):
+        try:
+            data = self.pipeline.fetch(key, func, kind=kind)
+        except Exception as e:
+            logger.warning("Не удалось получить %s для истории: %s", key, e)
+            return None
+        if data is None or api_error(data) is not None:
+            return None
+        return data
+
+    def sample(self, timestamp: Optional[float] = None) -> Dict[str, Optional[float]]:
+        api_client = self.pipeline.api_client
+        values: Dict[str, Optional[float]] = dict.fromkeys(self.store.fields)
+
+        online_data = self._fetch("total_online", api_client.get_total_online)
+        if online_data is not None:
+            values['online'] = online_count(online_data)
+
+        staff = self._fetch("staff_online", api_client.get_staff_online, kind='staff_online')
+        if isinstance(staff, OnlineStaff):
+            values['staff_online'] = len(staff)
+
+        staff_stats = self._fetch("staff_stats", api_client.get_staff_stats, kind='staff_stats')
+        if isinstance(staff_stats, StaffStats):
+            for field in StaffStats.__slots__:
+                value = getattr(staff_stats, field)
+                values[field] = value if isinstance(value, (int, float)) else None
+
+        self.store.append(values, timestamp)
+        return values
+
+
+def summarize(points: Iterable[Tuple[int, float, float, float]]) -> Optional[Tuple[float, float, float]]:
+    points = list(points)
+    if not points:
+        return None
+    return (min(p[1] for p in points), max(p[2] for p in points), sum(p[3] for p in points) / len(points))
@@ -0,0 +1,221 @@
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Tuple
+import json
+import logging
+import os
+import threading
+import time
+
+from .leaderboard import numeric_stats
+from .metrics import metrics
+from .models import api_error, format_rank_name
+
+logger = logging.getLogger('watchlist')
+
+MAX_WATCHED_PER_GUILD = 25
+STREAK_MIN = 3
+STREAK_KEYS = ('winstreak',)
+RECORD_KEYS = ('best_winstreak',)
+LEVEL_KEYS = ('level',)
+MILESTONES = {'wins': 100, 'kills': 500, 'final_kills': 500, 'beds_broken': 100}
+
+
+def player_key(nickname: str, mode: str) -> str:
+    return f"{nickname.lower()}:{mode.upper()}"
+
+
+def _format_value(value: float) -> str:
+    if value == int(value):
+        return str(int(value))
+    return f"{value:.2f}"
+
+
+def diff_snapshots(old: Dict, new: Dict) -> List[str]:
+    from generators.stat_schema import format_stat_label
+
+    changes = []
+    old_rank, new_rank = old.get('rank'), new.get('rank')
+    if old_rank and new_rank and old_rank != new_rank:
+        changes.append(f"🎖️ Ранг: {format_rank_name(old_rank)} → **{format_rank_name(new_rank)}**")
+
+    before, after = old['values'], new['values']
+    record = False
+    for key in RECORD_KEYS:
+        if key in before and after.get(key, 0) > before[key]:
+            changes.append(f"🏆 Новый рекорд — {format_stat_label(key)}: **{_format_value(after[key])}**")
+            record = True
+    if not record:
+        for key in STREAK_KEYS:
+            if key in before and after.get(key, 0) >= STREAK_MIN and after[key] > before[key]:
+                changes.append(f"🔥 {format_stat_label(key)}: **{_format_value(after[key])}**")
+    for key in LEVEL_KEYS:
+        if key in before and after.get(key, 0) > before[key]:
+            changes.append(f"⬆️ {format_stat_label(key)}: {_format_value(before[key])} → "
+                           f"**{_format_value(after[key])}**")
+    for key, step in MILESTONES.items():
+        if key in before and key in after and after[key] // step > before[key] // step:
+            changes.append(f"🎯 {format_stat_label(key)}: **{_format_value(after[key] // step * step)}**")
+    return changes
+
+
+class WatchlistStore:
+
+    def __init__(self, path: str, max_per_guild: int = MAX_WATCHED_PER_GUILD):
+        self.path = path
+        self.max_per_guild = max_per_guild
+        self._lock = threading.Lock()
+        self._data: Dict[str, Dict] = {'guilds': {}, 'snapshots': {}}
+        self._load()
+
+    def _load(self):
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except FileNotFoundError:
+            return
+        except (OSError, ValueError) as e:
+            logger.warning("Не удалось загрузить списки отслеживания %s: %s", self.path, e)
+            return
+        self._data['guilds'].update(data.get('guilds', {}))
+        self._data['snapshots'].update(data.get('snapshots', {}))
+
+    def _save(self):
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self._data, f, ensure_ascii=False, separators=(',', ':'))
+        os.replace(tmp_path, self.path)
+
+    def add(self, guild_id, channel_id, nickname: str, mode: str) -> bool:
+        key = player_key(nickname, mode)
+        with self._lock:
+            entry = self._data['guilds'].setdefault(str(guild_id), {'channel': None, 'players': []})
+            entry['channel'] = str(channel_id)
+            exists = any(player_key(*player) == key for player in entry['players'])
+            if not exists:
+                if len(entry['players']) >= self.max_per_guild:
+                    raise ValueError(f"В списке уже {self.max_per_guild} игроков")
+                entry['players'].append([nickname, mode])
+            self._save()
+        return not exists
+
+    def remove(self, guild_id, nickname: str, mode: str) -> bool:
+        key = player_key(nickname, mode)
+        with self._lock:
+            entry = self._data['guilds'].get(str(guild_id))
+            if entry is None:
+                return False
+            players = [player for player in entry['players'] if player_key(*player) != key]
+            if len(players) == len(entry['players']):
+                return False
+            entry['players'] = players
+            if not players:
+                del self._data['guilds'][str(guild_id)]
+            self._save()
+        return True
+
+    def players(self, guild_id) -> List[Tuple[str, str]]:
+        entry = self._data['guilds'].get(str(guild_id))
+        return [] if entry is None else [tuple(player) for player in entry['players']]
+
+    def channel(self, guild_id) -> Optional[int]:
+        entry = self._data['guilds'].get(str(guild_id))
+        return None if entry is None or entry['channel'] is None else int(entry['channel'])
+
+    def targets(self) -> Dict[str, Tuple[str, str, List[int]]]:
+        targets: Dict[str, Tuple[str, str, List[int]]] = {}
+        with self._lock:
+            for entry in self._data['guilds'].values():
+                channel = int(entry['channel'])
+                for nickname, mode in entry['players']:
+                    target = targets.setdefault(player_key(nickname, mode), (nickname, mode, []))
+                    if channel not in target[2]:
+                        target[2].append(channel)
+        return targets
+
+    def snapshot(self, key: str) -> Optional[Dict]:
+        return self._data['snapshots'].get(key)
+
+    def update_snapshots(self, snapshots: Dict[str, Dict]):
+        with self._lock:
+            watched = {player_key(*player) for entry in self._data['guilds'].values()
+                       for player in entry['players']}
+            stored = self._data['snapshots']
+            stored.update(snapshots)
+            for key in [key for key in stored if key not in watched]:
+                del stored[key]
+            self._save()
+
+
+class WatchlistScheduler:
+
+    def __init__(self, pipeline, store: WatchlistStore, batch_size: int = 20, concurrency: int = 4,
+                 batch_pause: float = 1.0, excluded_keys=frozenset()):
+        self.pipeline = pipeline
+        self.store = store
+        self.batch_size = max(1, batch_size)
+        self.concurrency = max(1, concurrency)
+        self.batch_pause = batch_pause
+        self.excluded_keys = frozenset(excluded_keys)
+
+    def _fetch(self, nickname: str, mode: str) -> Optional[Dict]:
+        api_client = self.pipeline.api_client
+        try:
+            stats = self.pipeline.fetch(f"stats:{nickname.lower()}:{mode.lower()}",
+                                        api_client.get_player_stats, nickname, mode,
+                                        kind='stats', nickname=nickname, mode=mode)
+            if stats is None or api_error(stats) is not None or not stats.valid or not stats.fields:
+                return None
+            if self.pipeline.leaderboard is not None:
+                self.pipeline.leaderboard.update(stats)
+            profile = self.pipeline.fetch(f"profile:{nickname.lower()}",
+                                          api_client.get_player_profile, nickname,
+                                          kind='profile', nickname=nickname)
+        except Exception as e:
+            logger.warning("Не удалось обновить %s (%s): %s", nickname, mode, e)
+            return None
+        return {
+            'rank': getattr(profile, 'rank', None),
+            'values': numeric_stats(stats, self.excluded_keys),
+            'updated': time.time(),
+        }
+
+    def refresh(self) -> Dict[int, List[str]]:
+        started = time.perf_counter()
+        targets = list(self.store.targets().items())
+        notifications: Dict[int, List[str]] = {}
+        snapshots: Dict[str, Dict] = {}
+        failed = 0
+
+        with ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix='watchlist') as pool:
+            for offset in range(0, len(targets), self.batch_size):
+                if offset:
+                    time.sleep(self.batch_pause)
+                batch = targets[offset:offset + self.batch_size]
+                results = pool.map(lambda item: self._fetch(item[1][0], item[1][1]), batch)
+                for (key, (nickname, mode, channels)), snapshot in zip(batch, results):
+                    if snapshot is None:
+                        failed += 1
+                        continue
+                    previous = self.store.snapshot(key)
+                    snapshots[key] = snapshot
+                    if previous is None:
+                        continue
+                    changes = diff_snapshots(previous, snapshot)
+                    if not changes:
+                        continue
+                    metrics.inc('watchlist_changes', len(changes))
+                    line = f"**{nickname}** ({mode}): " + "; ".join(changes)
+                    for channel in channels:
+                        notifications.setdefault(channel, []).append(line)
+
+        self.store.update_snapshots(snapshots)
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        metrics.set('watchlist_players', len(targets))
+        metrics.inc('watchlist_failed', failed)
+        metrics.observe('watchlist_refresh_ms', elapsed_ms)
+        logger.info("Списки отслеживания обновлены: %d игроков, %d ошибок, %d каналов с изменениями за %.0fмс",
+                    len(targets), failed, len(notifications), elapsed_ms)
+        return notifications
@@ -1,10 +1,30 @@
-from .image_generator import StatsImageGenerator
-from .profile_generator import ProfileImageGenerator
-from .punishments_generator import PunishmentsImageGenerator
+import importlib
+
+_LAZY_ATTRS = {
+    'StatsImageGenerator': '.image_generator',
+    'ProfileImageGenerator': '.profile_generator',
+    'PunishmentsImageGenerator': '.punishments_generator',
+    'HistoryImageGenerator': '.history_generator',
+    'LeaderboardImageGenerator': '.leaderboard_generator',
+}
 
 __all__ = [
     'StatsImageGenerator',
     'ProfileImageGenerator',
-    'PunishmentsImageGenerator'
+    'PunishmentsImageGenerator',
+    'HistoryImageGenerator',
+    'LeaderboardImageGenerator'
 ]
 
+
+def __getattr__(name):
+    module_name = _LAZY_ATTRS.get(name)
+    if module_name is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(module_name, __name__), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(list(globals().keys()) + list(_LAZY_ATTRS.keys()))
@@ -0,0 +1,273 @@
+from PIL import Image, ImageFont
+from collections import deque
+from typing import Deque, Dict, Iterable, List, Optional, Tuple
+import io
+import os
+import struct
+import threading
+import zlib
+
+from core.memory import BudgetedLRU, image_nbytes, live_objects
+from core.metrics import metrics
+
+
+FONT_PATH = "Unbounded-Regular.ttf"
+BACKGROUND_PATH = os.path.join(
+    os.path.dirname(os.path.dirname(__file__)),
+    "fon.jpg"
+)
+
+_lock = threading.Lock()
+_fonts: Dict[int, ImageFont.ImageFont] = {}
+_backgrounds = BudgetedLRU('backgrounds', 96 * 1024 * 1024, sizeof=image_nbytes)
+
+_pool_max_bytes = 32 * 1024 * 1024
+_pool_max_idle = 4
+_canvas_idle_bytes = 0
+_canvases: Dict[Tuple[Tuple[int, int], str], List[Image.Image]] = {}
+_buffers: Dict[Tuple[int, int], List['PooledBuffer']] = {}
+_output_sizes: Dict[Tuple[int, int], Deque[int]] = {}
+
+
+class PooledBuffer(io.BytesIO):
+
+    def __init__(self, key: Tuple[int, int]):
+        super().__init__()
+        self.key = key
+
+
+def set_budget(max_bytes: int):
+    _backgrounds.resize(max_bytes)
+
+
+def set_pool_budget(max_bytes: int, max_idle: int = 4):
+    global _pool_max_bytes, _pool_max_idle, _canvas_idle_bytes
+    with _lock:
+        _pool_max_bytes = max_bytes
+        _pool_max_idle = max(0, max_idle) if max_bytes > 0 else 0
+        _canvases.clear()
+        _buffers.clear()
+        _canvas_idle_bytes = 0
+    metrics.set('render_pool_idle_bytes', 0, kind='canvas')
+
+
+def _acquire_canvas(size: Tuple[int, int], mode: str = "RGB") -> Optional[Image.Image]:
+    global _canvas_idle_bytes
+    with _lock:
+        pool = _canvases.get((size, mode))
+        canvas = pool.pop() if pool else None
+        if canvas is not None:
+            _canvas_idle_bytes -= image_nbytes(canvas)
+            idle_bytes = _canvas_idle_bytes
+    if canvas is None:
+        metrics.inc('render_pool', kind='canvas', result='miss')
+        return None
+    metrics.inc('render_pool', kind='canvas', result='hit')
+    metrics.set('render_pool_idle_bytes', idle_bytes, kind='canvas')
+    return canvas
+
+
+def release_canvas(image: Image.Image) -> None:
+    global _canvas_idle_bytes
+    nbytes = image_nbytes(image)
+    with _lock:
+        pool = _canvases.setdefault((image.size, image.mode), [])
+        pooled = (not image.readonly and len(pool) < _pool_max_idle
+                  and _canvas_idle_bytes + nbytes <= _pool_max_bytes
+                  and all(canvas is not image for canvas in pool))
+        if pooled:
+            pool.append(image)
+            _canvas_idle_bytes += nbytes
+            idle_bytes = _canvas_idle_bytes
+    if not pooled:
+        image.close()
+        return
+    metrics.set('render_pool_idle_bytes', idle_bytes, kind='canvas')
+
+
+def _acquire_buffer(key: Tuple[int, int]) -> PooledBuffer:
+    with _lock:
+        pool = _buffers.get(key)
+        buffer = pool.pop() if pool else None
+        recent = _output_sizes.get(key)
+        expected = int(max(recent) * 1.1) if recent else 0
+    if buffer is not None:
+        metrics.inc('render_pool', kind='buffer', result='hit')
+        return buffer
+    metrics.inc('render_pool', kind='buffer', result='miss')
+    buffer = PooledBuffer(key)
+    if expected:
+        buffer.seek(expected - 1)
+        buffer.write(b"\0")
+        buffer.seek(0)
+    return live_objects.track_buffer(buffer)
+
+
+def release_buffer(buffer: Optional[io.BytesIO]) -> None:
+    if not isinstance(buffer, PooledBuffer) or buffer.closed:
+        return
+    with _lock:
+        pool = _buffers.setdefault(buffer.key, [])
+        if len(pool) < _pool_max_idle and all(pooled is not buffer for pooled in pool):
+            buffer.seek(0)
+            pool.append(buffer)
+
+
+def get_font(size: int):
+    font = _fonts.get(size)
+    if font is not None:
+        return font
+
+    try:
+        if os.path.exists(FONT_PATH):
+            font = ImageFont.truetype(FONT_PATH, size)
+    except Exception:
+        font = None
+
+    if font is None:
+        font = ImageFont.load_default()
+
+    with _lock:
+        return _fonts.setdefault(size, font)
+
+
+def _resize(image: Image.Image, width: int, height: int) -> Image.Image:
+    if hasattr(Image, "Resampling"):
+        return image.resize((width, height), Image.Resampling.LANCZOS)
+    return image.resize((width, height), Image.ANTIALIAS)
+
+
+def _resized_background(path: str, width: int, height: int) -> Image.Image:
+    key = (path, width, height)
+    background = _backgrounds.get(key)
+    if background is None:
+        with Image.open(path) as source:
+            background = _resize(source.convert("RGB"), width, height)
+        with _lock:
+            background = _backgrounds.setdefault(key, background)
+    return background
+
+
+def get_background(path: str, width: int, height: int) -> Image.Image:
+    background = _resized_background(path, width, height)
+    canvas = _acquire_canvas(background.size, background.mode)
+    if canvas is None:
+        return live_objects.track_image(background.copy())
+    canvas.paste(background)
+    return canvas
+
+
+def new_canvas(width: int, height: int, color) -> Image.Image:
+    canvas = _acquire_canvas((width, height))
+    if canvas is None:
+        return live_objects.track_image(Image.new("RGB", (width, height), color))
+    canvas.paste(color, (0, 0, width, height))
+    return canvas
+
+
+def copy_canvas(image: Image.Image) -> Image.Image:
+    canvas = _acquire_canvas(image.size, image.mode)
+    if canvas is None:
+        return live_objects.track_image(image.copy())
+    canvas.paste(image)
+    return canvas
+
+
+def encode_png(image: Image.Image) -> PooledBuffer:
+    key = image.size
+    out = _acquire_buffer(key)
+    try:
+        image.save(out, format="PNG")
+    except Exception:
+        release_buffer(out)
+        raise
+    finally:
+        release_canvas(image)
+    size = out.tell()
+    out.truncate(size)
+    out.seek(0)
+    with _lock:
+        _output_sizes.setdefault(key, deque(maxlen=16)).append(size)
+    return out
+
+
+PNG_SIGNATURE = b"\x89PNG\r\n\x1a\n"
+_ADLER_BASE = 65521
+_DEFLATE_END = zlib.compressobj(6, zlib.DEFLATED, -15).flush(zlib.Z_FINISH)
+
+
+def _adler32_combine(first: int, second: int, second_length: int) -> int:
+    rem = second_length % _ADLER_BASE
+    sum1 = first & 0xffff
+    sum2 = (rem * sum1) % _ADLER_BASE
+    sum1 += (second & 0xffff) + _ADLER_BASE - 1
+    sum2 += ((first >> 16) & 0xffff) + ((second >> 16) & 0xffff) + _ADLER_BASE - rem
+    sum1 %= _ADLER_BASE
+    sum2 %= _ADLER_BASE
+    return sum1 | (sum2 << 16)
+
+
+def _png_chunk(kind: bytes, data: bytes) -> bytes:
+    return struct.pack(">I", len(data)) + kind + data + struct.pack(">I", zlib.crc32(data, zlib.crc32(kind)))
+
+
+class BandedPNG:
+
+    def __init__(self, image: Image.Image, band_rows: int = 32, level: int = 6):
+        if image.mode != "RGB":
+            raise ValueError(f"BandedPNG поддерживает только RGB, получено {image.mode}")
+        self.size = image.size
+        self.band_rows = band_rows
+        self.level = level
+        self._bands: List[Tuple[bytes, int, int]] = [
+            self._encode_band(image, top) for top in range(0, image.height, band_rows)
+        ]
+
+    @property
+    def nbytes(self) -> int:
+        return sum(len(band[0]) for band in self._bands)
+
+    def _encode_band(self, image: Image.Image, top: int) -> Tuple[bytes, int, int]:
+        bottom = min(top + self.band_rows, image.height)
+        raw = image.crop((0, top, image.width, bottom)).tobytes()
+        stride = image.width * 3
+        data = b"".join(b"\0" + raw[offset:offset + stride] for offset in range(0, len(raw), stride))
+        compressor = zlib.compressobj(self.level, zlib.DEFLATED, -15)
+        return compressor.compress(data) + compressor.flush(zlib.Z_FULL_FLUSH), zlib.adler32(data), len(data)
+
+    def update(self, image: Image.Image, regions: Iterable[Tuple[int, int, int, int]]) -> int:
+        bands = {index for _, top, _, bottom in regions
+                 for index in range(top // self.band_rows, (bottom - 1) // self.band_rows + 1)}
+        for index in bands:
+            self._bands[index] = self._encode_band(image, index * self.band_rows)
+        return len(bands)
+
+    def encode(self) -> "PooledBuffer":
+        width, height = self.size
+        checksum = 1
+        for _, adler, length in self._bands:
+            checksum = _adler32_combine(checksum, adler, length)
+        idat = b"".join((b"\x78\x9c", *(band[0] for band in self._bands), _DEFLATE_END,
+                         struct.pack(">I", checksum)))
+
+        out = _acquire_buffer(self.size)
+        out.write(PNG_SIGNATURE)
+        out.write(_png_chunk(b"IHDR", struct.pack(">IIBBBBB", width, height, 8, 2, 0, 0, 0)))
+        out.write(_png_chunk(b"IDAT", idat))
+        out.write(_png_chunk(b"IEND", b""))
+        size = out.tell()
+        out.truncate(size)
+        out.seek(0)
+        with _lock:
+            _output_sizes.setdefault(self.size, deque(maxlen=16)).append(size)
+        return out
+
+
+def warm_up(font_sizes: Iterable[int], canvas_sizes: Iterable[Tuple[int, int]],
+            background_path: str = BACKGROUND_PATH) -> None:
+    for size in font_sizes:
+        get_font(size)
+
+    if os.path.exists(background_path):
+        for width, height in canvas_sizes:
+            _resized_background(background_path, width, height)
@@ -0,0 +1,110 @@
+from PIL import Image, ImageDraw
+from typing import Dict, Iterable, Optional, Tuple
+import threading
+
+from core.memory import BudgetedLRU
+
+from . import assets
+
+GLYPH_CHARSET = "0123456789.,:;-+%/()xX "
+
+_Sprite = Tuple[Optional[Image.Image], int, int, float]
+
+
+class GlyphAtlas:
+
+    def __init__(self, font, charset: str = GLYPH_CHARSET):
+        self.font = font
+        self._lock = threading.Lock()
+        self._glyphs: Dict[str, _Sprite] = {ch: self._rasterize(ch) for ch in charset}
+        self._words: Dict[str, _Sprite] = {}
+
+    def _rasterize(self, text: str) -> _Sprite:
+        left, top, right, bottom = self.font.getbbox(text)
+        advance = self.font.getlength(text)
+        if right <= left or bottom <= top:
+            return None, left, top, advance
+        mask = Image.new('L', (right - left, bottom - top), 0)
+        ImageDraw.Draw(mask).text((-left, -top), text, font=self.font, fill=255)
+        return mask, left, top, advance
+
+    @property
+    def nbytes(self) -> int:
+        sprites = list(self._glyphs.values()) + list(self._words.values())
+        return sum(mask.width * mask.height for mask, _, _, _ in sprites if mask is not None)
+
+    def add_words(self, words: Iterable[str]) -> bool:
+        missing = [word for word in words if word and word not in self._words]
+        if not missing:
+            return False
+        sprites = {word: self._rasterize(word) for word in missing}
+        with self._lock:
+            self._words.update(sprites)
+        return True
+
+    def has(self, text: str) -> bool:
+        if text in self._words:
+            return True
+        glyphs = self._glyphs
+        return all(ch in glyphs for ch in text)
+
+    def textlength(self, draw: ImageDraw.ImageDraw, text: str) -> float:
+        sprite = self._words.get(text)
+        if sprite is not None:
+            return sprite[3]
+        glyphs = self._glyphs
+        if all(ch in glyphs for ch in text):
+            return sum(glyphs[ch][3] for ch in text)
+        return draw.textlength(text, font=self.font)
+
+    def draw(self, img: Image.Image, draw: ImageDraw.ImageDraw, xy, text: str, fill, anchor: str = 'la'):
+        x, y = xy
+        sprite = self._words.get(text)
+        if sprite is not None:
+            if anchor == 'lt':
+                y -= sprite[2]
+            self._paste(img, sprite, x, y, fill)
+            return
+
+        glyphs = self._glyphs
+        if anchor not in ('la', 'lt') or not all(ch in glyphs for ch in text):
+            draw.text((x, y), text, font=self.font, fill=fill, anchor=anchor)
+            return
+
+        if anchor == 'lt':
+            tops = [glyphs[ch][2] for ch in text if glyphs[ch][0] is not None]
+            y -= min(tops) if tops else 0
+
+        pen = float(x)
+        for ch in text:
+            sprite = glyphs[ch]
+            self._paste(img, sprite, int(round(pen)), y, fill)
+            pen += sprite[3]
+
+    @staticmethod
+    def _paste(img: Image.Image, sprite: _Sprite, x, y, fill):
+        mask, left, top, _ = sprite
+        if mask is None:
+            return
+        px = int(x) + left
+        py = int(y) + top
+        img.paste(fill, (px, py, px + mask.width, py + mask.height), mask)
+
+
+_atlases = BudgetedLRU('glyph_atlases', 16 * 1024 * 1024, sizeof=lambda atlas: atlas.nbytes)
+_atlases_lock = threading.Lock()
+
+
+def get_atlas(size: int, words: Iterable[str] = ()) -> GlyphAtlas:
+    atlas = _atlases.get(size)
+    if atlas is None:
+        with _atlases_lock:
+            atlas = _atlases.get(size)
+            if atlas is None:
+                atlas = GlyphAtlas(assets.get_font(size))
+                atlas.add_words(words)
+                _atlases.put(size, atlas)
+                return atlas
+    if atlas.add_words(words):
+        _atlases.put(size, atlas)
+    return atlas
@@ -0,0 +1,149 @@
+from PIL import Image, ImageDraw
+from datetime import datetime
+from typing import List, Optional, Tuple
+import io
+import logging
+import os
+
+from . import assets
+from .glyph_atlas import get_atlas
+from .resolution import DEFAULT_RESOLUTION, Scaler
+
+logger = logging.getLogger('history_generator')
+
+
+def _format_value(value: float) -> str:
+    if abs(value - round(value)) < 0.05:
+        return f"{int(round(value)):,}".replace(",", " ")
+    return f"{value:.1f}"
+
+
+class HistoryImageGenerator:
+
+    def __init__(self, resolution: str = DEFAULT_RESOLUTION):
+        px = Scaler(resolution)
+        self.resolution = px.resolution
+        self.width = px(1200)
+        self.height = px(600)
+        self.bg_color = (30, 30, 40)
+        self.text_color = (255, 255, 255)
+        self.accent_color = (255, 200, 50)
+        self.divider_color = (255, 234, 0)
+        self.grid_color = (70, 70, 85)
+        self.band_color = (70, 90, 140)
+        self.line_color = (100, 150, 255)
+        self.muted_color = (150, 150, 150)
+        self.background_path = assets.BACKGROUND_PATH
+
+        self.title_y = px(45)
+        self.subtitle_y = px(90)
+        self.plot_left = px(110)
+        self.plot_right = px(40)
+        self.plot_top = px(130)
+        self.plot_bottom = px(90)
+        self.grid_lines = 4
+        self.line_width = px(3)
+        self.grid_width = px(1)
+        self.label_gap = px(12)
+        self.footer_y_offset = px(20)
+        self.title_font_size = px(40)
+        self.header_font_size = px(24)
+        self.text_font_size = px(18)
+        self.small_font_size = px(14)
+
+    def _get_font(self, size: int):
+        return assets.get_font(size)
+
+    def _create_canvas(self, width: int, height: int) -> Image.Image:
+        try:
+            if os.path.exists(self.background_path):
+                return assets.get_background(self.background_path, width, height)
+        except Exception:
+            pass
+        return assets.new_canvas(width, height, self.bg_color)
+
+    def _time_format(self, start: int, end: int) -> str:
+        return "%H:%M" if end - start <= 2 * 86400 else "%d.%m"
+
+    def generate(self, title: str, subtitle: str, points: List[Tuple[int, float, float, float]],
+                 start: int, end: int) -> Optional[io.BytesIO]:
+        img = None
+        try:
+            img = self._create_canvas(self.width, self.height)
+            draw = ImageDraw.Draw(img)
+
+            title_font = self._get_font(self.title_font_size)
+            header_font = self._get_font(self.header_font_size)
+            small_font = self._get_font(self.small_font_size)
+            atlas = get_atlas(self.text_font_size)
+
+            draw.text((self.width // 2, self.title_y), title, font=title_font,
+                      fill=self.text_color, anchor="mm")
+            draw.text((self.width // 2, self.subtitle_y), subtitle, font=header_font,
+                      fill=self.divider_color, anchor="mm")
+
+            left = self.plot_left
+            right = self.width - self.plot_right
+            top = self.plot_top
+            bottom = self.height - self.plot_bottom
+
+            if not points:
+                draw.text((self.width // 2, (top + bottom) // 2), "Нет данных за этот период",
+                          font=header_font, fill=self.muted_color, anchor="mm")
+            else:
+                low = min(p[1] for p in points)
+                high = max(p[2] for p in points)
+                if high - low < 1:
+                    low, high = low - 1, high + 1
+                span_t = max(1, end - start)
+
+                def x_of(timestamp: float) -> float:
+                    return left + (timestamp - start) / span_t * (right - left)
+
+                def y_of(value: float) -> float:
+                    return bottom - (value - low) / (high - low) * (bottom - top)
+
+                for i in range(self.grid_lines + 1):
+                    value = low + (high - low) * i / self.grid_lines
+                    y = y_of(value)
+                    draw.line([(left, y), (right, y)], fill=self.grid_color, width=self.grid_width)
+                    label = _format_value(value)
+                    atlas.draw(img, draw, (left - self.label_gap - atlas.textlength(draw, label),
+                                           y - self.text_font_size // 2), label, self.muted_color)
+
+                bucket = span_t / max(1, len(points))
+                if len(points) > 1:
+                    bucket = min(b[0] - a[0] for a, b in zip(points, points[1:]))
+                half = bucket / 2
+                upper = [(x_of(t + half), y_of(p_high)) for t, _, p_high, _ in points]
+                lower = [(x_of(t + half), y_of(p_low)) for t, p_low, _, _ in reversed(points)]
+                if len(points) > 1:
+                    draw.polygon(upper + lower, fill=self.band_color)
+                else:
+                    draw.line([upper[0], lower[0]], fill=self.band_color, width=self.line_width * 3)
+
+                line = [(x_of(t + half), y_of(avg)) for t, _, _, avg in points]
+                if len(line) > 1:
+                    draw.line(line, fill=self.line_color, width=self.line_width, joint="curve")
+                radius = self.line_width
+                x, y = line[-1]
+                draw.ellipse([x - radius, y - radius, x + radius, y + radius], fill=self.accent_color)
+
+                time_format = self._time_format(start, end)
+                for timestamp, anchor in ((start, "la"), ((start + end) // 2, "ma"), (end, "ra")):
+                    x = {"la": left, "ma": (left + right) // 2, "ra": right}[anchor]
+                    draw.text((x, bottom + self.label_gap), datetime.fromtimestamp(timestamp).strftime(time_format),
+                              font=small_font, fill=self.muted_color, anchor=anchor)
+
+            draw.text((self.width // 2, self.height - self.footer_y_offset), "AgeraPvP Stats Bot",
+                      font=small_font, fill=self.muted_color, anchor="mm")
+
+            canvas, img = img, None
+            return assets.encode_png(canvas)
+
+        except Exception as e:
+            logger.error("Ошибка при генерации графика истории: %s", e)
+            return None
+        finally:
+            if img is not None:
+                assets.release_canvas(img)
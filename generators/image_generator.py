@@ -1,14 +1,68 @@
-from PIL import Image, ImageDraw, ImageFont
-from typing import Dict, Optional
+from PIL import Image, ImageDraw
+from typing import List, Optional, Tuple
 import io
+import logging
 import os
 
+from core.memory import BudgetedLRU, image_nbytes
+from core.metrics import metrics
+from core.models import PlayerStats
+
+from . import assets
+from .glyph_atlas import get_atlas
+from .rank_theme import RANK_COLORS, get_sprite, get_theme, get_title_sprite, rank_color
+from .resolution import DEFAULT_RESOLUTION, Scaler
+from .stat_schema import MODE_NAMES, STAT_LABELS, format_stat_label, get_schema
+
+logger = logging.getLogger('image_generator')
+
+Box = Tuple[int, int, int, int]
+
+
+class StatsCard:
+
+    __slots__ = ('layout', 'template', 'image', 'values', 'boxes', 'png')
+
+    def __init__(self, layout: tuple, template: Image.Image, image: Image.Image, values: List[str],
+                 boxes: List[Box]):
+        self.layout = layout
+        self.template = template
+        self.image = image
+        self.values = values
+        self.boxes = boxes
+        self.png = assets.BandedPNG(image)
+
+    @property
+    def nbytes(self) -> int:
+        return image_nbytes(self.template) + image_nbytes(self.image) + self.png.nbytes
+
+    def release(self):
+        assets.release_canvas(self.template)
+        assets.release_canvas(self.image)
+        self.template = self.image = None
+
+
+_cards = BudgetedLRU('stats_cards', 64 * 1024 * 1024, sizeof=lambda card: card.nbytes,
+                     on_evict=StatsCard.release)
+
+
+def set_card_budget(max_bytes: int):
+    _cards.resize(max_bytes)
+
+
+def _overlaps(a: Box, b: Box) -> bool:
+    return a[0] < b[2] and b[0] < a[2] and a[1] < b[3] and b[1] < a[3]
+
 
 class StatsImageGenerator:
     
-    def __init__(self):
-        self.width = 1600
-        self.height = 900
+    mode_names = MODE_NAMES
+    
+    def __init__(self, resolution: str = DEFAULT_RESOLUTION):
+        px = Scaler(resolution)
+        self.resolution = px.resolution
+        self.width = px(1600)
+        self.height = px(900)
         self.bg_color = (30, 30, 40)
         self.primary_color = (100, 150, 255)
         self.text_color = (255, 255, 255)
@@ -16,381 +70,258 @@ class StatsImageGenerator:
         self.divider_color = (255, 234, 0)
         self.mode_color = (255, 234, 0)
         
-        self.mode_names = {
-            'BW': 'BedWars',
-            'Duels': 'Duels'
-        }
-        
-        self.rank_colors = {
-            'default': (128, 128, 128),
-            'IRON': (144, 238, 144),
-            'GOLD': (255, 165, 0),
-            'DELUXE': (173, 216, 230),
-            'MASTER': (255, 0, 0),
-            'RUBIUM': (139, 0, 0),
-            'ULTRA': (255, 192, 203),
-            'SPONSOR': (0, 100, 0),
-            'YOUTUBE': None,
-            'BETA': (128, 128, 128),
-            'BUILD': (0, 128, 0),
-            'HELPER': (128, 128, 128),
-            'MODERATOR': (128, 128, 128),
-            'SR_MODER': (0, 0, 139),
-            'HEAD_MODERATOR': (0, 0, 139),
-            'AX_TEAM': (128, 0, 128),
-            'ADMINISTRATOR': (255, 0, 0),
-            'DEVELOPER': (255, 255, 255),
-            'OWNER': (139, 0, 0),
-        }
-        self.background_path = os.path.join(
-            os.path.dirname(os.path.dirname(__file__)),
-            "fon.jpg"
-        )
+        self.rank_colors = RANK_COLORS
+        self.background_path = assets.BACKGROUND_PATH
         
-        self.title_y = 200
-        self.mode_y = 265
-        self.divider_y = 324
-        self.stats_start_y = 381
-        self.margin_left = 50
-        self.margin_right = 50
-        self.line_height = 38
-        self.stats_x_left = 80
+        self.title_y = px(200)
+        self.mode_y = px(265)
+        self.divider_y = px(324)
+        self.stats_start_y = px(381)
+        self.margin_left = px(50)
+        self.margin_right = px(50)
+        self.line_height = px(38)
+        self.stats_x_left = px(80)
         self.stats_x_right = None
-        self.label_width = 250
-        self.value_offset = 150
-        self.footer_y_offset = 30
+        self.column_gap = px(50)
+        self.label_width = px(250)
+        self.value_offset = px(150)
+        self.bottom_padding = px(50)
+        self.footer_y_offset = px(30)
+        self.divider_width = px(2)
         
-    def _get_font(self, size: int):
-        try:
-            if os.name == 'nt':
-                font_path = "Unbounded-Regular.ttf"
-            else:
-                font_path = "Unbounded-Regular.ttf"
-            
-            if os.path.exists(font_path):
-                return ImageFont.truetype(font_path, size)
-        except:
-            pass
+        self.title_font_size = px(48)
+        self.header_font_size = px(32)
+        self.text_font_size = px(24)
+        self.small_font_size = px(16)
+        
+        self.rows_per_page = 2 * ((self.height - self.stats_start_y - self.bottom_padding) // self.line_height)
+        
+        get_atlas(self.text_font_size, [f"{label}:" for label in STAT_LABELS.values()])
         
-        return ImageFont.load_default()
+    def _get_font(self, size: int):
+        return assets.get_font(size)
 
     def _create_canvas(self, width: int, height: int) -> Image.Image:
         try:
             if os.path.exists(self.background_path):
-                background = Image.open(self.background_path).convert("RGB")
-                if hasattr(Image, "Resampling"):
-                    background = background.resize((width, height), Image.Resampling.LANCZOS)
-                else:
-                    background = background.resize((width, height), Image.ANTIALIAS)
-                return background
+                return assets.get_background(self.background_path, width, height)
         except Exception as e:
-            print(f"Ошибка загрузки фонового изображения: {e}")
-        return Image.new('RGB', (width, height), color=self.bg_color)
+            logger.warning("Ошибка загрузки фонового изображения: %s", e)
+        return assets.new_canvas(width, height, self.bg_color)
     
     def _get_mode_name(self, mode: str) -> str:
         mode_upper = mode.upper()
         return self.mode_names.get(mode_upper, mode_upper)
     
-    def _remove_minecraft_formatting(self, text: str) -> str:
-        if not text:
-            return text
-        
-        import re
-        return re.sub(r'§[0-9a-fA-Fk-oK-OrR]', '', text)
-    
-    def _format_rank_name(self, rank_name: str) -> str:
-        if not rank_name:
-            return rank_name
-        
-        if rank_name.upper() == 'AX_TEAM':
-            return 'TEAM'
-        
-        return rank_name
-    
     def _get_rank_color(self, rank_name: str) -> tuple:
-        if not rank_name:
-            return self.text_color
-        
-        rank_upper = rank_name.upper()
-        return self.rank_colors.get(rank_upper, self.text_color)
+        return rank_color(rank_name, self.text_color)
     
     def _format_stat_label(self, key: str) -> str:
-        translations = {
-            'wins': 'Побед',
-            'losses': 'Поражений',
-            'kills': 'Убийств',
-            'deaths': 'Смертей',
-            'games': 'Игр',
-            'winstreak': 'Серия побед',
-            'best_winstreak': 'Лучшая серия',
-            'kd': 'K/D',
-            'wl': 'W/L',
-            'level': 'Уровень',
-            'exp': 'Опыт',
-            'experience': 'Опыт',
-            'coins': 'Монеты',
-            'final_kills': 'Финальных убийств',
-            'final_deaths': 'Финальных смертей',
-            'beds_broken': 'Разрушенных кроватей',
-            'beds_lost': 'Потерянных кроватей',
-            'beds': 'Кроватей',
-            'playtime': 'Время игры',
-            'winrate': 'Процент побед',
-            'top_gold': 'Топ золота',
-            'blocks_placed': 'Блоков поставлено',
-            'top_iron': 'Топ железа',
-            'bow_hits': 'Попаданий из лука',
-            'bow_shots': 'Выстрелов из лука',
-            'blocks_traveled': 'Блоков пройдено',
-            'day': 'День',
-            'blocks_broken': 'Блоков разрушено'
-        }
+        return format_stat_label(key)
+    
+    def schema_rows(self, mode: str, stats_data):
+        stats = PlayerStats.from_api(None, mode, stats_data)
+        return get_schema(mode).rows(stats) if stats.valid else []
+    
+    def page_count(self, mode: str, stats_data) -> int:
+        rows = len(self.schema_rows(mode, stats_data))
+        return max(1, -(-rows // self.rows_per_page))
+    
+    def _draw_header(self, img: Image.Image, draw: ImageDraw.ImageDraw, player_name: str, mode: str,
+                     rank: Optional[str]):
+        title_font = self._get_font(self.title_font_size)
+        mode_name = self._get_mode_name(mode)
+        mode_prefix = "Режим: "
         
-        if key.lower() in translations:
-            return translations[key.lower()]
+        theme = get_theme(rank)
+        if theme is not None:
+            sprite = get_title_sprite(theme, self.title_font_size, "Статистика игрока ", self.text_color)
+            total_width = sprite.advance + draw.textlength(player_name, font=title_font)
+            start_x = self.width // 2 - total_width // 2
+            
+            sprite.paste(img, start_x, self.title_y)
+            draw.text((start_x + sprite.advance, self.title_y), player_name, font=title_font,
+                     fill=theme.name_color, anchor="lt")
+        else:
+            title = f"Статистика игрока {player_name}"
+            draw.text((self.width // 2, self.title_y), title, font=title_font, 
+                     fill=self.text_color, anchor="mm")
+        
+        mode_sprite = get_sprite(((mode_prefix, self.text_color), (mode_name, self.mode_color)),
+                                 self.header_font_size)
+        mode_sprite.paste(img, self.width // 2 - mode_sprite.advance // 2, self.mode_y)
         
-        formatted = key.replace('_', ' ').title()
-        return formatted
+        draw.line([(self.margin_left, self.divider_y), (self.width - self.margin_right, self.divider_y)], fill=self.divider_color, width=self.divider_width)
+    
+    def _row_origin(self, index: int, num_stats: int) -> Tuple[int, int]:
+        x_right = self.width // 2 + self.column_gap if self.stats_x_right is None else self.stats_x_right
+        if index < (num_stats + 1) // 2:
+            return self.stats_x_left, self.stats_start_y + index * self.line_height
+        return x_right, self.stats_start_y + (index - (num_stats + 1) // 2) * self.line_height
+    
+    def _draw_labels(self, img: Image.Image, draw: ImageDraw.ImageDraw, stats_to_display):
+        atlas = get_atlas(self.text_font_size)
+        for i, (label, _) in enumerate(stats_to_display):
+            atlas.draw(img, draw, self._row_origin(i, len(stats_to_display)), f"{label}:", self.text_color)
     
-    def generate(self, player_name: str, mode: str, stats_data: Dict, rank: str = None) -> Optional[io.BytesIO]:
+    def _value_box(self, draw: ImageDraw.ImageDraw, atlas, index: int, num_stats: int, value: str) -> Box:
+        x, y = self._row_origin(index, num_stats)
+        x += self.label_width + self.value_offset
+        left, top, right, bottom = atlas.font.getbbox(value)
+        right = max(right, atlas.textlength(draw, value))
+        return (max(0, x + min(0, left) - 2), max(0, y + min(0, top - 1)),
+                min(self.width, x + int(right) + 4), min(self.height, y + max(self.line_height, bottom + 1)))
+    
+    def _draw_value(self, img: Image.Image, draw: ImageDraw.ImageDraw, atlas, index: int, num_stats: int,
+                    value: str):
+        x, y = self._row_origin(index, num_stats)
+        atlas.draw(img, draw, (x + self.label_width + self.value_offset, y), value, self.accent_color)
+    
+    def _draw_footer(self, draw: ImageDraw.ImageDraw, page: int, pages: int):
+        footer_text = "AgeraPvP Stats Bot"
+        if pages > 1:
+            footer_text = f"{footer_text} • Страница {page}/{pages}"
+        draw.text((self.width // 2, self.height - self.footer_y_offset),
+                 footer_text, font=self._get_font(self.small_font_size),
+                 fill=(150, 150, 150), anchor="mm")
+    
+    def _build_card(self, layout: tuple, player_name: str, mode: str, rank: Optional[str],
+                    stats_to_display, page: int, pages: int) -> StatsCard:
+        template = self._create_canvas(self.width, self.height)
+        image = None
         try:
-            print(f"DEBUG: stats_data type: {type(stats_data)}")
-            if isinstance(stats_data, dict):
-                print(f"DEBUG: stats_data keys: {list(stats_data.keys())}")
-                for key, value in stats_data.items():
-                    print(f"DEBUG: {key} = {value} (type: {type(value)})")
+            draw = ImageDraw.Draw(template)
+            self._draw_header(template, draw, player_name, mode, rank)
+            self._draw_labels(template, draw, stats_to_display)
+            self._draw_footer(draw, page, pages)
             
-            img = self._create_canvas(self.width, self.height)
+            image = assets.copy_canvas(template)
+            draw = ImageDraw.Draw(image)
+            atlas = get_atlas(self.text_font_size)
+            values = [value for _, value in stats_to_display]
+            boxes = []
+            for i, value in enumerate(values):
+                self._draw_value(image, draw, atlas, i, len(values), value)
+                boxes.append(self._value_box(draw, atlas, i, len(values), value))
+            return StatsCard(layout, template, image, values, boxes)
+        except Exception:
+            assets.release_canvas(template)
+            if image is not None:
+                assets.release_canvas(image)
+            raise
+    
+    def _render_direct(self, player_name: str, mode: str, rank: Optional[str], stats_to_display, page: int,
+                       pages: int) -> io.BytesIO:
+        img = self._create_canvas(self.width, self.height)
+        try:
             draw = ImageDraw.Draw(img)
+            self._draw_header(img, draw, player_name, mode, rank)
+            self._draw_labels(img, draw, stats_to_display)
+            atlas = get_atlas(self.text_font_size)
+            for i, (_, value) in enumerate(stats_to_display):
+                self._draw_value(img, draw, atlas, i, len(stats_to_display), value)
+            self._draw_footer(draw, page, pages)
+        except Exception:
+            assets.release_canvas(img)
+            raise
+        return assets.encode_png(img)
+    
+    def _update_card(self, card: StatsCard, values: List[str]) -> int:
+        draw = ImageDraw.Draw(card.image)
+        atlas = get_atlas(self.text_font_size)
+        changed = {i for i, value in enumerate(values) if value != card.values[i]}
+        boxes = list(card.boxes)
+        for i in changed:
+            boxes[i] = self._value_box(draw, atlas, i, len(values), values[i])
+        
+        dirty = set(changed)
+        pending = set(changed)
+        while pending:
+            regions = [card.boxes[i] for i in pending] + [boxes[i] for i in pending]
+            pending = {j for j in range(len(values))
+                       if j not in dirty and any(_overlaps(boxes[j], region) for region in regions)}
+            dirty |= pending
+        
+        regions = []
+        for i in dirty:
+            old, new = card.boxes[i], boxes[i]
+            region = (min(old[0], new[0]), min(old[1], new[1]), max(old[2], new[2]), max(old[3], new[3]))
+            card.image.paste(card.template.crop(region), region[:2])
+            regions.append(region)
+        for i in sorted(dirty):
+            self._draw_value(card.image, draw, atlas, i, len(values), values[i])
+        card.png.update(card.image, regions)
+        
+        card.values = values
+        card.boxes = boxes
+        return len(dirty)
+    
+    def generate(self, player_name: str, mode: str, stats_data, rank: str = None,
+                 page: int = 1) -> Optional[io.BytesIO]:
+        img = None
+        try:
+            stats = PlayerStats.from_api(player_name, mode, stats_data)
+            logger.debug("Рендер статистики %s (%s): %d полей", player_name, mode, len(stats.fields))
+            all_rows = self.schema_rows(mode, stats)
+            pages = max(1, -(-len(all_rows) // self.rows_per_page))
+            page = max(1, min(page, pages))
+            stats_to_display = all_rows[(page - 1) * self.rows_per_page:page * self.rows_per_page]
             
-            title_font = self._get_font(48)
-            header_font = self._get_font(32)
-            text_font = self._get_font(24)
-            small_font = self._get_font(16)
-            
-            mode_name = self._get_mode_name(mode)
-            mode_prefix = "Режим: "
+            if stats.valid and stats_to_display and _cards.max_bytes <= 0:
+                metrics.inc('stats_render', kind='direct')
+                return self._render_direct(player_name, mode, rank, stats_to_display, page, pages)
             
-            if rank:
-                rank = self._remove_minecraft_formatting(rank)
-                rank_display = self._format_rank_name(rank)
-                rank_color = self._get_rank_color(rank)
-                
-                if rank_display.upper() == 'YOUTUBE':
-                    prefix = "Статистика игрока "
-                    you_text = "You"
-                    tube_text = "Tube"
-                    
-                    prefix_width = draw.textlength(prefix, font=title_font)
-                    you_width = draw.textlength(you_text, font=title_font)
-                    tube_width = draw.textlength(tube_text, font=title_font)
-                    nickname_width = draw.textlength(f" {player_name}", font=title_font)
-                    
-                    total_width = prefix_width + you_width + tube_width + nickname_width
-                    start_x = self.width // 2 - total_width // 2
-                    
-                    draw.text((start_x, self.title_y), prefix, font=title_font,
-                             fill=self.text_color, anchor="lt")
-                    draw.text((start_x + prefix_width, self.title_y), you_text, font=title_font,
-                             fill=(255, 0, 0), anchor="lt")
-                    draw.text((start_x + prefix_width + you_width, self.title_y), tube_text, font=title_font,
-                             fill=(255, 255, 255), anchor="lt")
-                    draw.text((start_x + prefix_width + you_width + tube_width, self.title_y), f" {player_name}", font=title_font,
-                             fill=(255, 255, 255), anchor="lt")
+            if stats.valid and stats_to_display:
+                key = (self.resolution, player_name.lower(), mode.upper(), page)
+                layout = (player_name, mode, rank, pages, tuple(label for label, _ in stats_to_display))
+                values = [value for _, value in stats_to_display]
+                card = _cards.pop(key)
+                if card is not None and card.layout == layout:
+                    try:
+                        redrawn = self._update_card(card, values)
+                    except Exception:
+                        card.release()
+                        raise
+                    metrics.inc('stats_render', kind='incremental')
+                    metrics.inc('stats_cells_redrawn', redrawn)
                 else:
-                    prefix = "Статистика игрока "
-                    rank_text = f"{rank_display} "
-                    nickname_text = player_name
-                    
-                    prefix_width = draw.textlength(prefix, font=title_font)
-                    rank_width = draw.textlength(rank_text, font=title_font)
-                    
-                    total_width = prefix_width + rank_width + draw.textlength(nickname_text, font=title_font)
-                    start_x = self.width // 2 - total_width // 2
-                    
-                    draw.text((start_x, self.title_y), prefix, font=title_font,
-                             fill=self.text_color, anchor="lt")
-                    draw.text((start_x + prefix_width, self.title_y), rank_text, font=title_font,
-                             fill=rank_color, anchor="lt")
-                    draw.text((start_x + prefix_width + rank_width, self.title_y), nickname_text, font=title_font,
-                             fill=rank_color, anchor="lt")
-            else:
-                title = f"Статистика игрока {player_name}"
-                draw.text((self.width // 2, self.title_y), title, font=title_font, 
-                         fill=self.text_color, anchor="mm")
+                    if card is not None:
+                        card.release()
+                    card = self._build_card(layout, player_name, mode, rank, stats_to_display, page, pages)
+                    metrics.inc('stats_render', kind='full')
+                try:
+                    img_bytes = card.png.encode()
+                except Exception:
+                    card.release()
+                    raise
+                if not _cards.put(key, card):
+                    card.release()
+                return img_bytes
             
-            mode_prefix_width = draw.textlength(mode_prefix, font=header_font)
-            mode_name_width = draw.textlength(mode_name, font=header_font)
-            total_mode_width = mode_prefix_width + mode_name_width
-            mode_start_x = self.width // 2 - total_mode_width // 2
-            
-            draw.text((mode_start_x, self.mode_y), mode_prefix, font=header_font,
-                     fill=self.text_color, anchor="lt")
-            draw.text((mode_start_x + mode_prefix_width, self.mode_y), mode_name, font=header_font,
-                     fill=self.mode_color, anchor="lt")
+            img = self._create_canvas(self.width, self.height)
+            draw = ImageDraw.Draw(img)
             
-            draw.line([(self.margin_left, self.divider_y), (self.width - self.margin_right, self.divider_y)], fill=self.divider_color, width=2)
+            header_font = self._get_font(self.header_font_size)
             
-            y_offset = self.stats_start_y
-            line_height = self.line_height
+            self._draw_header(img, draw, player_name, mode, rank)
             
-            if isinstance(stats_data, dict):
-                data = None
-                
-                possible_data_keys = ['data', 'stats', 'values', 'statistics', 'playerStats']
-                for key in possible_data_keys:
-                    if key in stats_data and isinstance(stats_data[key], dict):
-                        data = stats_data[key]
-                        break
-                
-                if data is None:
-                    data = stats_data
-                
-                if not isinstance(data, dict):
-                    draw.text((self.width // 2, self.height // 2),
-                             "Неверный формат данных от API",
-                             font=header_font, fill=self.text_color, anchor="mm")
-                    img_bytes = io.BytesIO()
-                    img.save(img_bytes, format='PNG')
-                    img_bytes.seek(0)
-                    return img_bytes
-                
-                stats_to_display = []
-                
-                excluded_keys = {'success', 'message', 'name', 'mode', 'player', 'playerName', 'day'}
-                
-                priority_keys = ['wins', 'kills', 'deaths', 'losses', 'games', 
-                               'winstreak', 'best_winstreak', 'kd', 'wl', 
-                               'final_kills', 'final_deaths', 'beds_broken', 
-                               'beds_lost', 'beds', 'level', 'exp', 'experience', 
-                               'coins', 'playtime', 'winrate', 'top_gold', 
-                               'blocks_placed', 'top_iron', 'bow_hits', 'bow_shots', 
-                               'blocks_traveled', 'blocks_broken']
-                
-                added_keys = set()
-                for key in priority_keys:
-                    if key in data and data[key] is not None:
-                        value = data[key]
-                        if isinstance(value, (dict, list)):
-                            continue
-                        label = self._format_stat_label(key)
-                        stats_to_display.append((label, str(value)))
-                        added_keys.add(key)
-                
-                for key, value in data.items():
-                    if (key in excluded_keys or 
-                        key in added_keys or 
-                        value is None):
-                        continue
-                    
-                    if isinstance(value, dict):
-                        for nested_key, nested_value in value.items():
-                            if nested_key in excluded_keys:
-                                continue
-                            if nested_value is not None and not isinstance(nested_value, (dict, list)):
-                                nested_label = self._format_stat_label(nested_key)
-                                stats_to_display.append((nested_label, str(nested_value)))
-                        continue
-                    
-                    if isinstance(value, list):
-                        continue
-                    
-                    label = self._format_stat_label(key)
-                    stats_to_display.append((label, str(value)))
-                
-                if not stats_to_display:
-                    draw.text((self.width // 2, self.height // 2),
-                             "Данные статистики не найдены",
-                             font=header_font, fill=self.text_color, anchor="mm")
-                else:
-                    num_stats = len(stats_to_display)
-                    rows = (num_stats + 1) // 2
-                    max_height_needed = y_offset + (rows * line_height) + 50
-                    
-                    if max_height_needed > self.height:
-                        new_img = self._create_canvas(self.width, max_height_needed)
-                        new_draw = ImageDraw.Draw(new_img)
-                        
-                        if rank:
-                            rank_display_redraw = self._format_rank_name(rank)
-                            rank_color = self._get_rank_color(rank)
-                            if rank_display_redraw.upper() == 'YOUTUBE':
-                                prefix = "Статистика игрока "
-                                you_text = "You"
-                                tube_text = "Tube"
-                                prefix_width = new_draw.textlength(prefix, font=title_font)
-                                you_width = new_draw.textlength(you_text, font=title_font)
-                                tube_width = new_draw.textlength(tube_text, font=title_font)
-                                nickname_width = new_draw.textlength(f" {player_name}", font=title_font)
-                                total_width = prefix_width + you_width + tube_width + nickname_width
-                                start_x = self.width // 2 - total_width // 2
-                                new_draw.text((start_x, self.title_y), prefix, font=title_font, fill=self.text_color, anchor="lt")
-                                new_draw.text((start_x + prefix_width, self.title_y), you_text, font=title_font, fill=(255, 0, 0), anchor="lt")
-                                new_draw.text((start_x + prefix_width + you_width, self.title_y), tube_text, font=title_font, fill=(255, 255, 255), anchor="lt")
-                                new_draw.text((start_x + prefix_width + you_width + tube_width, self.title_y), f" {player_name}", font=title_font, fill=(255, 255, 255), anchor="lt")
-                            else:
-                                prefix = "Статистика игрока "
-                                rank_text = f"{rank_display_redraw} "
-                                nickname_text = player_name
-                                prefix_width = new_draw.textlength(prefix, font=title_font)
-                                rank_width = new_draw.textlength(rank_text, font=title_font)
-                                total_width = prefix_width + rank_width + new_draw.textlength(nickname_text, font=title_font)
-                                start_x = self.width // 2 - total_width // 2
-                                new_draw.text((start_x, self.title_y), prefix, font=title_font, fill=self.text_color, anchor="lt")
-                                new_draw.text((start_x + prefix_width, self.title_y), rank_text, font=title_font, fill=rank_color, anchor="lt")
-                                new_draw.text((start_x + prefix_width + rank_width, self.title_y), nickname_text, font=title_font, fill=rank_color, anchor="lt")
-                        else:
-                            title = f"Статистика игрока {player_name}"
-                            new_draw.text((self.width // 2, self.title_y), title, font=title_font, fill=self.text_color, anchor="mm")
-                        
-                        mode_prefix_width = new_draw.textlength(mode_prefix, font=header_font)
-                        mode_name_width = new_draw.textlength(mode_name, font=header_font)
-                        total_mode_width = mode_prefix_width + mode_name_width
-                        mode_start_x = self.width // 2 - total_mode_width // 2
-                        
-                        new_draw.text((mode_start_x, self.mode_y), mode_prefix, font=header_font,
-                                     fill=self.text_color, anchor="lt")
-                        new_draw.text((mode_start_x + mode_prefix_width, self.mode_y), mode_name, font=header_font,
-                                     fill=self.mode_color, anchor="lt")
-                        new_draw.line([(self.margin_left, self.divider_y), (self.width - self.margin_right, self.divider_y)], fill=self.divider_color, width=2)
-                        
-                        img = new_img
-                        draw = new_draw
-                    
-                    x_left = self.stats_x_left
-                    x_right = self.width // 2 + 50 if self.stats_x_right is None else self.stats_x_right
-                    label_width = self.label_width
-                    
-                    for i, (label, value) in enumerate(stats_to_display):
-                        if i < (num_stats + 1) // 2:
-                            current_x = x_left
-                            current_y = y_offset + (i * line_height)
-                        else:
-                            current_x = x_right
-                            current_y = y_offset + ((i - (num_stats + 1) // 2) * line_height)
-                        
-                        draw.text((current_x, current_y), f"{label}:", 
-                                 font=text_font, fill=self.text_color)
-                        
-                        draw.text((current_x + label_width + self.value_offset, current_y), value,
-                                 font=text_font, fill=self.accent_color)
-            else:
+            if not stats.valid:
                 draw.text((self.width // 2, self.height // 2),
                          "Неверный формат данных от API",
                          font=header_font, fill=self.text_color, anchor="mm")
+            else:
+                draw.text((self.width // 2, self.height // 2),
+                         "Данные статистики не найдены",
+                         font=header_font, fill=self.text_color, anchor="mm")
             
-            footer_text = "AgeraPvP Stats Bot"
-            img_height = img.size[1]
-            draw.text((self.width // 2, img_height - self.footer_y_offset),
-                     footer_text, font=small_font,
-                     fill=(150, 150, 150), anchor="mm")
-            
-            img_bytes = io.BytesIO()
-            img.save(img_bytes, format='PNG')
-            img_bytes.seek(0)
+            self._draw_footer(draw, page, pages)
             
-            return img_bytes
+            canvas, img = img, None
+            return assets.encode_png(canvas)
             
         except Exception as e:
-            print(f"Ошибка при генерации изображения: {e}")
-            return None
\ No newline at end of file
+            logger.error("Ошибка при генерации изображения: %s", e)
+            return None
+        finally:
+            if img is not None:
+                assets.release_canvas(img)
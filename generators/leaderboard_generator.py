@@ -0,0 +1,120 @@
+from PIL import Image, ImageDraw
+from typing import List, Optional, Tuple
+import io
+import logging
+import os
+
+from . import assets
+from .glyph_atlas import get_atlas
+from .resolution import DEFAULT_RESOLUTION, Scaler
+from .stat_schema import format_stat_label
+
+logger = logging.getLogger('leaderboard_generator')
+
+
+def format_leaderboard_value(stat: str, value: float) -> str:
+    if stat == 'winrate':
+        return f"{value:.1f}%"
+    if stat in ('kd', 'wl'):
+        return f"{value:.2f}"
+    if value == int(value):
+        return str(int(value))
+    return f"{value:.2f}"
+
+
+class LeaderboardImageGenerator:
+
+    def __init__(self, resolution: str = DEFAULT_RESOLUTION):
+        px = Scaler(resolution)
+        self.resolution = px.resolution
+        self.width = px(900)
+        self.bg_color = (30, 30, 40)
+        self.text_color = (255, 255, 255)
+        self.accent_color = (255, 200, 50)
+        self.divider_color = (255, 234, 0)
+        self.muted_color = (150, 150, 150)
+        self.place_colors = {1: (255, 215, 0), 2: (192, 192, 192), 3: (205, 127, 50)}
+        self.background_path = assets.BACKGROUND_PATH
+
+        self.title_y = px(50)
+        self.subtitle_y = px(100)
+        self.divider_y = px(135)
+        self.rows_start_y = px(165)
+        self.line_height = px(44)
+        self.margin = px(60)
+        self.place_width = px(72)
+        self.bottom_padding = px(60)
+        self.footer_y_offset = px(25)
+        self.divider_width = px(2)
+        self.title_font_size = px(40)
+        self.header_font_size = px(26)
+        self.text_font_size = px(26)
+        self.small_font_size = px(14)
+
+        get_atlas(self.text_font_size, [f"{place}." for place in range(1, 26)])
+
+    def _get_font(self, size: int):
+        return assets.get_font(size)
+
+    def _format_stat_label(self, stat: str) -> str:
+        return format_stat_label(stat)
+
+    def _create_canvas(self, width: int, height: int) -> Image.Image:
+        try:
+            if os.path.exists(self.background_path):
+                return assets.get_background(self.background_path, width, height)
+        except Exception:
+            pass
+        return assets.new_canvas(width, height, self.bg_color)
+
+    def height_for(self, rows: int) -> int:
+        return self.rows_start_y + max(rows, 1) * self.line_height + self.bottom_padding
+
+    def generate(self, title: str, subtitle: str, stat: str,
+                 entries: List[Tuple[str, float]]) -> Optional[io.BytesIO]:
+        img = None
+        try:
+            height = self.height_for(len(entries))
+            img = self._create_canvas(self.width, height)
+            draw = ImageDraw.Draw(img)
+
+            title_font = self._get_font(self.title_font_size)
+            header_font = self._get_font(self.header_font_size)
+            text_font = self._get_font(self.text_font_size)
+            small_font = self._get_font(self.small_font_size)
+            atlas = get_atlas(self.text_font_size)
+
+            draw.text((self.width // 2, self.title_y), title, font=title_font,
+                      fill=self.text_color, anchor="mm")
+            draw.text((self.width // 2, self.subtitle_y), subtitle, font=header_font,
+                      fill=self.divider_color, anchor="mm")
+            draw.line([(self.margin, self.divider_y), (self.width - self.margin, self.divider_y)],
+                      fill=self.divider_color, width=self.divider_width)
+
+            if not entries:
+                draw.text((self.width // 2, self.rows_start_y + self.line_height // 2), "Нет данных",
+                          font=header_font, fill=self.muted_color, anchor="mm")
+
+            y = self.rows_start_y
+            right = self.width - self.margin
+            for place, (name, value) in enumerate(entries, 1):
+                color = self.place_colors.get(place, self.text_color)
+                atlas.draw(img, draw, (self.margin, y), f"{place}.", color)
+                draw.text((self.margin + self.place_width, y), name, font=text_font, fill=color)
+                value_text = format_leaderboard_value(stat, value)
+                atlas.draw(img, draw, (right - atlas.textlength(draw, value_text), y), value_text,
+                           self.accent_color)
+                y += self.line_height
+
+            draw.text((self.width // 2, height - self.footer_y_offset), "AgeraPvP Stats Bot",
+                      font=small_font, fill=self.muted_color, anchor="mm")
+
+            canvas, img = img, None
+            return assets.encode_png(canvas)
+
+        except Exception as e:
+            logger.error("Ошибка при генерации таблицы лидеров: %s", e)
+            return None
+        finally:
+            if img is not None:
+                assets.release_canvas(img)
@@ -1,208 +1,126 @@
-from PIL import Image, ImageDraw, ImageFont
-from typing import Dict, Optional
-from datetime import datetime
+from PIL import Image, ImageChops, ImageDraw
+from typing import Optional
 import io
 import os
 import requests
 
+from core.memory import live_objects
+from core.models import PlayerProfile, format_timestamp
+
+from . import assets
+from .glyph_atlas import get_atlas
+from .rank_theme import RANK_COLORS, get_theme, get_title_sprite, rank_color
+from .resolution import DEFAULT_RESOLUTION, Scaler
+
+_WHITE_THRESHOLD = [0] * 241 + [255] * 15
+
 
 class ProfileImageGenerator:
 
-    def __init__(self):
-        self.width = 1600
-        self.height = 900
+    def __init__(self, resolution: str = DEFAULT_RESOLUTION):
+        px = Scaler(resolution)
+        self.resolution = px.resolution
+        self.width = px(1600)
+        self.height = px(900)
         self.bg_color = (30, 30, 40)
         self.primary_color = (100, 150, 255)
         self.text_color = (255, 255, 255)
         self.accent_color = (255, 200, 50)
         self.divider_color = (255, 234, 0)
-        self.rank_colors = {
-            'DEFAULT': (128, 128, 128),
-            'IRON': (144, 238, 144),
-            'GOLD': (255, 165, 0),
-            'DELUXE': (173, 216, 230),
-            'MASTER': (255, 0, 0),
-            'RUBIUM': (139, 0, 0),
-            'ULTRA': (255, 192, 203),
-            'SPONSOR': (0, 100, 0),
-            'YOUTUBE': None,
-            'BETA': (128, 128, 128),
-            'BUILD': (0, 128, 0),
-            'HELPER': (128, 128, 128),
-            'MODERATOR': (128, 128, 128),
-            'SR_MODER': (0, 0, 139),
-            'HEAD_MODERATOR': (0, 0, 139),
-            'AX_TEAM': (128, 0, 128),
-            'ADMINISTRATOR': (255, 0, 0),
-            'DEVELOPER': (255, 255, 255),
-            'OWNER': (139, 0, 0),
-        }
-        self.background_path = os.path.join(
-            os.path.dirname(os.path.dirname(__file__)),
-            "fon.jpg"
-        )
-        self.start_y = 250
-        self.skin_x = 10
-        self.skin_y = 10
-        self.skin_size = 450
-        self.skin_spacing = 50
-        self.divider_offset = 100
-        self.divider_y_offset = 46
-        self.info_line_height = 50
-        self.margin_right = 50
-        self.footer_y_offset = 40
+        self.rank_colors = RANK_COLORS
+        self.background_path = assets.BACKGROUND_PATH
+        self.start_y = px(250)
+        self.skin_x = px(10)
+        self.skin_y = px(10)
+        self.skin_size = px(450)
+        self.skin_spacing = px(50)
+        self.divider_offset = px(100)
+        self.divider_y_offset = px(46)
+        self.info_line_height = px(50)
+        self.info_spacing = px(30)
+        self.info_offset_x = px(300)
+        self.margin_right = px(50)
+        self.footer_y_offset = px(40)
+        self.divider_width = px(2)
+        self.title_font_size = px(48)
+        self.text_font_size = px(32)
+        self.info_labels = ("ID пользователя", "Ранг", "Отображаемое имя", "Язык",
+                            "Текущий сервер", "Онлайн", "Последний вход")
+
+        get_atlas(self.text_font_size, [f"{label}:" for label in self.info_labels]
+                  + ["Да", "Нет", "Не указано", "DEFAULT", "TEAM"] + list(self.rank_colors))
 
     def _get_font(self, size: int):
-        try:
-            font_path = "Unbounded-Regular.ttf"
-            if os.path.exists(font_path):
-                return ImageFont.truetype(font_path, size)
-        except Exception:
-            pass
-        return ImageFont.load_default()
+        return assets.get_font(size)
 
     def _create_canvas(self) -> Image.Image:
         try:
             if os.path.exists(self.background_path):
-                bg = Image.open(self.background_path).convert("RGB")
-                bg = bg.resize((self.width, self.height), Image.Resampling.LANCZOS)
-                return bg
+                return assets.get_background(self.background_path, self.width, self.height)
         except Exception:
             pass
-        return Image.new("RGB", (self.width, self.height), self.bg_color)
+        return assets.new_canvas(self.width, self.height, self.bg_color)
 
-    def _load_skin_image(self, nickname: str) -> Optional[Image.Image]:
+    def _load_skin_image(self, nickname: str, timeout: float = 10) -> Optional[Image.Image]:
         try:
             url = f"https://skin.agerapvp.club/v1/body/{nickname}/1024"
-            r = requests.get(url, timeout=10)
+            r = requests.get(url, timeout=timeout)
             if r.status_code != 200:
                 return None
-            img = Image.open(io.BytesIO(r.content)).convert("RGBA")
-            pixels = []
-            for p in img.getdata():
-                if p[0] > 240 and p[1] > 240 and p[2] > 240:
-                    pixels.append((255, 255, 255, 0))
-                else:
-                    pixels.append(p)
-            img.putdata(pixels)
-            return img
+            with Image.open(io.BytesIO(r.content)) as source:
+                img = source.convert("RGBA")
+            white = ImageChops.darker(
+                ImageChops.darker(img.getchannel("R"), img.getchannel("G")), img.getchannel("B")
+            ).point(_WHITE_THRESHOLD)
+            img.paste((255, 255, 255, 0), mask=white)
+            return live_objects.track_image(img)
         except Exception:
             return None
 
-    def _remove_mc_formatting(self, text: str) -> str:
-        if not text:
-            return text
-        import re
-        return re.sub(r'§[0-9a-fA-Fk-oK-OrR]', '', text)
-
-    def _format_rank_name(self, name: str) -> str:
-        if name.upper() == "AX_TEAM":
-            return "TEAM"
-        return name
-
     def _get_rank_color(self, rank: str):
-        return self.rank_colors.get(rank.upper(), self.text_color)
+        return rank_color(rank, self.text_color)
 
     def _format_timestamp(self, ts_value) -> str:
-        try:
-            if ts_value is None:
-                return "Не указано"
-
-            if isinstance(ts_value, str):
-                ts_value = ts_value.strip()
-                ts_float = float(ts_value)
-            else:
-                ts_float = float(ts_value)
+        return format_timestamp(ts_value)
 
-            if ts_float > 10000000000:
-                ts_float = ts_float / 1000
-
-            dt = datetime.fromtimestamp(ts_float)
-            return dt.strftime("%d.%m.%Y %H:%M")
-
-        except ValueError:
-            return str(ts_value)
-        except Exception:
-            return str(ts_value)
-
-    def generate(self, nickname: str, profile_data: Dict) -> Optional[io.BytesIO]:
+    def generate(self, nickname: str, profile_data, skin: Optional[Image.Image] = None,
+                 load_skin: bool = True) -> Optional[io.BytesIO]:
+        img = None
         try:
-            api_username = profile_data.get("username", nickname)
-            display_name_raw = profile_data.get("displayName", api_username)
-            display_name = self._remove_mc_formatting(display_name_raw)
-
-            user_id = profile_data.get("userId")
-            language = profile_data.get("language")
-            current_server = profile_data.get("currentServer")
-            online = profile_data.get("online", False)
-            last_login = profile_data.get("lastLogin")
-
-            first_rank = None
-            ranks = profile_data.get("ranks", [])
-
-            if isinstance(ranks, list) and ranks:
-                r = ranks[0]
-                if isinstance(r, dict):
-                    rank_name = r.get("name")
-                    rank_display_name = r.get("displayName")
-                    first_rank = rank_name or rank_display_name
-                elif isinstance(r, str):
-                    first_rank = r
-
-            if first_rank:
-                first_rank = self._remove_mc_formatting(str(first_rank))
-                rank_display = self._format_rank_name(first_rank)
-            else:
-                rank_display = None
-
-            info_items = []
-
-            if user_id is not None:
-                info_items.append(("ID пользователя", str(user_id)))
-
-            if rank_display:
-                info_items.append(("Ранг", rank_display))
-            else:
-                info_items.append(("Ранг", "DEFAULT"))
-
-            info_items.append(("Отображаемое имя", api_username))
+            profile = PlayerProfile.from_api(nickname, profile_data)
+            api_username = profile.username
+            first_rank = profile.rank
 
-            if language:
-                info_items.append(("Язык", language))
-
-            if current_server is not None:
-                info_items.append(("Текущий сервер", current_server))
-
-            info_items.append(("Онлайн", "Да" if online else "Нет"))
-
-            if last_login is not None:
-                formatted_login = self._format_timestamp(last_login)
-                info_items.append(("Последний вход", formatted_login))
+            info_items = profile.info_items()
 
             img = self._create_canvas()
             draw = ImageDraw.Draw(img)
 
-            title_font = self._get_font(48)
-            text_font = self._get_font(32)
+            title_font = self._get_font(self.title_font_size)
+            text_font = self._get_font(self.text_font_size)
 
-            skin = self._load_skin_image(nickname)
+            if skin is None and load_skin:
+                skin = self._load_skin_image(nickname)
             skin_width = 0
             if skin:
                 h_ratio = skin.height / skin.width
                 new_h = int(self.skin_size * h_ratio)
-                skin = skin.resize((self.skin_size, new_h), Image.Resampling.LANCZOS)
-                img.paste(skin, (self.skin_x, self.skin_y), skin)
+                with skin, skin.resize((self.skin_size, new_h), Image.Resampling.LANCZOS) as resized:
+                    img.paste(resized, (self.skin_x, self.skin_y), resized)
                 skin_width = self.skin_size
 
             content_x = self.skin_x + skin_width + self.skin_spacing
-            content_center_x = content_x + (self.width - content_x - 50) // 2
-
-            if rank_display and first_rank and first_rank.upper() != "DEFAULT":
-                color = self._get_rank_color(first_rank)
-                title = f"{rank_display} {api_username}"
-                draw.text((content_center_x, self.start_y),
-                          title, font=title_font,
-                          fill=color, anchor="mm")
+            content_center_x = content_x + (self.width - content_x - self.margin_right) // 2
+
+            theme = get_theme(first_rank)
+            if theme is not None and theme.key != "DEFAULT":
+                sprite = get_title_sprite(theme, self.title_font_size, anchor="lm")
+                total_width = sprite.advance + draw.textlength(api_username, font=title_font)
+                start_x = content_center_x - total_width // 2
+                sprite.paste(img, start_x, self.start_y)
+                draw.text((start_x + sprite.advance, self.start_y),
+                          api_username, font=title_font,
+                          fill=theme.name_color, anchor="lm")
             else:
                 draw.text((content_center_x, self.start_y),
                           api_username,
@@ -212,20 +130,21 @@ class ProfileImageGenerator:
             y = self.start_y + self.divider_offset
             draw.line(
                 [(content_x, y), (self.width - self.margin_right, y)],
-                fill=self.divider_color, width=2
+                fill=self.divider_color, width=self.divider_width
             )
             y += self.divider_y_offset
 
-            max_label = max(draw.textlength(f"{k}:", text_font) for k, _ in info_items)
-            spacing = 30
-            start_x = content_center_x - 300
+            atlas = get_atlas(self.text_font_size)
+            max_label = max(atlas.textlength(draw, f"{k}:") for k, _ in info_items)
+            spacing = self.info_spacing
+            start_x = content_center_x - self.info_offset_x
 
             for label, value in info_items:
                 label_text = f"{label}:"
-                draw.text((start_x + max_label - draw.textlength(label_text, text_font), y),
-                          label_text, font=text_font, fill=self.text_color)
-                draw.text((start_x + max_label + spacing, y),
-                          str(value), font=text_font, fill=self.accent_color)
+                atlas.draw(img, draw, (start_x + max_label - atlas.textlength(draw, label_text), y),
+                           label_text, self.text_color)
+                atlas.draw(img, draw, (start_x + max_label + spacing, y),
+                           str(value), self.accent_color)
                 y += self.info_line_height
 
             draw.text(
@@ -236,10 +155,11 @@ class ProfileImageGenerator:
                 anchor="mm"
             )
 
-            out = io.BytesIO()
-            img.save(out, format="PNG")
-            out.seek(0)
-            return out
+            canvas, img = img, None
+            return assets.encode_png(canvas)
 
         except Exception:
-            return None
\ No newline at end of file
+            return None
+        finally:
+            if img is not None:
+                assets.release_canvas(img)
\ No newline at end of file
@@ -1,93 +1,96 @@
-from PIL import Image, ImageDraw, ImageFont
-from typing import Dict, Optional
+from PIL import Image, ImageDraw
+from typing import Optional
 import io
+import logging
 import os
 
+from core.models import StaffStats
+
+from . import assets
+from .glyph_atlas import get_atlas
+from .resolution import DEFAULT_RESOLUTION, Scaler
+
+logger = logging.getLogger('punishments_generator')
+
 
 class PunishmentsImageGenerator:
     
-    def __init__(self):
-        self.width = 800
-        self.height = 500
+    def __init__(self, resolution: str = DEFAULT_RESOLUTION):
+        px = Scaler(resolution)
+        self.resolution = px.resolution
+        self.width = px(800)
+        self.height = px(500)
         self.bg_color = (30, 30, 40)
         self.primary_color = (100, 150, 255)
         self.text_color = (255, 255, 255)
         self.accent_color = (255, 200, 50)
         self.divider_color = (255, 234, 0)
-        self.background_path = os.path.join(
-            os.path.dirname(os.path.dirname(__file__)),
-            "fon.jpg"
-        )
+        self.background_path = assets.BACKGROUND_PATH
         
-    def _get_font(self, size: int):
-        try:
-            if os.name == 'nt':
-                font_path = "Unbounded-Regular.ttf"
-            else:
-                font_path = "Unbounded-Regular.ttf"
-            
-            if os.path.exists(font_path):
-                return ImageFont.truetype(font_path, size)
-        except:
-            pass
+        self.title_y = px(50)
+        self.divider_y = px(100)
+        self.margin = px(50)
+        self.divider_width = px(2)
+        self.items_start_y = px(140)
+        self.line_height = px(45)
+        self.label_value_spacing = px(30)
+        self.footer_y_offset = px(20)
+        self.title_font_size = px(40)
+        self.header_font_size = px(24)
+        self.text_font_size = px(20)
+        self.small_font_size = px(14)
+        
+        get_atlas(self.text_font_size, ["Всего банов:", "Всего мутов:", "Активных банов:", "Активных мутов:",
+                       "Банов за неделю:", "Мутов за неделю:"])
         
-        return ImageFont.load_default()
+    def _get_font(self, size: int):
+        return assets.get_font(size)
     
     def _create_canvas(self, width: int, height: int) -> Image.Image:
         try:
             if os.path.exists(self.background_path):
-                background = Image.open(self.background_path).convert("RGB")
-                if hasattr(Image, "Resampling"):
-                    background = background.resize((width, height), Image.Resampling.LANCZOS)
-                else:
-                    background = background.resize((width, height), Image.ANTIALIAS)
-                return background
+                return assets.get_background(self.background_path, width, height)
         except Exception as e:
-            print(f"Ошибка загрузки фонового изображения punishments: {e}")
-        return Image.new('RGB', (width, height), color=self.bg_color)
+            logger.warning("Ошибка загрузки фонового изображения punishments: %s", e)
+        return assets.new_canvas(width, height, self.bg_color)
     
-    def generate(self, stats_data: Dict) -> Optional[io.BytesIO]:
+    def generate(self, stats_data) -> Optional[io.BytesIO]:
+        img = None
         try:
             img = self._create_canvas(self.width, self.height)
             draw = ImageDraw.Draw(img)
             
-            title_font = self._get_font(40)
-            header_font = self._get_font(24)
-            text_font = self._get_font(20)
-            small_font = self._get_font(14)
+            title_font = self._get_font(self.title_font_size)
+            small_font = self._get_font(self.small_font_size)
             
             title = "Статистика наказаний"
-            draw.text((self.width // 2, 50), title, font=title_font,
+            draw.text((self.width // 2, self.title_y), title, font=title_font,
                      fill=self.text_color, anchor="mm")
             
-            draw.line([(50, 100), (self.width - 50, 100)], fill=self.divider_color, width=2)
+            draw.line([(self.margin, self.divider_y), (self.width - self.margin, self.divider_y)],
+                      fill=self.divider_color, width=self.divider_width)
             
-            y_offset = 140
-            line_height = 45
+            y_offset = self.items_start_y
+            line_height = self.line_height
             
-            stats_items = [
-                ("Всего банов", stats_data.get('totalBans', 0)),
-                ("Всего мутов", stats_data.get('totalMutes', 0)),
-                ("Активных банов", stats_data.get('totalActiveBans', 0)),
-                ("Активных мутов", stats_data.get('totalActiveMutes', 0)),
-                ("Банов за неделю", stats_data.get('totalWeekBans', 0)),
-                ("Мутов за неделю", stats_data.get('totalWeekMutes', 0))
-            ]
+            staff_stats = StaffStats.from_api(stats_data)
+            stats_items = staff_stats.items()
             
+            atlas = get_atlas(self.text_font_size)
             max_label_width = 0
             for label, value in stats_items:
                 label_text = f"{label}:"
-                label_width = draw.textlength(label_text, font=text_font)
+                label_width = atlas.textlength(draw, label_text)
                 if label_width > max_label_width:
                     max_label_width = label_width
             
-            label_value_spacing = 30
+            label_value_spacing = self.label_value_spacing
             total_label_area = max_label_width + label_value_spacing
             
             max_value_width = 0
             for label, value in stats_items:
                 value_str = str(value)
-                value_width = draw.textlength(value_str, font=text_font)
+                value_width = atlas.textlength(draw, value_str)
                 if value_width > max_value_width:
                     max_value_width = value_width
             
@@ -98,26 +101,26 @@ class PunishmentsImageGenerator:
                 label_text = f"{label}:"
                 value_str = str(value)
                 
-                label_x = item_start_x + max_label_width - draw.textlength(label_text, font=text_font)
-                draw.text((label_x, y_offset), label_text,
-                         font=text_font, fill=self.text_color, anchor="lt")
+                label_x = item_start_x + max_label_width - atlas.textlength(draw, label_text)
+                atlas.draw(img, draw, (label_x, y_offset), label_text,
+                           self.text_color, anchor="lt")
                 
-                draw.text((item_start_x + total_label_area, y_offset), value_str,
-                         font=text_font, fill=self.accent_color, anchor="lt")
+                atlas.draw(img, draw, (item_start_x + total_label_area, y_offset), value_str,
+                           self.accent_color, anchor="lt")
                 
                 y_offset += line_height
             
             footer_text = "AgeraPvP Stats Bot"
-            draw.text((self.width // 2, self.height - 20),
+            draw.text((self.width // 2, self.height - self.footer_y_offset),
                      footer_text, font=small_font,
                      fill=(150, 150, 150), anchor="mm")
             
-            img_bytes = io.BytesIO()
-            img.save(img_bytes, format='PNG')
-            img_bytes.seek(0)
-            
-            return img_bytes
+            canvas, img = img, None
+            return assets.encode_png(canvas)
             
         except Exception as e:
-            print(f"Ошибка при генерации изображения статистики наказаний: {e}")
-            return None
\ No newline at end of file
+            logger.error("Ошибка при генерации изображения статистики наказаний: %s", e)
+            return None
+        finally:
+            if img is not None:
+                assets.release_canvas(img)
\ No newline at end of file
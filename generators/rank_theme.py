@@ -0,0 +1,137 @@
+from PIL import Image, ImageChops, ImageDraw
+from typing import Dict, Optional, Tuple
+import math
+import threading
+
+from core.memory import BudgetedLRU, image_nbytes
+from core.models import format_rank_name, remove_mc_formatting
+
+from . import assets
+
+Color = Tuple[int, int, int]
+
+TEXT_COLOR: Color = (255, 255, 255)
+
+RANK_COLORS: Dict[str, Optional[Color]] = {
+    'DEFAULT': (128, 128, 128),
+    'IRON': (144, 238, 144),
+    'GOLD': (255, 165, 0),
+    'DELUXE': (173, 216, 230),
+    'MASTER': (255, 0, 0),
+    'RUBIUM': (139, 0, 0),
+    'ULTRA': (255, 192, 203),
+    'SPONSOR': (0, 100, 0),
+    'YOUTUBE': None,
+    'BETA': (128, 128, 128),
+    'BUILD': (0, 128, 0),
+    'HELPER': (128, 128, 128),
+    'MODERATOR': (128, 128, 128),
+    'SR_MODER': (0, 0, 139),
+    'HEAD_MODERATOR': (0, 0, 139),
+    'AX_TEAM': (128, 0, 128),
+    'ADMINISTRATOR': (255, 0, 0),
+    'DEVELOPER': (255, 255, 255),
+    'OWNER': (139, 0, 0),
+}
+
+RANK_BADGES: Dict[str, Tuple[Tuple[str, Color], ...]] = {
+    'YOUTUBE': (("You", (255, 0, 0)), ("Tube", (255, 255, 255))),
+}
+
+
+class RankTheme:
+
+    __slots__ = ('key', 'display', 'color', 'badge', 'name_color')
+
+    def __init__(self, rank: str):
+        self.key = rank.upper()
+        self.display = format_rank_name(rank)
+        self.color = RANK_COLORS.get(self.key, TEXT_COLOR)
+        self.badge = RANK_BADGES.get(self.key) or ((self.display, self.color),)
+        self.name_color = self.color if self.color is not None else TEXT_COLOR
+
+
+_themes: Dict[str, RankTheme] = {}
+_themes_lock = threading.Lock()
+
+
+def get_theme(rank: Optional[str]) -> Optional[RankTheme]:
+    rank = remove_mc_formatting(rank)
+    if not rank:
+        return None
+    theme = _themes.get(rank)
+    if theme is None:
+        with _themes_lock:
+            theme = _themes.setdefault(rank, RankTheme(rank))
+    return theme
+
+
+def rank_color(rank: Optional[str], default: Optional[Color] = TEXT_COLOR) -> Optional[Color]:
+    if not rank:
+        return default
+    return RANK_COLORS.get(remove_mc_formatting(rank).upper(), default)
+
+
+class TitleSprite:
+
+    __slots__ = ('image', 'left', 'top', 'advance')
+
+    def __init__(self, image: Optional[Image.Image], left: int, top: int, advance: float):
+        self.image = image
+        self.left = left
+        self.top = top
+        self.advance = advance
+
+    def paste(self, img: Image.Image, x, y):
+        if self.image is not None:
+            img.paste(self.image, (int(x) + self.left, int(y) + self.top), self.image)
+
+
+def _render_sprite(segments: Tuple[Tuple[str, Color], ...], font, anchor: str) -> TitleSprite:
+    pens = []
+    boxes = []
+    pen = 0.0
+    for text, _ in segments:
+        left, top, right, bottom = font.getbbox(text, anchor=anchor)
+        if right > left and bottom > top:
+            boxes.append((pen + left, top, pen + right, bottom))
+        pens.append(pen)
+        pen += font.getlength(text)
+
+    if not boxes:
+        return TitleSprite(None, 0, 0, pen)
+
+    left = math.floor(min(box[0] for box in boxes))
+    top = math.floor(min(box[1] for box in boxes))
+    size = (math.ceil(max(box[2] for box in boxes)) - left, math.ceil(max(box[3] for box in boxes)) - top)
+
+    sprite = Image.new('RGBA', size, (0, 0, 0, 0))
+    alpha = Image.new('L', size, 0)
+    for (text, color), offset in zip(segments, pens):
+        mask = Image.new('L', size, 0)
+        ImageDraw.Draw(mask).text((offset - left, -top), text, font=font, fill=255, anchor=anchor)
+        sprite.paste(color + (255,), mask=mask.point(lambda value: 255 if value else 0))
+        alpha = ImageChops.lighter(alpha, mask)
+    sprite.putalpha(alpha)
+    return TitleSprite(sprite, left, top, pen)
+
+
+_sprites = BudgetedLRU('title_sprites', 8 * 1024 * 1024,
+                       sizeof=lambda sprite: image_nbytes(sprite.image) if sprite.image is not None else 0)
+
+
+def get_sprite(segments: Tuple[Tuple[str, Color], ...], size: int, anchor: str = 'lt') -> TitleSprite:
+    key = (segments, size, anchor)
+    sprite = _sprites.get(key)
+    if sprite is None:
+        sprite = _render_sprite(segments, assets.get_font(size), anchor)
+        _sprites.put(key, sprite)
+    return sprite
+
+
+def get_title_sprite(theme: RankTheme, size: int, lead: str = "", lead_color: Color = TEXT_COLOR,
+                     anchor: str = 'lt') -> TitleSprite:
+    segments = theme.badge[:-1] + ((f"{theme.badge[-1][0]} ", theme.badge[-1][1]),)
+    if lead:
+        segments = ((lead, lead_color),) + segments
+    return get_sprite(segments, size, anchor)
@@ -0,0 +1,33 @@
+RESOLUTION_PROFILES = {
+    'compact': 0.6,
+    'standard': 1.0,
+    '2x': 2.0,
+}
+
+RESOLUTION_NAMES = {
+    'compact': 'Компактное',
+    'standard': 'Стандартное',
+    '2x': 'Высокое (2x)',
+}
+
+DEFAULT_RESOLUTION = 'standard'
+
+
+def normalize_resolution(resolution) -> str:
+    if resolution in RESOLUTION_PROFILES:
+        return resolution
+    return DEFAULT_RESOLUTION
+
+
+def scale_factor(resolution) -> float:
+    return RESOLUTION_PROFILES[normalize_resolution(resolution)]
+
+
+class Scaler:
+
+    def __init__(self, resolution=DEFAULT_RESOLUTION):
+        self.resolution = normalize_resolution(resolution)
+        self.factor = RESOLUTION_PROFILES[self.resolution]
+
+    def __call__(self, value: float) -> int:
+        return max(1, int(round(value * self.factor)))
@@ -0,0 +1,156 @@
+from typing import Callable, Dict, List, Optional, Tuple
+import threading
+
+from core.models import PlayerStats
+
+STAT_LABELS = {
+    'wins': 'Побед',
+    'losses': 'Поражений',
+    'kills': 'Убийств',
+    'deaths': 'Смертей',
+    'games': 'Игр',
+    'winstreak': 'Серия побед',
+    'best_winstreak': 'Лучшая серия',
+    'kd': 'K/D',
+    'wl': 'W/L',
+    'level': 'Уровень',
+    'exp': 'Опыт',
+    'experience': 'Опыт',
+    'coins': 'Монеты',
+    'final_kills': 'Финальных убийств',
+    'final_deaths': 'Финальных смертей',
+    'beds_broken': 'Разрушенных кроватей',
+    'beds_lost': 'Потерянных кроватей',
+    'beds': 'Кроватей',
+    'playtime': 'Время игры',
+    'winrate': 'Процент побед',
+    'top_gold': 'Топ золота',
+    'blocks_placed': 'Блоков поставлено',
+    'top_iron': 'Топ железа',
+    'bow_hits': 'Попаданий из лука',
+    'bow_shots': 'Выстрелов из лука',
+    'blocks_traveled': 'Блоков пройдено',
+    'day': 'День',
+    'blocks_broken': 'Блоков разрушено'
+}
+
+MODE_NAMES = {
+    'BW': 'BedWars',
+    'Duels': 'Duels'
+}
+
+EXCLUDED_KEYS = frozenset({'success', 'message', 'name', 'mode', 'player', 'playerName', 'day'})
+
+PRIORITY_KEYS = (
+    'wins', 'kills', 'deaths', 'losses', 'games',
+    'winstreak', 'best_winstreak', 'kd', 'wl',
+    'final_kills', 'final_deaths', 'beds_broken',
+    'beds_lost', 'beds', 'level', 'exp', 'experience',
+    'coins', 'playtime', 'winrate', 'top_gold',
+    'blocks_placed', 'top_iron', 'bow_hits', 'bow_shots',
+    'blocks_traveled', 'blocks_broken'
+)
+
+MODE_PRIORITY_KEYS: Dict[str, Tuple[str, ...]] = {
+    'DUELS': (
+        'wins', 'losses', 'kills', 'deaths', 'kd', 'wl',
+        'winstreak', 'best_winstreak', 'games', 'winrate',
+        'bow_hits', 'bow_shots', 'coins', 'level', 'exp',
+        'experience', 'playtime'
+    ),
+}
+
+
+def _is_number(value) -> bool:
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+
+def format_ratio(value) -> str:
+    return f"{value:.2f}" if isinstance(value, float) else str(value)
+
+
+def format_percent(value) -> str:
+    return f"{value:.1f}%" if _is_number(value) else str(value)
+
+
+FORMATTERS: Dict[str, Callable] = {
+    'kd': format_ratio,
+    'wl': format_ratio,
+    'winrate': format_percent,
+}
+
+
+def format_stat_label(key: str) -> str:
+    label = STAT_LABELS.get(key.lower())
+    if label is not None:
+        return label
+    return key.replace('_', ' ').title()
+
+
+class StatSchema:
+
+    def __init__(self, mode: str, priority_keys: Tuple[str, ...] = PRIORITY_KEYS,
+                 excluded_keys=EXCLUDED_KEYS, max_layouts: int = 256):
+        self.mode = mode
+        self.priority_keys = priority_keys
+        self.excluded_keys = excluded_keys
+        self.max_layouts = max_layouts
+        self._layouts: Dict[Tuple, Tuple[Tuple[int, str, Callable], ...]] = {}
+        self._lock = threading.Lock()
+
+    def _compile(self, signature: Tuple[Tuple[str, Optional[str]], ...]) -> Tuple[Tuple[int, str, Callable], ...]:
+        top_level = {}
+        for index, (key, parent) in enumerate(signature):
+            if parent is None:
+                top_level.setdefault(key, index)
+
+        layout = []
+        added = set()
+        for key in self.priority_keys:
+            index = top_level.get(key)
+            if index is not None:
+                layout.append((index, format_stat_label(key), FORMATTERS.get(key, str)))
+                added.add(index)
+
+        for index, (key, parent) in enumerate(signature):
+            if index in added:
+                continue
+            if parent is None:
+                if key in self.excluded_keys:
+                    continue
+            elif parent in self.excluded_keys or key in self.excluded_keys:
+                continue
+            layout.append((index, format_stat_label(key), FORMATTERS.get(key, str)))
+
+        return tuple(layout)
+
+    def layout(self, stats: PlayerStats) -> Tuple[Tuple[int, str, Callable], ...]:
+        signature = stats.signature
+        layout = self._layouts.get(signature)
+        if layout is None:
+            layout = self._compile(signature)
+            with self._lock:
+                if len(self._layouts) >= self.max_layouts:
+                    self._layouts.pop(next(iter(self._layouts)))
+                self._layouts[signature] = layout
+        return layout
+
+    def rows(self, stats: PlayerStats) -> List[Tuple[str, str]]:
+        fields = stats.fields
+        return [(label, formatter(fields[index][1])) for index, label, formatter in self.layout(stats)]
+
+
+_schemas: Dict[str, StatSchema] = {}
+_schemas_lock = threading.Lock()
+
+
+def get_schema(mode: str) -> StatSchema:
+    key = mode.upper()
+    schema = _schemas.get(key)
+    if schema is None:
+        with _schemas_lock:
+            schema = _schemas.get(key)
+            if schema is None:
+                schema = StatSchema(key, MODE_PRIORITY_KEYS.get(key, PRIORITY_KEYS))
+                _schemas[key] = schema
+    return schema
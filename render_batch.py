@@ -0,0 +1,308 @@
+import argparse
+import io
+import logging
+import os
+import re
+import signal
+import statistics
+import sys
+import tarfile
+import time
+from collections import defaultdict
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+from dotenv import load_dotenv
+
+from core import codec
+from core.logs import setup_logging
+from core.metrics import percentile
+from generators.resolution import DEFAULT_RESOLUTION, RESOLUTION_NAMES
+
+load_dotenv()
+
+logger = logging.getLogger('render_batch')
+
+KINDS = ('stats', 'profile', 'punishments')
+
+_state = {}
+
+
+def init_worker(resolution: str, budget_bytes: int, api_key, load_skins: bool):
+    from generators import assets
+    from generators.image_generator import set_card_budget
+
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    setup_logging(os.getenv('LOG_LEVEL', 'WARNING'), secrets=(api_key,) if api_key else ())
+    assets.set_budget(budget_bytes // 2)
+    assets.set_pool_budget(budget_bytes // 4)
+    set_card_budget(0)
+    _state.update(resolution=resolution, api_key=api_key, load_skins=load_skins, generators={}, api=None)
+
+
+def _generator(kind: str):
+    from generators import PunishmentsImageGenerator, ProfileImageGenerator, StatsImageGenerator
+
+    generators = _state['generators']
+    if kind not in generators:
+        factory = {'stats': StatsImageGenerator, 'profile': ProfileImageGenerator,
+                   'punishments': PunishmentsImageGenerator}[kind]
+        generators[kind] = factory(_state['resolution'])
+    return generators[kind]
+
+
+def _api():
+    from core.api_client import AgeraPvPAPI
+
+    if _state['api'] is None:
+        if not _state['api_key']:
+            raise ValueError("в строке нет data, а API_KEY не задан")
+        _state['api'] = AgeraPvPAPI(api_key=_state['api_key'],
+                                    base_urls=os.getenv('API_BASE_URLS', AgeraPvPAPI.BASE_URL).split(','),
+                                    hedge_ratio=float(os.getenv('API_HEDGE_RATIO', '0.05')))
+    return _state['api']
+
+
+def _fetch(job: dict):
+    from core.models import PlayerProfile, api_error
+
+    kind = job['type']
+    api = _api()
+    if kind == 'stats':
+        data = api.get_player_stats(job['nickname'], job.get('mode', 'BW'))
+    elif kind == 'profile':
+        data = api.get_player_profile(job['nickname'])
+    else:
+        data = api.get_staff_stats()
+    if data is None:
+        raise ValueError("API не вернул данные")
+    error = api_error(data)
+    if error is not None:
+        raise ValueError(error)
+
+    if kind == 'stats' and 'rank' not in job:
+        profile = api.get_player_profile(job['nickname'])
+        if isinstance(profile, dict) and api_error(profile) is None:
+            job['rank'] = PlayerProfile.from_api(job['nickname'], profile).rank
+    return data
+
+
+def render_job(job: dict):
+    from generators import assets
+
+    started = time.perf_counter()
+    try:
+        kind = job.get('type')
+        if kind not in KINDS:
+            raise ValueError(f"неизвестный тип {kind!r}")
+        if kind != 'punishments' and not job.get('nickname'):
+            raise ValueError("не указан nickname")
+        data = job['data'] if 'data' in job else _fetch(job)
+
+        render_started = time.perf_counter()
+        generator = _generator(kind)
+        if kind == 'stats':
+            image = generator.generate(job['nickname'], job.get('mode', 'BW'), data, job.get('rank'),
+                                       int(job.get('page', 1)))
+        elif kind == 'profile':
+            image = generator.generate(job['nickname'], data, load_skin=_state['load_skins'])
+        else:
+            image = generator.generate(data)
+        if image is None:
+            raise ValueError("генератор не вернул изображение")
+        try:
+            png = image.getvalue()
+        finally:
+            assets.release_buffer(image)
+        return png, None, (time.perf_counter() - render_started) * 1000
+    except Exception as e:
+        return None, str(e), (time.perf_counter() - started) * 1000
+
+
+def output_name(job: dict, number: int) -> str:
+    name = job.get('name')
+    if not name:
+        kind = job.get('type', 'card')
+        parts = [f"{number:06d}", kind]
+        if job.get('nickname'):
+            parts.append(job['nickname'])
+        if kind == 'stats':
+            parts.append(str(job.get('mode', 'BW')).upper())
+            if int(job.get('page', 1)) > 1:
+                parts.append(f"p{job['page']}")
+        name = '_'.join(parts)
+    name = re.sub(r'[^\w.-]', '_', os.path.basename(str(name)))
+    return name if name.lower().endswith('.png') else f"{name}.png"
+
+
+class DirectorySink:
+
+    def __init__(self, path: str):
+        self.path = path
+        os.makedirs(path, exist_ok=True)
+
+    def write(self, name: str, data: bytes):
+        target = os.path.join(self.path, name)
+        with open(f"{target}.tmp", 'wb') as f:
+            f.write(data)
+        os.replace(f"{target}.tmp", target)
+
+    def close(self):
+        pass
+
+
+class TarSink:
+
+    def __init__(self, path: str):
+        self.archive = tarfile.open(path, 'w:gz' if path.endswith(('.tar.gz', '.tgz')) else 'w')
+
+    def write(self, name: str, data: bytes):
+        info = tarfile.TarInfo(name)
+        info.size = len(data)
+        info.mtime = int(time.time())
+        self.archive.addfile(info, io.BytesIO(data))
+
+    def close(self):
+        self.archive.close()
+
+
+def read_jobs(path: str):
+    source = sys.stdin.buffer if path == '-' else open(path, 'rb')
+    try:
+        for number, line in enumerate(source, 1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                job = codec.loads(line)
+            except ValueError as e:
+                yield number, None, f"некорректный JSON: {e}"
+                continue
+            if not isinstance(job, dict):
+                yield number, None, "строка должна быть JSON-объектом"
+                continue
+            yield number, job, None
+    finally:
+        if source is not sys.stdin.buffer:
+            source.close()
+
+
+def count_jobs(path: str):
+    if path == '-':
+        return None
+    with open(path, 'rb') as f:
+        return sum(1 for line in f if line.strip())
+
+
+class Progress:
+
+    def __init__(self, total, stream=sys.stderr, interval: float = 1.0):
+        self.total = total
+        self.stream = stream
+        self.interval = interval
+        self.started = time.perf_counter()
+        self.printed_at = 0.0
+        self.done = 0
+        self.failed = 0
+        self.written_bytes = 0
+        self.durations = defaultdict(list)
+
+    def record(self, kind: str, size: int, elapsed_ms: float, ok: bool):
+        self.done += 1
+        if ok:
+            self.written_bytes += size
+            self.durations[kind].append(elapsed_ms)
+        else:
+            self.failed += 1
+        now = time.perf_counter()
+        if now - self.printed_at >= self.interval:
+            self.printed_at = now
+            self.print_line(now)
+
+    def print_line(self, now: float):
+        rate = self.done / max(now - self.started, 1e-9)
+        total = f"/{self.total} ({100 * self.done / self.total:.1f}%)" if self.total else ""
+        self.stream.write(f"\r{self.done}{total}, {rate:.1f} карт/с, ошибок: {self.failed}  ")
+        self.stream.flush()
+
+    def summary(self) -> str:
+        elapsed = time.perf_counter() - self.started
+        lines = [
+            f"Готово: {self.done - self.failed} из {self.done}, ошибок: {self.failed}",
+            f"Время: {elapsed:.1f} с, {self.done / max(elapsed, 1e-9):.1f} карт/с, "
+            f"записано {self.written_bytes / (1024 * 1024):.1f} МБ",
+        ]
+        for kind, durations in sorted(self.durations.items()):
+            lines.append(f"  {kind}: {len(durations)} шт., медиана {statistics.median(durations):.1f} мс, "
+                         f"p95 {percentile(durations, 95):.1f} мс")
+        return "\n".join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Пакетный рендеринг карточек AgeraPvP Stats Bot")
+    parser.add_argument('input', help="JSON Lines с задачами (- для stdin)")
+    parser.add_argument('output', help="Каталог или архив .tar/.tar.gz для изображений")
+    parser.add_argument('--processes', type=int, default=os.cpu_count() or 1, help="Количество процессов рендеринга")
+    parser.add_argument('--memory-mb', type=float, default=512,
+                        help="Общий бюджет кэшей процессов рендеринга в МБ")
+    parser.add_argument('--resolution', default=DEFAULT_RESOLUTION, choices=sorted(RESOLUTION_NAMES),
+                        help="Профиль разрешения")
+    parser.add_argument('--no-skins', action='store_true', help="Не загружать скины для карточек профиля")
+    args = parser.parse_args()
+
+    api_key = os.getenv('API_KEY')
+    setup_logging(os.getenv('LOG_LEVEL', 'WARNING'), secrets=(api_key,) if api_key else ())
+
+    processes = max(1, args.processes)
+    budget = int(args.memory_mb * 1024 * 1024 / processes)
+    is_archive = args.output.endswith(('.tar', '.tar.gz', '.tgz'))
+    sink = TarSink(args.output) if is_archive else DirectorySink(args.output)
+    progress = Progress(count_jobs(args.input))
+    max_pending = processes * 2
+
+    executor = ProcessPoolExecutor(max_workers=processes, initializer=init_worker,
+                                   initargs=(args.resolution, budget, api_key, not args.no_skins))
+    pending = {}
+    written = set()
+
+    def drain(return_when):
+        done, _ = wait(pending, return_when=return_when)
+        for future in done:
+            number, job = pending.pop(future)
+            png, error, elapsed_ms = future.result()
+            name = output_name(job, number)
+            if error is None and name in written:
+                error = f"файл {name} уже записан другой строкой"
+            if error is None:
+                written.add(name)
+                sink.write(name, png)
+                progress.record(job['type'], len(png), elapsed_ms, True)
+            else:
+                logger.warning("Строка %d (%s): %s", number, job.get('type'), error)
+                progress.record(str(job.get('type')), 0, elapsed_ms, False)
+
+    try:
+        for number, job, error in read_jobs(args.input):
+            if error is not None:
+                logger.warning("Строка %d: %s", number, error)
+                progress.record('invalid', 0, 0.0, False)
+                continue
+            pending[executor.submit(render_job, job)] = (number, job)
+            if len(pending) >= max_pending:
+                drain(FIRST_COMPLETED)
+        while pending:
+            drain(FIRST_COMPLETED)
+    except KeyboardInterrupt:
+        print("\nПрервано, ожидаем завершения начатых задач", file=sys.stderr)
+        executor.shutdown(wait=True, cancel_futures=True)
+    finally:
+        executor.shutdown(wait=True)
+        sink.close()
+
+    progress.print_line(time.perf_counter())
+    print(file=sys.stderr)
+    print(progress.summary())
+    sys.exit(1 if progress.failed and progress.failed == progress.done else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,94 @@
+from collections import Counter
+import io
+import threading
+import time
+
+import pytest
+import requests
+
+from core.api_client import AgeraPvPAPI
+from core.metrics import metrics
+
+
+class FakeSession:
+
+    def __init__(self, behaviour):
+        self.behaviour = behaviour
+        self.headers = {}
+        self.calls = Counter()
+        self.responses = []
+        self._lock = threading.Lock()
+
+    def get(self, url, timeout):
+        host = url.split('/')[2]
+        with self._lock:
+            self.calls[host] += 1
+        status, delay = self.behaviour[host]
+        time.sleep(delay)
+        if status is None:
+            raise requests.exceptions.ConnectionError(f"{host} недоступен")
+        response = requests.Response()
+        response.status_code = status
+        response._content = f'{{"host": "{host}"}}'.encode()
+        response.raw = io.BytesIO()
+        with self._lock:
+            self.responses.append(response)
+        return response
+
+
+def make_api(behaviour, hedge_ratio=1.0):
+    hosts = list(behaviour)
+    api = AgeraPvPAPI('key', base_urls=[f"http://{host}" for host in hosts], hedge_ratio=hedge_ratio,
+                      hedge_min_delay=0.01)
+    api.session = FakeSession(behaviour)
+    api.endpoints.ranked = lambda: list(api.endpoints.endpoints)
+    for host in hosts:
+        for _ in range(5):
+            metrics.observe('api_latency_ms', 20, host=host)
+    return api
+
+
+def test_single_endpoint_never_hedges():
+    assert AgeraPvPAPI('key', base_urls=['http://solo-a'])._hedge_pool is None
+    assert AgeraPvPAPI('key', base_urls=['http://duo-a', 'http://duo-b'], hedge_ratio=0)._hedge_pool is None
+
+
+def test_slow_primary_is_hedged_and_loser_closed():
+    api = make_api({'slow-a': (200, 0.3), 'fast-b': (200, 0.0)})
+    won_before = metrics.counter('api_hedge_won', host='fast-b')
+
+    response = api._get('/v1/test', 5)
+
+    assert response.json() == {'host': 'fast-b'}
+    assert metrics.counter('api_hedge_won', host='fast-b') == won_before + 1
+    time.sleep(0.4)
+    loser = next(item for item in api.session.responses if item is not response)
+    assert loser.raw.closed
+
+
+def test_failed_hedge_does_not_retry_the_alternate():
+    api = make_api({'bad-a': (503, 0.1), 'bad-b': (503, 0.1)})
+
+    response = api._get('/v1/test', 5)
+
+    assert response.status_code == 503
+    assert api.session.calls == {'bad-a': 1, 'bad-b': 1}
+
+
+def test_failover_tries_each_remaining_endpoint_once():
+    api = make_api({'down-a': (None, 0.0), 'bad-b': (503, 0.0), 'ok-c': (200, 0.0)}, hedge_ratio=0)
+    failover_before = metrics.counter('api_failover', host='ok-c')
+
+    response = api._get('/v1/test', 5)
+
+    assert response.json() == {'host': 'ok-c'}
+    assert api.session.calls == {'down-a': 1, 'bad-b': 1, 'ok-c': 1}
+    assert metrics.counter('api_failover', host='ok-c') == failover_before + 1
+
+
+def test_all_endpoints_down_raises_last_error():
+    api = make_api({'down-a': (None, 0.0), 'down-b': (None, 0.0)}, hedge_ratio=0)
+
+    with pytest.raises(requests.exceptions.ConnectionError):
+        api._get('/v1/test', 5)
+    assert api.session.calls == {'down-a': 1, 'down-b': 1}
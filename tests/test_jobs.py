@@ -0,0 +1,103 @@
+import os
+import time
+
+import pytest
+
+from core.jobs import INTERACTION_TOKEN_TTL, Job, SQLiteJobQueue, create_job_queue, default_queue_url
+
+
+@pytest.fixture
+def queue(tmp_path):
+    return SQLiteJobQueue(str(tmp_path / 'jobs.sqlite3'), max_attempts=2, poll_interval=0.01)
+
+
+def make_job(command='stats', created_at=None):
+    return Job(None, command, {'nickname': 'Steve', 'mode': 'BW'}, 1, 'token', created_at)
+
+
+def status(queue, job):
+    return queue.backend.connection().execute("SELECT status FROM jobs WHERE id = ?", (job.id,)).fetchone()[0]
+
+
+def test_get_claims_oldest_pending_job_once(queue):
+    first, second = make_job('stats'), make_job('profile')
+    queue.put(first)
+    queue.put(second)
+
+    claimed = queue.get(timeout=0, worker='w1')
+    assert (claimed.id, claimed.command, claimed.args, claimed.attempts) == (first.id, 'stats', first.args, 1)
+    assert queue.get(timeout=0, worker='w2').id == second.id
+    assert queue.get(timeout=0.05, worker='w3') is None
+    assert queue.depth() == 2
+
+
+def test_ack_removes_job(queue):
+    queue.put(make_job())
+    queue.ack(queue.get(timeout=0))
+    assert queue.depth() == 0
+    assert queue.get(timeout=0) is None
+
+
+def test_fail_retries_until_max_attempts(queue):
+    queue.put(make_job())
+
+    job = queue.get(timeout=0)
+    queue.fail(job)
+    assert status(queue, job) == 'pending'
+
+    job = queue.get(timeout=0)
+    assert job.attempts == 2
+    queue.fail(job)
+    assert status(queue, job) == 'failed'
+    assert queue.depth() == 0
+    assert queue.get(timeout=0) is None
+
+
+def test_fail_without_retry_and_expired_jobs_are_final(queue):
+    queue.put(make_job())
+    queue.put(make_job(created_at=time.time() - INTERACTION_TOKEN_TTL))
+
+    fresh = queue.get(timeout=0)
+    queue.fail(fresh, retry=False)
+    assert status(queue, fresh) == 'failed'
+
+    expired = queue.get(timeout=0)
+    assert expired.is_expired()
+    queue.fail(expired)
+    assert status(queue, expired) == 'failed'
+
+
+def test_unacked_job_is_reclaimed_after_visibility_timeout(tmp_path):
+    queue = SQLiteJobQueue(str(tmp_path / 'jobs.sqlite3'), visibility_timeout=0.05)
+    queue.put(make_job())
+
+    job = queue.get(timeout=0, worker='crashed')
+    assert queue.get(timeout=0, worker='other') is None
+    time.sleep(0.06)
+    reclaimed = queue.get(timeout=0, worker='other')
+    assert (reclaimed.id, reclaimed.attempts) == (job.id, 2)
+
+
+def test_response_cache_expiry_and_purge(queue):
+    cache = queue.response_cache()
+    cache.set('live', {'wins': 1}, 60)
+    cache.set('stale', {'wins': 2}, 60)
+    cache.set('gone', {'wins': 3}, 60)
+    cache.set('skipped', {'wins': 4}, 0)
+    queue.backend.connection().execute(
+        "UPDATE response_cache SET expires_at = ? WHERE key IN ('stale', 'gone')", (time.time() - 1,)
+    )
+
+    assert cache.get('live') == {'wins': 1}
+    assert cache.get('stale') is None
+    assert cache.get('skipped') is None
+    assert cache.purge_expired() == 1
+    assert queue.backend.connection().execute("SELECT key FROM response_cache").fetchall() == [('live',)]
+
+
+def test_default_queue_url_follows_data_dir(tmp_path):
+    url = default_queue_url(str(tmp_path / 'data'))
+    assert url == f"sqlite:///{os.path.join(str(tmp_path / 'data'), 'jobs.sqlite3')}"
+    assert create_job_queue(url).backend.path == os.path.join(str(tmp_path / 'data'), 'jobs.sqlite3')
+    with pytest.raises(ValueError):
+        create_job_queue('redis://localhost')
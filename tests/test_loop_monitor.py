@@ -0,0 +1,170 @@
+import asyncio
+import importlib
+import os
+import time
+from types import SimpleNamespace
+
+import pytest
+
+from core.loop_monitor import LoopBlockedError, LoopMonitor
+
+STRICT_MS = '100'
+
+
+class FakeResponse:
+
+    def __init__(self):
+        self.sent = []
+        self._done = False
+
+    def is_done(self):
+        return self._done
+
+    async def defer(self, **kwargs):
+        self._done = True
+
+    async def send_message(self, content=None, **kwargs):
+        self._done = True
+        self.sent.append(content)
+
+    async def edit_message(self, **kwargs):
+        self._done = True
+        self.sent.append(kwargs.get('content'))
+
+
+class FakeFollowup:
+
+    def __init__(self):
+        self.sent = []
+
+    async def send(self, content=None, **kwargs):
+        self.sent.append(content)
+
+
+class FakeInteraction:
+
+    def __init__(self):
+        self.response = FakeResponse()
+        self.followup = FakeFollowup()
+        self.user = SimpleNamespace(id=1, guild_permissions=SimpleNamespace(manage_guild=True))
+        self.guild_id = 1
+        self.guild = None
+        self.channel_id = 1
+        self.application_id = 1
+        self.id = 1
+        self.token = 'token'
+
+    async def original_response(self):
+        return SimpleNamespace(attachments=[])
+
+    async def edit_original_response(self, **kwargs):
+        self.followup.sent.append(kwargs.get('content'))
+
+    @property
+    def replies(self):
+        return self.response.sent + self.followup.sent
+
+
+def choice(value, name=None):
+    return SimpleNamespace(value=value, name=name or value)
+
+
+HANDLER_ARGS = {
+    'stats': {'nickname': 'Steve', 'mode': choice('BW', 'BedWars')},
+    'profile': {'nickname': 'Steve'},
+    'punishments': {},
+    'staff': {},
+    'online': {},
+    'history': {'metric': choice('online'), 'period': None},
+    'top': {'mode': choice('BW', 'BedWars'), 'stat': 'kills'},
+    'watch': {'nickname': 'Steve', 'mode': choice('BW', 'BedWars')},
+    'unwatch': {'nickname': 'Steve', 'mode': choice('BW', 'BedWars')},
+    'watchlist': {},
+    'resolution': {'profile': choice('standard'), 'scope': None},
+    'profiler': {'seconds': 1},
+    'test': {},
+}
+
+
+@pytest.fixture(scope='module')
+def bot(tmp_path_factory):
+    env = {'BOT_TOKEN': 'token', 'API_KEY': 'test-api-key', 'DATA_DIR': str(tmp_path_factory.mktemp('data')),
+           'LOOP_STRICT_MS': STRICT_MS, 'HISTORY_SAMPLE_INTERVAL': '0', 'WATCHLIST_INTERVAL': '0'}
+    saved = {key: os.environ.get(key) for key in env}
+    os.environ.update(env)
+    try:
+        module = importlib.import_module('bot')
+    finally:
+        for key, value in saved.items():
+            if value is None:
+                os.environ.pop(key, None)
+            else:
+                os.environ[key] = value
+
+    api = module.api_client
+    api.get_player_stats = lambda name, mode, timeout=10: {'wins': 10, 'kills': 5, 'deaths': 2}
+    api.get_player_profile = lambda name, timeout=10: {'username': name, 'ranks': [{'name': 'GOLD'}],
+                                                       'online': True, 'lastLogin': 1700000000000}
+    api.get_staff_stats = lambda timeout=10: {'totalBans': 3, 'totalMutes': 4}
+    api.get_staff_online = lambda timeout=10: {'players': [{'displayName': 'Admin', 'userId': 1}]}
+    api.get_total_online = lambda timeout=10: {'online': 42}
+    api.test_connection = lambda: True
+
+    from generators.profile_generator import ProfileImageGenerator
+    ProfileImageGenerator._load_skin_image = lambda self, nickname, timeout=10: None
+
+    async def is_owner(user):
+        return False
+
+    module.bot.is_owner = is_owner
+    module.loop_monitor.violations.clear()
+    return module
+
+
+def watched_commands(bot):
+    return {command.name: command.callback for command in bot.bot.tree.walk_commands()
+            if hasattr(command.callback, '__wrapped__')}
+
+
+def test_every_watched_handler_has_arguments(bot):
+    assert set(watched_commands(bot)) == set(HANDLER_ARGS)
+
+
+@pytest.mark.parametrize('name', sorted(HANDLER_ARGS))
+def test_handler_does_not_block_loop(bot, name):
+    callback = watched_commands(bot)[name]
+
+    async def run():
+        for _ in range(2):
+            interaction = FakeInteraction()
+            await callback(interaction, **HANDLER_ARGS[name])
+            assert interaction.replies
+
+    asyncio.run(run())
+    assert bot.loop_monitor.violations == []
+
+
+def test_blocking_handler_raises():
+    monitor = LoopMonitor(strict_ms=10)
+
+    @monitor.watch_handler
+    async def blocking():
+        await asyncio.sleep(0)
+        time.sleep(0.05)
+
+    with pytest.raises(LoopBlockedError) as excinfo:
+        asyncio.run(blocking())
+    assert excinfo.value.handler == 'blocking'
+    assert monitor.violations == [excinfo.value]
+
+
+def test_awaiting_handler_passes():
+    monitor = LoopMonitor(strict_ms=10)
+
+    @monitor.watch_handler
+    async def offloaded():
+        await asyncio.get_running_loop().run_in_executor(None, time.sleep, 0.05)
+        return 'done'
+
+    assert asyncio.run(offloaded()) == 'done'
+    assert monitor.violations == []
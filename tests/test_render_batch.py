@@ -0,0 +1,44 @@
+import json
+import sys
+
+import pytest
+
+import render_batch
+from render_batch import output_name
+
+PUNISHMENTS = {'type': 'punishments', 'data': {'totalBans': 1, 'totalMutes': 2}}
+
+
+def test_default_names_include_line_number():
+    job = {'type': 'stats', 'nickname': 'Steve', 'mode': 'bw'}
+    assert output_name(job, 3) == '000003_stats_Steve_BW.png'
+    assert output_name(job, 4) == '000004_stats_Steve_BW.png'
+    assert output_name(dict(job, page=2), 5) == '000005_stats_Steve_BW_p2.png'
+    assert output_name({'type': 'punishments'}, 6) == '000006_punishments.png'
+
+
+def test_explicit_names_are_sanitised():
+    assert output_name({'type': 'profile', 'name': '../cards/Steve card'}, 1) == 'Steve_card.png'
+    assert output_name({'type': 'profile', 'name': 'steve.PNG'}, 1) == 'steve.PNG'
+
+
+def run_batch(tmp_path, monkeypatch, jobs):
+    source = tmp_path / 'jobs.jsonl'
+    source.write_text(''.join(json.dumps(job) + '\n' for job in jobs))
+    output = tmp_path / 'out'
+    monkeypatch.setattr(sys, 'argv', ['render_batch.py', str(source), str(output), '--processes', '1'])
+    with pytest.raises(SystemExit) as excinfo:
+        render_batch.main()
+    return output, excinfo.value.code
+
+
+def test_duplicate_requests_do_not_overwrite(tmp_path, monkeypatch, capsys):
+    jobs = [PUNISHMENTS, PUNISHMENTS, dict(PUNISHMENTS, name='staff'), dict(PUNISHMENTS, name='staff.png')]
+
+    output, code = run_batch(tmp_path, monkeypatch, jobs)
+
+    assert code == 0
+    assert sorted(path.name for path in output.iterdir()) == [
+        '000001_punishments.png', '000002_punishments.png', 'staff.png'
+    ]
+    assert "Готово: 3 из 4, ошибок: 1" in capsys.readouterr().out
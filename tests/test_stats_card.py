@@ -0,0 +1,70 @@
+from PIL import Image, ImageChops
+import pytest
+
+from core.metrics import metrics
+from generators import StatsImageGenerator
+from generators.image_generator import _cards, set_card_budget
+
+BEFORE = {'wins': 120, 'kills': 560, 'deaths': 200, 'losses': 80, 'games': 200, 'kd': 2.8, 'wl': 1.5,
+          'final_kills': 40, 'beds_broken': 30}
+AFTER = dict(BEFORE, wins=121, kills=1000560, kd=5000.25, beds_broken=3)
+
+
+@pytest.fixture
+def card_budget():
+    set_card_budget(64 * 1024 * 1024)
+    yield
+    set_card_budget(0)
+    set_card_budget(64 * 1024 * 1024)
+
+
+def render(stats, rank='GOLD'):
+    buffer = StatsImageGenerator().generate('Steve', 'BW', dict(stats), rank)
+    assert buffer is not None
+    with Image.open(buffer) as image:
+        return image.convert('RGB')
+
+
+def assert_same(first, second):
+    assert first.size == second.size
+    assert ImageChops.difference(first, second).getbbox() is None
+
+
+def rendered(kind):
+    return metrics.counter('stats_render', kind=kind)
+
+
+def test_incremental_render_matches_full_render(card_budget):
+    render(BEFORE)
+    incremental_before = rendered('incremental')
+    incremental = render(AFTER)
+    assert rendered('incremental') == incremental_before + 1
+
+    set_card_budget(0)
+    direct = render(AFTER)
+    set_card_budget(64 * 1024 * 1024)
+    full_before = rendered('full')
+    full = render(AFTER)
+    assert rendered('full') == full_before + 1
+
+    assert_same(incremental, full)
+    assert_same(incremental, direct)
+
+
+def test_layout_change_rebuilds_card(card_budget):
+    render(BEFORE, rank='GOLD')
+    full_before = rendered('full')
+    changed_rank = render(BEFORE, rank='YOUTUBE')
+    assert rendered('full') == full_before + 1
+
+    set_card_budget(0)
+    assert_same(changed_rank, render(BEFORE, rank='YOUTUBE'))
+
+
+def test_zero_budget_keeps_no_cards():
+    set_card_budget(0)
+    try:
+        render(BEFORE)
+        assert len(_cards) == 0
+    finally:
+        set_card_budget(64 * 1024 * 1024)
@@ -0,0 +1,239 @@
+import argparse
+import json
+import logging
+import multiprocessing
+import os
+import signal
+import socket
+import time
+
+from dotenv import load_dotenv
+
+from core.jobs import default_queue_url
+from core.logs import setup_logging
+
+load_dotenv()
+
+logger = logging.getLogger('worker')
+
+DISCORD_API = "https://discord.com/api/v10"
+
+
+def configure_logging(api_key: str):
+    setup_logging(os.getenv('LOG_LEVEL', 'INFO'), secrets=(api_key,),
+                  debug_rate=float(os.getenv('LOG_DEBUG_RATE', '20')))
+
+
+def result_components(result) -> list:
+    buttons = [
+        {'type': 2, 'style': 2, 'label': label, 'emoji': {'name': emoji}, 'custom_id': custom_id, 'disabled': disabled}
+        for label, emoji, custom_id, disabled in result.buttons()
+    ]
+    return [{'type': 1, 'components': buttons}] if buttons else []
+
+
+def webhook_request(session, method: str, url: str, payload: dict, image=None, filename: str = None,
+                    retries: int = 3) -> dict:
+    for attempt in range(retries + 1):
+        if image is None:
+            response = session.request(method, url, json=payload, timeout=10)
+        else:
+            image.seek(0)
+            response = session.request(
+                method, url, timeout=30,
+                data={'payload_json': json.dumps({**payload, 'attachments': [{'id': 0, 'filename': filename}]})},
+                files={'files[0]': (filename, image, 'image/png')}
+            )
+        if response.status_code == 429 and attempt < retries:
+            time.sleep(float(response.json().get('retry_after', 1.0)))
+            continue
+        response.raise_for_status()
+        return response.json() if response.content else {}
+
+
+def post_followup(job, result, session, attachments):
+    import requests
+
+    webhook_url = f"{DISCORD_API}/webhooks/{job.application_id}/{job.token}"
+    components = result_components(result)
+
+    def reply(embed=None, image=None):
+        payload = {'content': result.content}
+        if embed is not None:
+            payload['embeds'] = [embed]
+        if components:
+            payload['components'] = components
+        if result.edit:
+            payload.setdefault('embeds', [])
+            if image is None:
+                payload['attachments'] = []
+            return webhook_request(session, 'PATCH', f"{webhook_url}/messages/@original", payload,
+                                   image, result.filename)
+        return webhook_request(session, 'POST', f"{webhook_url}?wait=true", payload, image, result.filename)
+
+    if result.image is None:
+        reply(result.embed)
+        return
+
+    try:
+        digest = attachments.digest(result.image)
+        url = attachments.lookup(digest)
+        if url is not None:
+            try:
+                reply({**(result.embed or {}), 'image': {'url': url}})
+                return
+            except requests.HTTPError as e:
+                logger.warning("Не удалось переиспользовать вложение %s: %s", digest[:12], e)
+                attachments.forget(digest)
+
+        message = reply(result.embed, result.image)
+        uploaded = message.get('attachments') or [{}]
+        attachments.remember_url(digest, uploaded[0].get('url'))
+    finally:
+        result.release()
+
+
+def run_worker(queue_url: str, api_key: str, cache_ttl: float, worker_name: str):
+    import requests
+    from core.admission import AdmissionController
+    from core.api_client import AgeraPvPAPI
+    from core.attachments import AttachmentRegistry
+    from core.deadline import Deadline
+    from core.jobs import create_job_queue
+    from core.leaderboard import LeaderboardIndex
+    from core.memory import tracer
+    from core.nicknames import NicknameIndex
+    from core.pipeline import CommandPipeline, CommandResult
+    from core.profiler import SamplingProfiler
+    from core.scheduler import ApiScheduler
+    from core.timeseries import TimeSeriesStore
+    from generators import assets
+    from generators.image_generator import set_card_budget
+    from generators.stat_schema import EXCLUDED_KEYS
+
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    configure_logging(api_key)
+
+    assets.set_budget(int(float(os.getenv('ASSET_CACHE_MAX_MB', '96')) * 1024 * 1024))
+    assets.set_pool_budget(int(float(os.getenv('RENDER_POOL_MAX_MB', '32')) * 1024 * 1024))
+    set_card_budget(int(float(os.getenv('STATS_CARD_CACHE_MB', '64')) * 1024 * 1024))
+    if os.getenv('MEMORY_TRACE', '').lower() in ('1', 'true', 'yes'):
+        tracer.start()
+
+    data_dir = os.getenv('DATA_DIR', 'data')
+    if hasattr(signal, 'SIGUSR1'):
+        profiler = SamplingProfiler(os.getenv('PROFILE_DIR', os.path.join(data_dir, 'profiles')),
+                                    interval=float(os.getenv('PROFILE_INTERVAL_MS', '10')) / 1000)
+        profile_seconds = float(os.getenv('PROFILE_SIGNAL_SECONDS', '30'))
+        signal.signal(signal.SIGUSR1, lambda signum, frame: profiler.start(profile_seconds))
+    leaderboard = LeaderboardIndex(os.path.join(data_dir, 'leaderboard.json'), excluded_keys=EXCLUDED_KEYS)
+    nicknames = NicknameIndex(os.path.join(data_dir, 'nicknames.json'))
+    job_queue = create_job_queue(queue_url)
+    admission = AdmissionController(
+        max_depth=int(os.getenv('RENDER_MAX_QUEUE_DEPTH', '8')),
+        max_wait_ms=float(os.getenv('RENDER_MAX_WAIT_MS', '5000')),
+        concurrency=int(os.getenv('WORKER_PROCESSES', '1')),
+        depth_source=job_queue.depth
+    )
+    api_client = AgeraPvPAPI(api_key=api_key,
+                             base_urls=os.getenv('API_BASE_URLS', AgeraPvPAPI.BASE_URL).split(','),
+                             hedge_ratio=float(os.getenv('API_HEDGE_RATIO', '0.05')))
+    pipeline = CommandPipeline(api_client, cache=job_queue.response_cache(),
+                               cache_ttl=cache_ttl, admission=admission,
+                               history=TimeSeriesStore(data_dir, readonly=True),
+                               leaderboard=leaderboard, nicknames=nicknames,
+                               scheduler=ApiScheduler(concurrency=int(os.getenv('API_CONCURRENCY', '8')),
+                                                      reserved=int(os.getenv('API_INTERACTIVE_RESERVED', '2'))))
+    pipeline.warm_up()
+    attachments = AttachmentRegistry(job_queue.response_cache(),
+                                     ttl=float(os.getenv('ATTACHMENT_REUSE_TTL', '3600')))
+    session = requests.Session()
+
+    logger.info("Воркер %s запущен, очередь %s", worker_name, queue_url)
+
+    command_deadline = float(os.getenv('COMMAND_DEADLINE', '8'))
+    synced_at = time.monotonic()
+    while True:
+        job = job_queue.get(timeout=1.0, worker=worker_name)
+        if job is None:
+            leaderboard.save()
+            if time.monotonic() - synced_at >= 60:
+                nicknames.sync()
+                purged = job_queue.response_cache().purge_expired()
+                if purged:
+                    logger.debug("Удалено устаревших записей кэша ответов: %d", purged)
+                synced_at = time.monotonic()
+            continue
+
+        if job.is_expired():
+            logger.warning("Задача %s (%s) устарела, токен взаимодействия истёк", job.id, job.command)
+            job_queue.fail(job, retry=False)
+            continue
+
+        started = time.perf_counter()
+        try:
+            deadline = Deadline.after(command_deadline, job.created_at) if command_deadline > 0 else None
+            result = pipeline.run(job.command, job.args, deadline)
+        except Exception as e:
+            logger.error("Ошибка в задаче %s (%s): %s", job.id, job.command, e)
+            result = CommandResult(f"❌ Произошла ошибка при обработке запроса: {str(e)}")
+
+        try:
+            post_followup(job, result, session, attachments)
+        except Exception as e:
+            logger.error("Не удалось отправить ответ для задачи %s: %s", job.id, e)
+            job_queue.fail(job)
+            continue
+
+        job_queue.ack(job)
+        logger.info("Задача %s (%s) выполнена за %.0fмс", job.id, job.command,
+                    (time.perf_counter() - started) * 1000)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Воркер рендеринга AgeraPvP Stats Bot")
+    parser.add_argument('--processes', type=int, default=int(os.getenv('WORKER_PROCESSES', '1')),
+                        help="Количество процессов-воркеров")
+    parser.add_argument('--queue', default=os.getenv('QUEUE_URL', default_queue_url(os.getenv('DATA_DIR', 'data'))),
+                        help="URL бэкенда очереди (по умолчанию DATA_DIR/jobs.sqlite3)")
+    args = parser.parse_args()
+
+    api_key = os.getenv('API_KEY')
+    if not api_key:
+        print("Ошибка: API_KEY не установлен!")
+        print("Создайте файл .env и добавьте туда: API_KEY=ваш_api_ключ")
+        return
+
+    configure_logging(api_key)
+
+    cache_ttl = float(os.getenv('RESPONSE_CACHE_TTL', '30'))
+    hostname = socket.gethostname()
+
+    processes = []
+    for index in range(max(1, args.processes)):
+        name = f"{hostname}-{os.getpid()}-{index}"
+        process = multiprocessing.Process(
+            target=run_worker, args=(args.queue, api_key, cache_ttl, name), name=name, daemon=True
+        )
+        process.start()
+        processes.append(process)
+
+    if hasattr(signal, 'SIGUSR1'):
+        def forward_profile_signal(signum, frame):
+            for process in processes:
+                if process.is_alive():
+                    os.kill(process.pid, signal.SIGUSR1)
+
+        signal.signal(signal.SIGUSR1, forward_profile_signal)
+
+    try:
+        for process in processes:
+            process.join()
+    except KeyboardInterrupt:
+        logger.info("Остановка воркеров")
+        for process in processes:
+            process.terminate()
+
+
+if __name__ == "__main__":
+    main()